@@ -1,29 +1,22 @@
 import os
-import json
 import sqlite3
 import getpass
+import hashlib
 import logging
+import threading
+from collections import namedtuple
+from contextlib import ExitStack
 from datetime import datetime, timedelta
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 from io import BytesIO
 import base64
-import numpy as np
 import random
 import io
-import base64
-import plotly.express as px
-import plotly.graph_objects as go
-import plotly.utils
 import flask
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, send_file, stream_with_context
 from markupsafe import Markup
+from werkzeug.exceptions import RequestEntityTooLarge
 
-# Import OpenAI for AI analysis
-import openai
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -32,33 +25,59 @@ load_dotenv()
 import secrets
 from functools import wraps
 
-# Load secrets from Google Secret Manager if in production
-try:
-    from secrets_manager import load_secrets_to_env
-    load_secrets_to_env()
-except ImportError:
-    print("secrets_manager not available, using local environment")
+from audio_io import (InMemoryUploadRequest, STT_MAX_UPLOAD_BYTES, TTS_MODEL, audio_upload_name,
+                      buffer_size, speech_cache, trim_prompt, upload_too_large)
+from compression import init_compression
+from data_context import build_data_context, context_stats
+from db_version import data_version
+from document_storage import document_param, document_sql
+from environment import is_production
+import json_codec
+from facets import FACETS, facet_cache
+from metrics import InstrumentedConnection, init_metrics, openai_call
+import normalized_schema
+from records import AiAnalysis, Complaint, TechnicalNote
+from app_logging import configure_logging, hot_path_logger, restart_after_fork as restart_logging_after_fork
+from static_assets import init_static_assets
+from template_cache import init_template_cache, precompile_templates
+from time_periods import parse_filter_period, parse_question_period
 
 app = Flask(__name__)
+app.json = json_codec.CodecJSONProvider(app)
+# Keep file uploads (speech-to-text audio) in memory instead of temporary files
+app.request_class = InMemoryUploadRequest
 app.secret_key = os.environ.get('SECRET_KEY', 'bsh-complaints-secret-key-2025')
 
+# Per-route latency, SQL and OpenAI metrics at /metrics; first, so its timing covers the other hooks
+init_metrics(app)
+# gzip/brotli for text responses, long-lived caching for fingerprinted static files
+init_compression(app)
+init_static_assets(app)
+# Compiled templates survive restarts in a bytecode cache (see template_cache.py)
+init_template_cache(app)
+
 # Configure session settings for Cloud Run
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)  # 24 hours
 app.config['SESSION_COOKIE_SECURE'] = True  # HTTPS only
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging: LOG_LEVEL / LOG_FORMAT, written from a background thread (see app_logging.py)
+configure_logging()
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+# For messages logged on every request; sampled below WARNING
+hot_logger = hot_path_logger(__name__)
 
-# Enable Flask debug mode
-app.debug = True
+# Debug mode, and with it template auto-reload, only outside production
+app.debug = not is_production()
 
 # Database initialization functions
 def initialize_database():
-    """Initialize the database and generate data if needed."""
+    """Initialize the database and generate data if needed.
+    
+    Returns:
+        bool: True if the database is ready to serve requests
+    """
     print("Initializing database...")
     
     # Initialize Cloud Storage DB if available
@@ -102,62 +121,71 @@ def initialize_database():
                             pass
                     else:
                         print("Warning: Failed to generate sample data.")
+                        return False
                 else:
                     print(f"Database already contains {complaint_count} complaints.")
             else:
                 print("Warning: Could not connect to database for data check.")
+                return False
         else:
             print("Warning: Database setup failed.")
+            return False
     except Exception as e:
         print(f"Error during database initialization: {e}")
         import traceback
         traceback.print_exc()
+        return False
+    
+    # Always ensure resolution dates exist for resolved complaints
+    try:
+        from update_resolution_dates_sqlite import update_resolution_dates
+        update_resolution_dates()
+        from cloud_storage_db import cloud_db
+        cloud_db.backup_to_gcs()
+    except Exception as e:
+        print(f"Warning: Failed to update resolution dates: {e}")
+    
+    return True
 
 # Initialize database will be called after DB helpers are defined below
 
-# Get OpenAI API key from environment
-api_key = os.getenv("OPENAI_API_KEY")
-if api_key:
-    print(f"API key exists: {True}")
-    print(f"API key length: {len(api_key)}")
-    print(f"API key first 10 chars: {api_key[:10] + '...' if api_key else 'None'}")
-else:
-    print("No OpenAI API key found in environment variables")
-
-# Initialize OpenAI client
-client = None
-try:
-    from openai import OpenAI
-    print(f"OpenAI library imported successfully")
-    
-    # Check if API key is available
-    if not api_key or api_key == 'your-openai-api-key-here' or api_key == 'your-openai-api-key':
-        print("Warning: No valid OpenAI API key found. AI features will be disabled.")
-        print("Please set OPENAI_API_KEY environment variable or configure Secret Manager.")
-        client = None
-    else:
-        # Set API key directly in the environment
-        os.environ["OPENAI_API_KEY"] = api_key
-        
-        # Initialize OpenAI client
-        client = OpenAI()
-        print("OpenAI client initialized successfully")
+# OpenAI client, created on first use by get_openai_client()
+_openai_client = None
+_openai_client_lock = threading.Lock()
+PLACEHOLDER_API_KEYS = ('your-openai-api-key-here', 'your-openai-api-key', 'your_openai_api_key_here')
 
-        # Test connection if the client was created
-        if client:
+def get_openai_client():
+    """Return the shared OpenAI client, or None if no valid API key is configured.
+    
+    The SDK is imported and the client constructed on the first AI request
+    rather than at import time, so workers start serving /health immediately.
+    """
+    global _openai_client
+    if _openai_client is not None:
+        return _openai_client
+    
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key or api_key in PLACEHOLDER_API_KEYS:
+        logger.warning("No valid OpenAI API key found. AI features are disabled.")
+        return None
+    
+    with _openai_client_lock:
+        if _openai_client is None:
             try:
-                models = client.models.list()
-                print(f"OpenAI connection test successful: Found {len(models.data)} models")
-            except Exception as test_error:
-                print(f"OpenAI connection test failed: {test_error}")
-                print("AI features may not work properly")
-                client = None
-    
-except Exception as e:
-    print(f"Error initializing OpenAI client: {e}")
-    import traceback
-    traceback.print_exc()
-    client = None
+                from openai import OpenAI
+                _openai_client = OpenAI(api_key=api_key)
+                logger.info("OpenAI client initialized")
+            except Exception as e:
+                logger.error(f"Error initializing OpenAI client: {e}")
+                return None
+    return _openai_client
+
+def _pyplot():
+    """Import matplotlib's pyplot on first use, with the non-interactive backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
 
 # Define category colors globally
 category_colors = {
@@ -190,27 +218,17 @@ def nl2br(value):
 # Add functions to Jinja2 environment
 app.jinja_env.globals.update(max=max, min=min)
 
-# Initialize OpenAI client - Removing duplicate client initialization
-if os.getenv("OPENAI_API_KEY"):
-    try:
-        # No need to create a new client - use the global 'client' variable initialized above
-        print("Using global client variable initialized above")
-    except Exception as e:
-        print(f"Error initializing OpenAI configuration: {e}")
-else:
-    print("No OpenAI API key found")
-
 # Helper functions
 def connect_to_db():
     """Connect to the SQLite database with Cloud Storage persistence."""
     try:
         from cloud_storage_db import cloud_db
-        conn = cloud_db.connect()
+        conn = cloud_db.connect(factory=InstrumentedConnection)
         if conn:
-            print(f"Connected to database via Cloud Storage DB")
+            hot_logger.debug("Connected to database via Cloud Storage DB")
             return conn
         else:
-            print("Cloud Storage DB connection returned None, falling back to local SQLite")
+            logger.warning("Cloud Storage DB connection returned None, falling back to local SQLite")
     except ImportError:
         logger.error("cloud_storage_db module not available, falling back to local SQLite")
     except Exception as e:
@@ -220,242 +238,252 @@ def connect_to_db():
     db_path = os.getenv('DB_PATH', 'bsh_complaints.db')
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, factory=InstrumentedConnection)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys = ON")
-        print(f"Connected to SQLite database at {db_path}")
+        hot_logger.debug("Connected to SQLite database at %s", db_path)
         return conn
     except Exception as e:
-        print(f"Database connection error: {e}")
-        is_production = os.getenv('FLASK_ENV') == 'production' or os.getenv('ENVIRONMENT') == 'production'
-        if is_production:
-            print("Production mode: Returning None for database connection")
+        logger.error(f"Database connection error: {e}")
+        if is_production():
+            logger.error("Production mode: Returning None for database connection")
             return None
         else:
             raise
 
 # Initialize database will be called after all functions are defined
 
-def get_all_complaints(page=1, items_per_page=20, search=None, time_period=None, has_notes=False, start_date=None, end_date=None, country=None, status=None, warranty=None, ai_category=None, brand=None):
-    """Get all complaints with pagination and filtering."""
+# Columns of the complaint list table: (name, expression on the JSON documents, on the normalized tables)
+LIST_COLUMNS = [
+    ('id', "c.id", "rc.id"),
+    ('date_of_complaint', "json_extract(c.data, '$.complaintDetails.dateOfComplaint')", "rc.date_of_complaint"),
+    ('customer', "json_extract(c.data, '$.customerInformation.fullName')", "cu.full_name"),
+    ('model', "json_extract(c.data, '$.productInformation.modelNumber')", "p.model_number"),
+    ('brand', "json_extract(c.data, '$.productInformation.brand')", "p.brand"),
+    ('country', "json_extract(c.data, '$.customerInformation.country')", "cu.country"),
+    ('status', "COALESCE(json_extract(c.data, '$.complaintDetails.resolutionStatus'), 'Not Resolved')",
+               "COALESCE(rc.resolution_status, 'Not Resolved')"),
+    ('warranty', "json_extract(c.data, '$.warrantyInformation.warrantyStatus')", "rc.warranty_status"),
+    ('has_notes', "tn.id IS NOT NULL", "n.id IS NOT NULL"),
+    ('ai_category', "json_extract(tn.data, '$.ai_analysis.openai_category')", "n.openai_category"),
+]
+
+# One row of the complaint list, as returned with projection='list'
+ComplaintListRow = namedtuple('ComplaintListRow', [name for name, _, _ in LIST_COLUMNS])
+
+# Select lists for projection='records': (on the JSON documents, on the normalized tables)
+RECORD_COLUMNS = (
+    f"c.id, {document_sql('c.data')}, tn.id, {document_sql('tn.data')}",
+    f"rc.id, (SELECT {document_sql()} FROM complaints WHERE id = rc.id), "
+    f"n.id, (SELECT {document_sql()} FROM technical_notes WHERE id = n.id)",
+)
+
+def get_all_complaints(page=1, items_per_page=20, search=None, time_period=None, has_notes=False, start_date=None, end_date=None, country=None, status=None, warranty=None, ai_category=None, brand=None, projection=None):
+    """Get all complaints with pagination and filtering.
+    
+    With projection='list' only the list table's columns are read, as
+    ComplaintListRow tuples, instead of (id, complaint data, latest note).
+    projection='records' gives records.Complaint objects that keep the
+    documents undecoded, for batches of thousands of complaints.
+    """
     try:
         conn = connect_to_db()
-        cursor = conn.cursor()
+        try:
+            result_complaints, total_count = fetch_complaints(
+                conn, page, items_per_page, search=search, time_period=time_period, has_notes=has_notes,
+                country=country, status=status, warranty=warranty, ai_category=ai_category, brand=brand,
+                projection=projection)
+        finally:
+            conn.close()
         
-        # For all queries, get the latest technical note for each complaint
-        # SQLite doesn't have DISTINCT ON, so we use a different approach
-        query = """
-        WITH latest_tech_notes AS (
-            SELECT 
-                t1.id, t1.complaint_id, t1.data
-            FROM technical_notes t1
-            INNER JOIN (
-                SELECT complaint_id, MAX(id) as max_id
-                FROM technical_notes
-                GROUP BY complaint_id
-            ) t2 ON t1.complaint_id = t2.complaint_id AND t1.id = t2.max_id
-        )
-        """
+        hot_logger.debug("Query executed with %d results", len(result_complaints))
         
-        # If AI Category filter is applied
-        if ai_category:
-            if ai_category == 'No Analysis':
-                # Show complaints without technical notes
-                query += """
-                SELECT 
-                    c.id,
-                    c.data,
-                    NULL as technical_notes
-                FROM complaints c
-                LEFT JOIN technical_notes tn ON c.id = tn.complaint_id
-                WHERE tn.id IS NULL
-                """
-                params = []
-            else:
-                # Show complaints with specific AI category
-                query += """
-                SELECT 
-                    c.id,
-                    c.data,
-                    tn.data as technical_notes
-                FROM complaints c
-                INNER JOIN latest_tech_notes tn ON c.id = tn.complaint_id
-                WHERE json_extract(tn.data, '$.ai_analysis.openai_category') = ?
-                """
-                params = [ai_category]
+        return result_complaints, total_count
+        
+    except Exception as e:
+        logger.error(f"Error in get_all_complaints: {e}")
+        return [], 0
+
+def fetch_complaints(conn, page, items_per_page, search=None, time_period=None, has_notes=False, country=None, status=None, warranty=None, ai_category=None, brand=None, projection=None):
+    """Return ([(id, complaint data, latest technical note or None)], total count) for one page of the complaint list.
+    
+    Unlike get_all_complaints(), errors are raised to the caller.
+    """
+    if projection not in (None, 'list', 'records'):
+        raise ValueError(f"Unknown complaint projection: {projection}")
+    cursor = conn.cursor()
+    
+    period = None
+    if time_period:
+        period = parse_filter_period(time_period)
+        if period:
+            hot_logger.debug("Applied time period filter: %s (%s to %s)", period.label, period.start_date, period.end_date)
         else:
-            query += """
-            SELECT 
-                c.id,
-                c.data,
-                tn.data as technical_notes
+            logger.warning(f"Ignoring unrecognized time period filter: {time_period}")
+    
+    filters = dict(search=search, period=period, has_notes=has_notes, country=country, status=status,
+                   warranty=warranty, ai_category=ai_category, brand=brand)
+    normalized = normalized_schema.reads_enabled(conn)
+    if projection == 'list':
+        filters['columns'] = ', '.join(normalized_sql if normalized else json_sql
+                                       for _, json_sql, normalized_sql in LIST_COLUMNS)
+    elif projection == 'records':
+        filters['columns'] = RECORD_COLUMNS[1] if normalized else RECORD_COLUMNS[0]
+    if normalized:
+        complaints, total_count = normalized_schema.query_complaints(cursor, page, items_per_page, **filters)
+    else:
+        complaints, total_count = query_complaints_json(cursor, page, items_per_page, **filters)
+    cursor.close()
+    
+    if projection == 'list':
+        return [ComplaintListRow(*row) for row in complaints], total_count
+    if projection == 'records':
+        return [Complaint(complaint_id, document, note_id and TechnicalNote(note_id, complaint_id, note_document))
+                for complaint_id, document, note_id, note_document in complaints], total_count
+    
+    # Convert sqlite3.Row objects to tuples and parse JSON data
+    result_complaints = []
+    for row in complaints:
+        complaint_id = row[0]
+        complaint_data = json_codec.loads(row[1]) if isinstance(row[1], str) else row[1]
+        technical_notes = json_codec.loads(row[2]) if row[2] and isinstance(row[2], str) else row[2]
+        result_complaints.append((complaint_id, complaint_data, technical_notes))
+    
+    return result_complaints, total_count
+
+def query_complaints_json(cursor, page, items_per_page, search=None, period=None, has_notes=False, country=None, status=None, warranty=None, ai_category=None, brand=None, columns=None):
+    """Return (rows, total count) for one page of the complaint list, filtering on the JSON documents.
+    
+    Rows are (id, complaint JSON, latest note JSON or None) unless columns
+    gives another select list over c (complaints) and tn (latest note); it is
+    only evaluated for the rows of the requested page.
+    """
+    if columns is None:
+        columns = f"c.id, {document_sql('c.data')} as data, {document_sql('tn.data')} as technical_notes"
+    # For all queries, get the latest technical note for each complaint
+    # SQLite doesn't have DISTINCT ON, so we use a different approach
+    query = """
+    WITH latest_tech_notes AS (
+        SELECT 
+            t1.id, t1.complaint_id, t1.data
+        FROM technical_notes t1
+        INNER JOIN (
+            SELECT complaint_id, MAX(id) as max_id
+            FROM technical_notes
+            GROUP BY complaint_id
+        ) t2 ON t1.complaint_id = t2.complaint_id AND t1.id = t2.max_id
+    )
+    """
+    
+    # If AI Category filter is applied
+    if ai_category:
+        if ai_category == 'No Analysis':
+            # Show complaints without technical notes
+            query += f"""
+            SELECT c.id AS complaint_id, tn.id AS note_id
             FROM complaints c
-            LEFT JOIN latest_tech_notes tn ON c.id = tn.complaint_id
-            WHERE 1=1
+            LEFT JOIN technical_notes tn ON c.id = tn.complaint_id
+            WHERE tn.id IS NULL
             """
             params = []
-        
-        # Add search filter
-        if search:
-            search_pattern = f"%{search}%"
-            query += """
-            AND (
-                json_extract(c.data, '$.customerInformation.fullName') LIKE ?
-                OR json_extract(c.data, '$.productInformation.modelNumber') LIKE ?
-                OR json_extract(c.data, '$.complaintDetails.detailedDescription') LIKE ?
-            )
+        else:
+            # Show complaints with specific AI category
+            query += f"""
+            SELECT c.id AS complaint_id, tn.id AS note_id
+            FROM complaints c
+            INNER JOIN latest_tech_notes tn ON c.id = tn.complaint_id
+            WHERE json_extract(tn.data, '$.ai_analysis.openai_category') = ?
             """
-            params.extend([search_pattern, search_pattern, search_pattern])
-        
-        # Add time period filter
-        if time_period:
-            logger.info(f"Applying time period filter: {time_period}")
-            logger.info(f"SQL query before time filter: {query}")
-            
-            if time_period == '24h':
-                query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-1 day')"
-                logger.info("Applied 24 hours filter")
-            elif time_period == '1w':
-                query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-7 days')"
-                logger.info("Applied 1 week filter")
-            elif time_period == '30d':
-                query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-30 days')"
-                logger.info("Applied 30 days filter")
-            elif time_period == '3m':
-                query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-3 months')"
-                logger.info("Applied 3 months filter")
-            elif time_period == '6m':
-                query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-6 months')"
-                logger.info("Applied 6 months filter")
-            elif time_period == '1y':
-                query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-1 year')"
-                logger.info("Applied 1 year filter")
-            elif time_period == '2y':
-                query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-2 years')"
-                logger.info("Applied 2 years filter")
-            elif time_period.startswith('custom:'):
-                # Handle custom time periods like "7 months", "8 months", etc.
-                try:
-                    parts = time_period.split(':')
-                    if len(parts) >= 2:
-                        custom_period = parts[1]
-                        # Parse custom periods
-                        if 'month' in custom_period:
-                            months = int(''.join(filter(str.isdigit, custom_period)))
-                            query += f" AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-{months} months')"
-                            logger.info(f"Applied custom {months} months filter")
-                        elif 'week' in custom_period:
-                            weeks = int(''.join(filter(str.isdigit, custom_period)))
-                            query += f" AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-{weeks} weeks')"
-                            logger.info(f"Applied custom {weeks} weeks filter")
-                        elif 'day' in custom_period:
-                            days = int(''.join(filter(str.isdigit, custom_period)))
-                            query += f" AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-{days} days')"
-                            logger.info(f"Applied custom {days} days filter")
-                        elif 'year' in custom_period:
-                            years = int(''.join(filter(str.isdigit, custom_period)))
-                            query += f" AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) >= date('now', '-{years} years')"
-                            logger.info(f"Applied custom {years} years filter")
-                        else:
-                            # Fallback to date range
-                            start_date, end_date = time_period.split(':')[1:]
-                            query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) BETWEEN ? AND ?"
-                            params.extend([start_date, end_date])
-                            logger.info(f"Applied custom date range filter: {start_date} to {end_date}")
-                    else:
-                        # Fallback to date range
-                        start_date, end_date = time_period.split(':')[1:]
-                        query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) BETWEEN ? AND ?"
-                        params.extend([start_date, end_date])
-                        logger.info(f"Applied custom date range filter: {start_date} to {end_date}")
-                except Exception as e:
-                    logger.error(f"Error parsing custom time period: {e}")
-                    # Fallback to date range
-                    start_date, end_date = time_period.split(':')[1:]
-                    query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) BETWEEN ? AND ?"
-                    params.extend([start_date, end_date])
-                    logger.info(f"Applied custom date range filter: {start_date} to {end_date}")
-            
-            logger.info(f"SQL query after time filter: {query}")
-        
-        # Add country filter
-        if country:
-            query += " AND json_extract(c.data, '$.customerInformation.country') = ?"
-            params.append(country)
-        
-        # Add status filter (check if resolutionStatus exists, otherwise default to 'Not Resolved')
-        if status:
-            if status == 'Not Resolved':
-                # Most complaints without resolutionStatus are not resolved
-                query += " AND (json_extract(c.data, '$.complaintDetails.resolutionStatus') IS NULL OR json_extract(c.data, '$.complaintDetails.resolutionStatus') = 'Not Resolved')"
-            else:
-                query += " AND json_extract(c.data, '$.complaintDetails.resolutionStatus') = ?"
-                params.append(status)
-        
-        # Add warranty filter
-        if warranty:
-            query += " AND json_extract(c.data, '$.warrantyInformation.warrantyStatus') = ?"
-            params.append(warranty)
-        
-        # Add brand filter (using real brand field)
-        if brand:
-            query += " AND json_extract(c.data, '$.productInformation.brand') = ?"
-            params.append(brand)
-        
-        # Add has_notes filter
-        if has_notes:
-            query += " AND tn.id IS NOT NULL"
-        
-        # Get total count
-        count_query = f"""
-            SELECT COUNT(*)
-            FROM ({query})
+            params = [ai_category]
+    else:
+        query += f"""
+        SELECT c.id AS complaint_id, tn.id AS note_id
+        FROM complaints c
+        LEFT JOIN latest_tech_notes tn ON c.id = tn.complaint_id
+        WHERE 1=1
         """
-        
-        cursor.execute(count_query, params)
-        total_count = cursor.fetchone()[0]
-        
-        # Add pagination
-        query += " ORDER BY json_extract(c.data, '$.complaintDetails.dateOfComplaint') DESC"
-        query += " LIMIT ? OFFSET ?"
-        params.extend([items_per_page, (page - 1) * items_per_page])
-        
-        cursor.execute(query, params)
-        complaints = cursor.fetchall()
-        
-        # Convert sqlite3.Row objects to tuples and parse JSON data
-        result_complaints = []
-        for row in complaints:
-            complaint_id = row[0]
-            complaint_data = json.loads(row[1]) if isinstance(row[1], str) else row[1]
-            technical_notes = json.loads(row[2]) if row[2] and isinstance(row[2], str) else row[2]
-            result_complaints.append((complaint_id, complaint_data, technical_notes))
-        
-        logger.info(f"Query executed with {len(result_complaints)} results")
-        if result_complaints:
-            logger.info(f"First complaint ID: {result_complaints[0][0]}")
-            logger.info(f"First complaint date format: {result_complaints[0][1]['complaintDetails'].get('dateOfComplaint', 'NOT FOUND')}")
-        
-        cursor.close()
-        conn.close()
-        
-        return result_complaints, total_count
-        
-    except Exception as e:
-        logger.error(f"Error in get_all_complaints: {e}")
-        return [], 0
+        params = []
+    
+    # Add search filter
+    if search:
+        search_pattern = f"%{search}%"
+        query += """
+        AND (
+            json_extract(c.data, '$.customerInformation.fullName') LIKE ?
+            OR json_extract(c.data, '$.productInformation.modelNumber') LIKE ?
+            OR json_extract(c.data, '$.complaintDetails.detailedDescription') LIKE ?
+        )
+        """
+        params.extend([search_pattern, search_pattern, search_pattern])
+    
+    # Add time period filter
+    if period:
+        query += " AND date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) BETWEEN ? AND ?"
+        params.extend([period.start_date.isoformat(), period.end_date.isoformat()])
+    
+    # Add country filter
+    if country:
+        query += " AND json_extract(c.data, '$.customerInformation.country') = ?"
+        params.append(country)
+    
+    # Add status filter (check if resolutionStatus exists, otherwise default to 'Not Resolved')
+    if status:
+        if status == 'Not Resolved':
+            # Most complaints without resolutionStatus are not resolved
+            query += " AND (json_extract(c.data, '$.complaintDetails.resolutionStatus') IS NULL OR json_extract(c.data, '$.complaintDetails.resolutionStatus') = 'Not Resolved')"
+        else:
+            query += " AND json_extract(c.data, '$.complaintDetails.resolutionStatus') = ?"
+            params.append(status)
+    
+    # Add warranty filter
+    if warranty:
+        query += " AND json_extract(c.data, '$.warrantyInformation.warrantyStatus') = ?"
+        params.append(warranty)
+    
+    # Add brand filter (using real brand field)
+    if brand:
+        query += " AND json_extract(c.data, '$.productInformation.brand') = ?"
+        params.append(brand)
+    
+    # Add has_notes filter
+    if has_notes:
+        query += " AND tn.id IS NOT NULL"
+    
+    # Get total count
+    count_query = f"""
+        SELECT COUNT(*)
+        FROM ({query})
+    """
+    
+    cursor.execute(count_query, params)
+    total_count = cursor.fetchone()[0]
+    
+    # Add pagination
+    query += " ORDER BY json_extract(c.data, '$.complaintDetails.dateOfComplaint') DESC"
+    query += " LIMIT ? OFFSET ?"
+    params.extend([items_per_page, (page - 1) * items_per_page])
+    
+    # Sort and page on ids, then read the columns for this page's rows only
+    cursor.execute(f"""
+        SELECT {columns}
+        FROM ({query}) page
+        JOIN complaints c ON c.id = page.complaint_id
+        LEFT JOIN technical_notes tn ON tn.id = page.note_id
+        ORDER BY json_extract(c.data, '$.complaintDetails.dateOfComplaint') DESC
+    """, params)
+    return cursor.fetchall(), total_count
 
 def get_complaint_by_id(complaint_id):
     """Get a single complaint by its ID."""
     conn = connect_to_db()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT id, data FROM complaints WHERE id = ?", (complaint_id,))
+    cursor.execute(f"SELECT id, {document_sql()} FROM complaints WHERE id = ?", (complaint_id,))
     result = cursor.fetchone()
     
     if result:
         complaint_id = result[0]
-        complaint_data = json.loads(result[1]) if isinstance(result[1], str) else result[1]
+        complaint_data = json_codec.loads(result[1]) if isinstance(result[1], str) else result[1]
         result = (complaint_id, complaint_data)
     
     cursor.close()
@@ -528,6 +556,19 @@ def get_complaints_by_timeframe(start_date=None, end_date=None, timeframe='daily
     conn = connect_to_db()
     cursor = conn.cursor()
     
+    if normalized_schema.reads_enabled(conn):
+        if not (start_date and end_date):
+            start_date, end_date = datetime.now() - timedelta(days=30), datetime.now()
+        results = normalized_schema.complaints_by_timeframe(
+            cursor,
+            start_date.isoformat() if hasattr(start_date, 'isoformat') else str(start_date),
+            end_date.isoformat() if hasattr(end_date, 'isoformat') else str(end_date),
+            timeframe
+        )
+        cursor.close()
+        conn.close()
+        return results
+    
     if start_date and end_date:
         if timeframe == 'monthly':
             cursor.execute("""
@@ -589,6 +630,9 @@ def get_complaints_by_timeframe(start_date=None, end_date=None, timeframe='daily
 
 def create_time_chart(conn, timeframe='weekly', title="Complaints Over Time"):
     """Create a time-based chart for complaints with volatile patterns."""
+    import numpy as np
+    import pandas as pd
+    plt = _pyplot()
     cursor = conn.cursor()
     
     # Get some basic data to determine the date range
@@ -884,6 +928,7 @@ def create_time_chart(conn, timeframe='weekly', title="Complaints Over Time"):
 
 def create_bar_chart(data, title, x_label, y_label):
     """Create a bar chart."""
+    plt = _pyplot()
     plt.figure(figsize=(10, 6))
     
     labels = [row[0] for row in data]
@@ -909,6 +954,7 @@ def create_bar_chart(data, title, x_label, y_label):
 
 def create_pie_chart(data, title):
     """Create a pie chart."""
+    plt = _pyplot()
     plt.figure(figsize=(10, 6))
     
     labels = [row[0] for row in data]
@@ -931,6 +977,7 @@ def create_pie_chart(data, title):
 
 def create_issue_chart(issues, title="Top Issues"):
     """Create a bar chart for complaint issues."""
+    plt = _pyplot()
     plt.figure(figsize=(10, 6))
     
     # Check if we have any issues data
@@ -992,6 +1039,7 @@ def create_issue_chart(issues, title="Top Issues"):
 
 def create_warranty_chart(warranty_data, title="Warranty Status Distribution"):
     """Create a pie chart for warranty status distribution."""
+    plt = _pyplot()
     plt.figure(figsize=(8, 8))
     
     labels = [row[0] for row in warranty_data]
@@ -1021,12 +1069,12 @@ def get_technical_notes(complaint_id=None, parsed=False):
     cursor = conn.cursor()
     
     if complaint_id:
-        cursor.execute("""
-        SELECT id, complaint_id, data FROM technical_notes WHERE complaint_id = ?
+        cursor.execute(f"""
+        SELECT id, complaint_id, {document_sql()} FROM technical_notes WHERE complaint_id = ?
         """, (complaint_id,))
     else:
-        cursor.execute("""
-        SELECT id, complaint_id, data FROM technical_notes ORDER BY id DESC
+        cursor.execute(f"""
+        SELECT id, complaint_id, {document_sql()} FROM technical_notes ORDER BY id DESC
         """)
     
     results = cursor.fetchall()
@@ -1040,10 +1088,10 @@ def get_technical_notes(complaint_id=None, parsed=False):
         for note_id, note_complaint_id, note_data in results:
             if isinstance(note_data, str):
                 try:
-                    parsed_data = json.loads(note_data)
+                    parsed_data = json_codec.loads(note_data)
                     parsed_results.append((note_id, note_complaint_id, parsed_data))
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse JSON for technical note {note_id}")
+                except json_codec.JSONDecodeError:
+                    logger.warning(f"Could not parse JSON for technical note {note_id}")
                     continue
             else:
                 parsed_results.append((note_id, note_complaint_id, note_data))
@@ -1059,25 +1107,23 @@ def add_technical_note(complaint_id, note_data):
     # Ensure note_data is a dictionary
     if isinstance(note_data, str):
         try:
-            note_data = json.loads(note_data)
-        except json.JSONDecodeError:
-            print(f"Error: Could not parse note_data as JSON")
+            note_data = json_codec.loads(note_data)
+        except json_codec.JSONDecodeError:
+            logger.error("Could not parse note_data as JSON")
             return False
     
-    print(f"Note data type: {type(note_data)}")
-    
     # Get complaint data to generate AI analysis
-    cursor.execute("SELECT data FROM complaints WHERE id = ?", (complaint_id,))
+    cursor.execute(f"SELECT {document_sql()} FROM complaints WHERE id = ?", (complaint_id,))
     complaint_data_raw = cursor.fetchone()[0]
     
     # Parse complaint data if it's a string
     if isinstance(complaint_data_raw, str):
-        complaint_data = json.loads(complaint_data_raw)
+        complaint_data = json_codec.loads(complaint_data_raw)
     else:
         complaint_data = complaint_data_raw
     
     # Get existing technical notes
-    cursor.execute("SELECT id, complaint_id, data FROM technical_notes WHERE complaint_id = ?", (complaint_id,))
+    cursor.execute(f"SELECT id, complaint_id, {document_sql()} FROM technical_notes WHERE complaint_id = ?", (complaint_id,))
     existing_notes_raw = cursor.fetchall()
     
     # Parse technical notes data
@@ -1085,10 +1131,10 @@ def add_technical_note(complaint_id, note_data):
     for note_id, note_complaint_id, existing_note_data in existing_notes_raw:
         if isinstance(existing_note_data, str):
             try:
-                parsed_note_data = json.loads(existing_note_data)
+                parsed_note_data = json_codec.loads(existing_note_data)
                 existing_notes.append((note_id, note_complaint_id, parsed_note_data))
-            except json.JSONDecodeError:
-                print(f"Warning: Could not parse JSON for technical note {note_id}")
+            except json_codec.JSONDecodeError:
+                logger.warning(f"Could not parse JSON for technical note {note_id}")
                 continue
         else:
             existing_notes.append((note_id, note_complaint_id, existing_note_data))
@@ -1100,9 +1146,9 @@ def add_technical_note(complaint_id, note_data):
     note_data['ai_analysis'] = ai_analysis
     
     # First, add the technical note
-    cursor.execute("""
-    INSERT INTO technical_notes (complaint_id, data) VALUES (?, ?)
-    """, (complaint_id, json.dumps(note_data)))
+    cursor.execute(f"""
+    INSERT INTO technical_notes (complaint_id, data) VALUES (?, {document_param()})
+    """, (complaint_id, json_codec.dumps(note_data)))
     
     new_id = cursor.lastrowid
     
@@ -1117,17 +1163,17 @@ def add_technical_note(complaint_id, note_data):
     
     # Update the complaint's resolution status
         # For SQLite, we need to update the JSON data differently
-    cursor.execute("SELECT data FROM complaints WHERE id = ?", (complaint_id,))
+    cursor.execute(f"SELECT {document_sql()} FROM complaints WHERE id = ?", (complaint_id,))
     complaint_data_for_update = cursor.fetchone()[0]
-    complaint_data_for_update = json.loads(complaint_data_for_update) if isinstance(complaint_data_for_update, str) else complaint_data_for_update
+    complaint_data_for_update = json_codec.loads(complaint_data_for_update) if isinstance(complaint_data_for_update, str) else complaint_data_for_update
     
     if 'complaintDetails' not in complaint_data_for_update:
         complaint_data_for_update['complaintDetails'] = {}
     complaint_data_for_update['complaintDetails']['resolutionStatus'] = resolution_status
     
-    cursor.execute("""
-    UPDATE complaints SET data = ? WHERE id = ?
-    """, (json.dumps(complaint_data_for_update), complaint_id))
+    cursor.execute(f"""
+    UPDATE complaints SET data = {document_param()} WHERE id = ?
+    """, (json_codec.dumps(complaint_data_for_update), complaint_id))
     
     conn.commit()
     cursor.close()
@@ -1155,8 +1201,6 @@ def setup_technical_notes_table():
 
 # Generate AI analysis based on complaint and technical notes
 def generate_ai_analysis(complaint_data, technical_notes):
-    global client  # Use the global client variable initialized at the top of the file
-    
     # Extract keywords from customer complaint for better matching
     problem_types = complaint_data['complaintDetails']['natureOfProblem']
     customer_description = complaint_data['complaintDetails']['detailedDescription'].lower()
@@ -1215,11 +1259,8 @@ def generate_ai_analysis(complaint_data, technical_notes):
                 customer_category = "ICE MAKER FAILURE"
                 break
     
-    # Debug logs to check category detection
-    print(f"Customer name: {complaint_data['customerInformation']['fullName']}")
-    print(f"Nature of problem: {problem_types}")
-    print(f"Customer description: {customer_description}")
-    print(f"Detected customer category: {customer_category}")
+    # Customer text stays out of the logs; only the outcome is recorded
+    hot_logger.debug("Detected customer category: %s", customer_category)
                 
     # Check technical notes for error codes/specific issues
     tech_category = None
@@ -1227,18 +1268,13 @@ def generate_ai_analysis(complaint_data, technical_notes):
     if technical_notes:
         for note_id, complaint_id, note_data in technical_notes:
             fault_diagnosis = note_data.get('technicalAssessment', {}).get('faultDiagnosis', '').lower()
-            root_cause = note_data.get('technicalAssessment', {}).get('rootCause', '').lower()
             components = [c.lower() for c in note_data.get('technicalAssessment', {}).get('componentInspected', [])]
-            
-            print(f"Technical note id: {note_id}")
-            print(f"Fault diagnosis: {fault_diagnosis}")
-            print(f"Root cause: {root_cause}")
-            print(f"Components inspected: {components}")
+
                         
             # Check for specific Angela Best case
             if complaint_data['customerInformation']['fullName'] == 'Angela Best' and 'fan motor' in components:
                 tech_category = "EVAPORATOR FAN MALFUNCTION"
-                print(f"Special case detected for Angela Best - setting tech_category to {tech_category}")
+                hot_logger.debug("Special case detected for complaint with note %s - setting tech_category to %s", note_id, tech_category)
             
             # Determine technician-identified issue
             if any(word in fault_diagnosis for word in ["noise", "sound"]) and any(word in fault_diagnosis for word in ["gas", "injection"]):
@@ -1270,7 +1306,7 @@ def generate_ai_analysis(complaint_data, technical_notes):
             if "fan motor" in components and not tech_category:
                 tech_category = "EVAPORATOR FAN MALFUNCTION"
                 
-    print(f"Detected technician category: {tech_category}")
+    hot_logger.debug("Detected technician category: %s", tech_category)
     
     # Check for inconsistencies between customer complaint and technical assessment
     if tech_category and customer_category and "UNKNOWN" not in customer_category:
@@ -1296,7 +1332,7 @@ def generate_ai_analysis(complaint_data, technical_notes):
        'LIGHTING' in customer_category and technical_notes:
         tech_category = "EVAPORATOR FAN MALFUNCTION"
         has_inconsistency = True
-        print(f"Forcing inconsistency for Angela Best: customer_category={customer_category}, tech_category={tech_category}")
+        hot_logger.debug("Forcing inconsistency: customer_category=%s, tech_category=%s", customer_category, tech_category)
     
     # Decide which category to use for the final opinion
     # If we have an inconsistency, we need to address both issues
@@ -1385,20 +1421,18 @@ The technician's assessment of {tech_category.lower()} is supported by the diagn
         ]
     
     # If OpenAI client is not initialized, return default response
-    global client  # Use the global client variable that was initialized at the top of the file
+    client = get_openai_client()
     if client is None:
-        print("OpenAI client not initialized, returning default response")
-        print("Current global client value:", client)
+        hot_logger.debug("OpenAI client not initialized, returning default response")
         return default_response
         
     try:
-        print("Attempting to call OpenAI API...")
-        print(f"OpenAI client object: {type(client)}")
+        hot_logger.debug("Attempting to call OpenAI API...")
         
         # Double-check API key availability
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
-            print("No API key found in environment, cannot make OpenAI call")
+            logger.warning("No API key found in environment, cannot make OpenAI call")
             return default_response
             
         # Create a clear summary of the complaint and technical notes
@@ -1465,16 +1499,16 @@ CONFIDENCE: (level and explanation)"""}
 
         try:
             # Use the v1.0.0+ client approach
-            print("Using modern OpenAI client (v1.0.0+)")
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                temperature=0,
-                messages=messages
-            )
+            with openai_call('ai_analysis') as call:
+                response = client.chat.completions.create(
+                    model="gpt-4o",
+                    temperature=0,
+                    messages=messages
+                )
+                call.record_usage(response.usage)
             ai_text = response.choices[0].message.content
                 
-            print("OpenAI API call successful")
-            print(f"Response: {ai_text[:100]}...")
+            hot_logger.debug("OpenAI API call successful (%d characters)", len(ai_text))
             
             # Parse the response to extract the category
             openai_category = "Unknown"
@@ -1489,7 +1523,7 @@ CONFIDENCE: (level and explanation)"""}
                         openai_category = category_text
                     break
             
-            print(f"Extracted OpenAI category: {openai_category}")
+            hot_logger.debug("Extracted OpenAI category: %s", openai_category)
             
             # Use the existing default_response structure but update with OpenAI's category
             analysis = {
@@ -1506,13 +1540,11 @@ CONFIDENCE: (level and explanation)"""}
             return analysis
             
         except Exception as e:
-            print(f"Error in OpenAI API call: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error in OpenAI API call: {e}")
             return default_response
             
     except Exception as e:
-        print(f"Error generating AI analysis: {str(e)}")
+        logger.error(f"Error generating AI analysis: {e}")
         return default_response
 
 # Add these functions before your routes
@@ -1563,66 +1595,55 @@ def index():
         return redirect(url_for('login'))
     return redirect(url_for('list_complaints'))
 
+def complaint_list_filters():
+    """Read the complaint list filters from the query string."""
+    filters = dict(
+        search=request.args.get('search', ''),
+        time_period=request.args.get('time_period', ''),
+        has_notes=request.args.get('has_notes') == 'true',
+        country=request.args.get('country', ''),
+        status=request.args.get('status', ''),
+        warranty=request.args.get('warranty', ''),
+        ai_category=request.args.get('ai_category', ''),
+        brand=request.args.get('brand', ''),
+    )
+    # Handle custom date range
+    if not filters['time_period'] and request.args.get('start_date') and request.args.get('end_date'):
+        filters['time_period'] = f"custom:{request.args.get('start_date')}:{request.args.get('end_date')}"
+    return filters
+
+def get_facet_counts(conn, time_period=None, **filters):
+    """Return (total, {facet: {value: count}}) for the complaint list filters (see facets.facet_counts)."""
+    period = parse_filter_period(time_period) if time_period else None
+    return facet_cache.counts(conn, period=period, **filters)
+
 @app.route('/complaints')
 @login_required
 def list_complaints():
     try:
         page = int(request.args.get('page', 1))
-        search = request.args.get('search', '')
-        time_period = request.args.get('time_period', '')
-        has_notes = request.args.get('has_notes') == 'true'
-        country = request.args.get('country', '')
-        status = request.args.get('status', '')
-        warranty = request.args.get('warranty', '')
-        ai_category = request.args.get('ai_category', '')
-        brand = request.args.get('brand', '')
+        filters = complaint_list_filters()
+        search = filters['search']
+        time_period = filters['time_period']
+        has_notes = filters['has_notes']
+        country = filters['country']
+        status = filters['status']
+        warranty = filters['warranty']
+        ai_category = filters['ai_category']
+        brand = filters['brand']
         
         # Check if this is a reset (no filters) and page=1
-        is_reset = (not search and not time_period and not has_notes and not country and 
-                   not status and not warranty and not ai_category and not brand and page == 1)
-        
-        # Handle custom date range
-        if not time_period and request.args.get('start_date') and request.args.get('end_date'):
-            time_period = f"custom:{request.args.get('start_date')}:{request.args.get('end_date')}"
+        is_reset = (not any(filters.values()) and page == 1)
         
-        # Get unique countries for the dropdown
+        # Dropdown values, and how many complaints each would list with the
+        # other filters kept, cached until the database changes
         conn = connect_to_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT DISTINCT json_extract(data, '$.customerInformation.country') as country
-            FROM complaints
-            WHERE json_extract(data, '$.customerInformation.country') IS NOT NULL
-            AND json_extract(data, '$.customerInformation.country') != ''
-            ORDER BY country
-        """)
-        countries = [row[0] for row in cursor.fetchall() if row[0]]
-        
-        # Get unique brands from brand field
-        cursor.execute("""
-            SELECT DISTINCT json_extract(data, '$.productInformation.brand') as brand
-            FROM complaints
-            WHERE json_extract(data, '$.productInformation.brand') IS NOT NULL
-            AND json_extract(data, '$.productInformation.brand') != ''
-            ORDER BY brand
-        """)
-        brands = [row[0] for row in cursor.fetchall() if row[0]]
-        
-        # Get unique AI Categories for the dropdown from technical notes
-        cursor.execute("""
-            SELECT DISTINCT json_extract(data, '$.ai_analysis.openai_category') as category
-            FROM technical_notes
-            WHERE json_extract(data, '$.ai_analysis.openai_category') IS NOT NULL
-            AND json_extract(data, '$.ai_analysis.openai_category') != ''
-            AND json_extract(data, '$.ai_analysis.openai_category') != 'NO AI PREDICTION AVAILABLE'
-            ORDER BY category
-        """)
-        ai_categories_from_db = [row[0] for row in cursor.fetchall() if row[0]]
-        
-        # Add "No Analysis" for complaints without technical notes
-        ai_categories = ai_categories_from_db + ['No Analysis']
-        
-        cursor.close()
+        facets = facet_cache.get(conn)
+        _, facet_counts = get_facet_counts(conn, **filters)
         conn.close()
+        countries = facets['country']
+        brands = facets['brand']
+        ai_categories = facets['ai_category']
         
         complaints, total_count = get_all_complaints(
             page=page, 
@@ -1634,7 +1655,8 @@ def list_complaints():
             warranty=warranty,
             ai_category=ai_category,
             brand=brand,
-            items_per_page=100  # Increase to show 100 items per page
+            items_per_page=100,  # Increase to show 100 items per page
+            projection='list'
         )
         
         total_pages = (total_count + 99) // 100  # 100 items per page
@@ -1653,6 +1675,7 @@ def list_complaints():
                              countries=countries,
                              brands=brands,
                              ai_categories=ai_categories,
+                             facet_counts=facet_counts,
                              selected_country=country,
                              selected_status=status,
                              selected_warranty=warranty,
@@ -1660,7 +1683,7 @@ def list_complaints():
                              selected_brand=brand)
                              
     except Exception as e:
-        print(f"Error in list_complaints: {e}")
+        logger.exception(f"Error in list_complaints: {e}")
         flash('Database connection error. Please check your configuration.', 'error')
         # Return empty template instead of redirect to avoid loops
         return render_template('complaints.html',
@@ -1674,49 +1697,130 @@ def list_complaints():
                              countries=[],
                              brands=[],
                              ai_categories=[],
+                             facet_counts={facet: {} for facet in FACETS},
                              selected_country='',
                              selected_status='',
                              selected_warranty='',
                              selected_ai_category='',
                              selected_brand='')
 
+@app.route('/api/complaints/facets')
+@login_required
+def complaint_facets_api():
+    """Per-facet counts for the complaint list filters in the query string."""
+    conn = None
+    try:
+        conn = connect_to_db()
+        total, facet_counts = get_facet_counts(conn, **complaint_list_filters())
+        return jsonify({
+            'total': total,
+            'facets': {facet: [{'value': value, 'count': count} for value, count in counts.items()]
+                       for facet, counts in facet_counts.items()},
+        })
+    except Exception as e:
+        logger.error(f"Error in complaint_facets_api: {e}")
+        return jsonify({'error': 'Failed to count complaint facets'}), 500
+    finally:
+        if conn:
+            conn.close()
+
+# Page sizes accepted by /api/complaints
+API_DEFAULT_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 500
+
+def complaint_summary(row):
+    """JSON for a ComplaintListRow."""
+    summary = row._asdict()
+    summary['date'] = (summary.pop('date_of_complaint') or '').split('T')[0]
+    summary['has_notes'] = bool(row.has_notes)
+    return summary
+
+def complaint_list_etag(filters, page, per_page):
+    """ETag for one page of the complaint list, or None if the database has no data_changes counter."""
+    changes = data_version.changes()
+    if changes is None:
+        return None
+    # Relative periods ('30d') are resolved to dates, so their pages expire at midnight
+    period = parse_filter_period(filters['time_period']) if filters['time_period'] else None
+    signature = json_codec.dumps({**filters, 'time_period': period and [period.start_date, period.end_date],
+                                  'page': page, 'per_page': per_page}, sort_keys=True)
+    database_id, version = changes
+    return f"{database_id}-{version}-{hashlib.sha1(signature.encode()).hexdigest()[:16]}"
+
+@app.route('/api/complaints')
+@login_required
+def complaints_api():
+    """One page of the complaint list as JSON, answering 304 when the client's copy is current."""
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', API_DEFAULT_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+    
+    conn = None
+    try:
+        filters = complaint_list_filters()
+        # Taken before the query: a write landing meanwhile makes the next poll refetch
+        etag = complaint_list_etag(filters, page, per_page)
+        if etag and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            conn = connect_to_db()
+            complaints, total_count = fetch_complaints(conn, page, per_page, projection='list', **filters)
+            response = jsonify({
+                'complaints': [complaint_summary(row) for row in complaints],
+                'page': page,
+                'per_page': per_page,
+                'total_count': total_count,
+                'total_pages': (total_count + per_page - 1) // per_page,
+            })
+    except Exception as e:
+        logger.error(f"Error in complaints_api: {e}")
+        return jsonify({'error': 'Failed to load complaints'}), 500
+    finally:
+        if conn:
+            conn.close()
+    
+    if etag:
+        response.set_etag(etag)
+    # Logged-in data: browsers may keep it but must revalidate every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @app.route('/complaints/<int:complaint_id>/unified', methods=['GET', 'POST'])
 @login_required
 def unified_complaint(complaint_id):
     try:
-        print(f"Attempting to fetch complaint {complaint_id}")
+        hot_logger.debug("Attempting to fetch complaint %s", complaint_id)
         # Connect to the database
         try:
             conn = connect_to_db()
             cursor = conn.cursor()
-            print("Database connection successful")
         except Exception as e:
-            print(f"Database connection error: {str(e)}")
+            logger.error(f"Database connection error: {e}")
             flash('Database connection error', 'danger')
             return redirect(url_for('list_complaints'))
         
         # Fetch the complaint data
         try:
-            cursor.execute("""
-                SELECT id, data FROM complaints WHERE id = ?
+            cursor.execute(f"""
+                SELECT id, {document_sql()} FROM complaints WHERE id = ?
             """, (complaint_id,))
             result = cursor.fetchone()
-            print(f"Query result: {result}")
             
             if not result:
-                print(f"Complaint {complaint_id} not found")
+                logger.info(f"Complaint {complaint_id} not found")
                 flash('Complaint not found', 'danger')
                 return redirect(url_for('list_complaints'))
                 
-            print(f"Found complaint {complaint_id}")
             complaint_id, complaint_data = result
             
             # Parse JSON data if it's a string
             if isinstance(complaint_data, str):
                 try:
-                    complaint_data = json.loads(complaint_data)
-                except json.JSONDecodeError as e:
-                    print(f"JSON decode error: {e}")
+                    complaint_data = json_codec.loads(complaint_data)
+                except json_codec.JSONDecodeError as e:
+                    logger.error(f"JSON decode error in complaint {complaint_id}: {e}")
                     flash('Invalid complaint data format', 'danger')
                     return redirect(url_for('list_complaints'))
             
@@ -1724,14 +1828,14 @@ def unified_complaint(complaint_id):
             required_fields = ['customerInformation', 'productInformation', 'complaintDetails']
             for field in required_fields:
                 if field not in complaint_data:
-                    print(f"Missing required field: {field}")
+                    logger.error(f"Complaint {complaint_id} is missing required field: {field}")
                     flash(f'Invalid complaint data structure: missing {field}', 'danger')
                     return redirect(url_for('list_complaints'))
             
             complaint = (complaint_id, complaint_data)
             
         except Exception as e:
-            print(f"Database query error: {str(e)}")
+            logger.error(f"Database query error: {e}")
             flash('Error fetching complaint data', 'danger')
             return redirect(url_for('list_complaints'))
         
@@ -1812,27 +1916,27 @@ def unified_complaint(complaint_id):
                 return redirect(url_for('unified_complaint', complaint_id=complaint_id))
                 
             except Exception as e:
-                print(f"Error processing POST request: {str(e)}")
+                logger.exception(f"Error processing POST request: {e}")
                 flash('Error processing technical assessment', 'danger')
                 return redirect(url_for('unified_complaint', complaint_id=complaint_id))
         
         try:
             # Fetch technical notes for this complaint
-            cursor.execute("""
-                SELECT id, complaint_id, data FROM technical_notes WHERE complaint_id = ? ORDER BY json_extract(data, '$.visitDate') DESC
+            cursor.execute(f"""
+                SELECT id, complaint_id, {document_sql()} FROM technical_notes WHERE complaint_id = ? ORDER BY json_extract(data, '$.visitDate') DESC
             """, (complaint_id,))
             
             technical_notes = cursor.fetchall()
-            print(f"Found {len(technical_notes)} technical notes")
+            hot_logger.debug("Found %d technical notes", len(technical_notes))
             
             # Parse JSON data for technical notes
             parsed_technical_notes = []
             for note_id, note_complaint_id, note_data in technical_notes:
                 if isinstance(note_data, str):
                     try:
-                        note_data = json.loads(note_data)
-                    except json.JSONDecodeError:
-                        print(f"Warning: Could not parse JSON for technical note {note_id}")
+                        note_data = json_codec.loads(note_data)
+                    except json_codec.JSONDecodeError:
+                        logger.warning(f"Could not parse JSON for technical note {note_id}")
                         continue
                 parsed_technical_notes.append((note_id, note_complaint_id, note_data))
             
@@ -1850,18 +1954,109 @@ def unified_complaint(complaint_id):
                               ai_analysis=ai_analysis)
                               
         except Exception as e:
-            print(f"Error rendering template: {str(e)}")
+            logger.exception(f"Error rendering template: {e}")
             flash('Error rendering complaint view', 'danger')
             return redirect(url_for('list_complaints'))
     
     except Exception as e:
-        print(f"Unexpected error in unified_complaint: {str(e)}")
+        logger.exception(f"Unexpected error in unified_complaint: {e}")
         flash(f'Error retrieving complaint: {str(e)}', 'danger')
         return redirect(url_for('list_complaints'))
 
+def get_period_statistics(cursor, start_date_str, end_date_str, has_notes=False):
+    """Statistics page figures for complaints dated between two YYYY-MM-DD days, read from the JSON documents."""
+    # Base WHERE clause for SQLite
+    base_where = """
+        WHERE date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
+        AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
+    """
+    base_params = [start_date_str, end_date_str]
+
+    # Add technical notes filter if requested
+    if has_notes:
+        base_where += " AND EXISTS(SELECT 1 FROM technical_notes WHERE complaint_id = c.id)"
+
+    # Get total complaints for the selected time period
+    cursor.execute(f"SELECT COUNT(*) FROM complaints c {base_where}", base_params)
+    total_complaints = cursor.fetchone()[0]
+
+    # Get active warranty count for the selected time period
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM complaints c {base_where}
+        AND json_extract(data, '$.warrantyInformation.warrantyStatus') = 'Active'
+    """, base_params)
+    active_warranty = cursor.fetchone()[0]
+
+    # Get resolution rate for the selected time period
+    cursor.execute(f"""
+        SELECT 
+            ROUND(
+                CAST(SUM(CASE WHEN json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved' THEN 1 ELSE 0 END) AS REAL) / 
+                NULLIF(COUNT(*), 0) * 100, 
+                1
+            )
+        FROM complaints c {base_where}
+    """, base_params)
+    resolution_rate = cursor.fetchone()[0] or 0.0
+
+    # Get problem distribution - simplified for SQLite
+    cursor.execute(f"""
+        SELECT 
+            json_extract(data, '$.complaintDetails.natureOfProblem') as problems,
+            COUNT(*) as count
+        FROM complaints c {base_where}
+        AND json_extract(data, '$.complaintDetails.natureOfProblem') IS NOT NULL
+        GROUP BY problems
+        ORDER BY count DESC
+    """, base_params)
+    
+    # Process problem distribution
+    problem_distribution = {}
+    rows = cursor.fetchall()
+    
+    for problems_json, count in rows:
+        if problems_json:
+            try:
+                problems = json_codec.loads(problems_json) if isinstance(problems_json, str) else problems_json
+                if isinstance(problems, list):
+                    for problem in problems:
+                        problem_distribution[problem] = problem_distribution.get(problem, 0) + count
+                elif isinstance(problems, str):
+                    problem_distribution[problems] = problem_distribution.get(problems, 0) + count
+            except (json_codec.JSONDecodeError, TypeError):
+                continue
+    
+    # Convert to list of tuples for template
+    problem_distribution = sorted(problem_distribution.items(), key=lambda x: x[1], reverse=True)
+
+    # Get warranty distribution
+    cursor.execute(f"""
+        SELECT 
+            CASE 
+                WHEN json_extract(data, '$.warrantyInformation.warrantyStatus') = 'Active' THEN 'Active'
+                ELSE 'Expired'
+            END as status,
+            COUNT(*) as count
+        FROM complaints c {base_where}
+        GROUP BY status
+        ORDER BY count DESC
+    """, base_params)
+    warranty_distribution = cursor.fetchall()
+
+    return {
+        'total_complaints': total_complaints,
+        'active_warranty': active_warranty,
+        'resolution_rate': resolution_rate,
+        'problem_distribution': problem_distribution,
+        'warranty_distribution': warranty_distribution,
+    }
+
 @app.route('/statistics')
 @login_required
 def statistics():
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
     try:
         conn = connect_to_db()
         cursor = conn.cursor()
@@ -1870,138 +2065,27 @@ def statistics():
         time_period = request.args.get('time_period', '30d')
         has_notes = request.args.get('has_notes') == 'true'
         
-        # Handle custom date range
+        # Handle custom date range, falling back to the last 30 days for unrecognized periods
         if request.args.get('start_date') and request.args.get('end_date'):
-            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d')
-            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d')
+            period = parse_filter_period(f"custom:{request.args.get('start_date')}:{request.args.get('end_date')}")
         else:
-            # Calculate date range based on time period
-            end_date = datetime.now()
-            if time_period == 'all':
-                start_date = datetime(2000, 1, 1)
-            elif time_period == '24h':
-                start_date = end_date - timedelta(days=1)
-            elif time_period == '1w':
-                start_date = end_date - timedelta(weeks=1)
-            elif time_period == '30d':
-                start_date = end_date - timedelta(days=30)
-            elif time_period == '3m':
-                start_date = end_date - timedelta(days=90)
-            elif time_period == '6m':
-                start_date = end_date - timedelta(days=180)
-            elif time_period == '1y':
-                start_date = end_date - timedelta(days=365)
-            elif time_period == '2y':
-                start_date = end_date - timedelta(days=730)
-            elif time_period.startswith('custom:'):
-                # Handle custom time periods like "7 months", "8 months", etc.
-                try:
-                    parts = time_period.split(':')
-                    if len(parts) >= 2:
-                        custom_period = parts[1]
-                        # Parse custom periods
-                        if 'month' in custom_period:
-                            months = int(''.join(filter(str.isdigit, custom_period)))
-                            start_date = end_date - timedelta(days=months * 30)
-                        elif 'week' in custom_period:
-                            weeks = int(''.join(filter(str.isdigit, custom_period)))
-                            start_date = end_date - timedelta(weeks=weeks)
-                        elif 'day' in custom_period:
-                            days = int(''.join(filter(str.isdigit, custom_period)))
-                            start_date = end_date - timedelta(days=days)
-                        elif 'year' in custom_period:
-                            years = int(''.join(filter(str.isdigit, custom_period)))
-                            start_date = end_date - timedelta(days=years * 365)
-                        else:
-                            start_date = end_date - timedelta(days=30)
-                    else:
-                        start_date = end_date - timedelta(days=30)
-                except:
-                    start_date = end_date - timedelta(days=30)
-            else:
-                start_date = end_date - timedelta(days=30)
+            period = parse_filter_period(time_period)
+        period = period or parse_filter_period('30d')
+        start_date, end_date = period.as_datetimes()
 
         # Base parameters for SQLite queries
         start_date_str = start_date.strftime('%Y-%m-%d')
         end_date_str = end_date.strftime('%Y-%m-%d')
 
-        # Base WHERE clause for SQLite
-        base_where = """
-            WHERE date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
-            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
-        """
-        base_params = [start_date_str, end_date_str]
-
-        # Add technical notes filter if requested
-        if has_notes:
-            base_where += " AND EXISTS(SELECT 1 FROM technical_notes WHERE complaint_id = c.id)"
-
-        # Get total complaints for the selected time period
-        cursor.execute(f"SELECT COUNT(*) FROM complaints c {base_where}", base_params)
-        total_complaints = cursor.fetchone()[0]
-
-        # Get active warranty count for the selected time period
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM complaints c {base_where}
-            AND json_extract(data, '$.warrantyInformation.warrantyStatus') = 'Active'
-        """, base_params)
-        active_warranty = cursor.fetchone()[0]
-
-        # Get resolution rate for the selected time period
-        cursor.execute(f"""
-            SELECT 
-                ROUND(
-                    CAST(SUM(CASE WHEN json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved' THEN 1 ELSE 0 END) AS REAL) / 
-                    NULLIF(COUNT(*), 0) * 100, 
-                    1
-                )
-            FROM complaints c {base_where}
-        """, base_params)
-        resolution_rate = cursor.fetchone()[0] or 0.0
-
-        # Get problem distribution - simplified for SQLite
-        cursor.execute(f"""
-            SELECT 
-                json_extract(data, '$.complaintDetails.natureOfProblem') as problems,
-                COUNT(*) as count
-            FROM complaints c {base_where}
-            AND json_extract(data, '$.complaintDetails.natureOfProblem') IS NOT NULL
-            GROUP BY problems
-            ORDER BY count DESC
-        """, base_params)
-        
-        # Process problem distribution
-        problem_distribution = {}
-        rows = cursor.fetchall()
-        
-        for problems_json, count in rows:
-            if problems_json:
-                try:
-                    problems = json.loads(problems_json) if isinstance(problems_json, str) else problems_json
-                    if isinstance(problems, list):
-                        for problem in problems:
-                            problem_distribution[problem] = problem_distribution.get(problem, 0) + count
-                    elif isinstance(problems, str):
-                        problem_distribution[problems] = problem_distribution.get(problems, 0) + count
-                except (json.JSONDecodeError, TypeError):
-                    continue
-        
-        # Convert to list of tuples for template
-        problem_distribution = sorted(problem_distribution.items(), key=lambda x: x[1], reverse=True)
-
-        # Get warranty distribution
-        cursor.execute(f"""
-            SELECT 
-                CASE 
-                    WHEN json_extract(data, '$.warrantyInformation.warrantyStatus') = 'Active' THEN 'Active'
-                    ELSE 'Expired'
-                END as status,
-                COUNT(*) as count
-            FROM complaints c {base_where}
-            GROUP BY status
-            ORDER BY count DESC
-        """, base_params)
-        warranty_distribution = cursor.fetchall()
+        if normalized_schema.reads_enabled(conn):
+            stats = normalized_schema.period_statistics(cursor, start_date_str, end_date_str, has_notes)
+        else:
+            stats = get_period_statistics(cursor, start_date_str, end_date_str, has_notes)
+        total_complaints = stats['total_complaints']
+        active_warranty = stats['active_warranty']
+        resolution_rate = stats['resolution_rate']
+        problem_distribution = stats['problem_distribution']
+        warranty_distribution = stats['warranty_distribution']
 
         # Create interactive plots using Plotly
         # Problem Distribution Plot
@@ -2068,7 +2152,7 @@ def statistics():
                     align='center'
                 )]
             )
-        problem_plot = json.dumps(problem_fig, cls=plotly.utils.PlotlyJSONEncoder)
+        problem_plot = json_codec.plotly_json(problem_fig)
 
         # Warranty Distribution Plot
         if warranty_distribution and len(warranty_distribution) > 0:
@@ -2106,7 +2190,7 @@ def statistics():
                     align='center'
                 )]
             )
-        warranty_plot = json.dumps(warranty_fig, cls=plotly.utils.PlotlyJSONEncoder)
+        warranty_plot = json_codec.plotly_json(warranty_fig)
 
         # Daily Trend Plot
         daily_data = get_complaints_by_timeframe(start_date, end_date)
@@ -2159,7 +2243,7 @@ def statistics():
                     align='center'
                 )]
             )
-        daily_plot = json.dumps(daily_fig, cls=plotly.utils.PlotlyJSONEncoder)
+        daily_plot = json_codec.plotly_json(daily_fig)
 
         # Monthly Trend Plot
         monthly_data = get_complaints_by_timeframe(start_date, end_date, timeframe='monthly')
@@ -2199,7 +2283,7 @@ def statistics():
                     align='center'
                 )]
             )
-        monthly_plot = json.dumps(monthly_fig, cls=plotly.utils.PlotlyJSONEncoder)
+        monthly_plot = json_codec.plotly_json(monthly_fig)
 
         cursor.close()
         conn.close()
@@ -2215,7 +2299,7 @@ def statistics():
                              monthly_plot=monthly_plot)
 
     except Exception as e:
-        print(f"Error in statistics route: {e}")
+        logger.exception(f"Error in statistics route: {e}")
         flash('An error occurred while loading statistics.', 'error')
         return redirect(url_for('index'))
 
@@ -2251,13 +2335,15 @@ def batch_process_complaints():
         # Get filtered complaints that have technical notes
         logger.debug("Fetching filtered complaints with technical notes...")
         
-        # Get all complaints that match the filters without pagination
+        # Get all complaints that match the filters without pagination, as
+        # records that keep each document undecoded until it is processed
         filtered_complaints, total_count = get_all_complaints(
             page=1, 
             items_per_page=10000,  # Set a high limit to get all complaints
             search=search, 
             time_period=time_period, 
-            has_notes=True  # Always filter for complaints with technical notes
+            has_notes=True,  # Always filter for complaints with technical notes
+            projection='records'
         )
         
         logger.debug(f"Found {len(filtered_complaints)} filtered complaints with technical notes")
@@ -2266,31 +2352,25 @@ def batch_process_complaints():
         skipped_count = 0
         total_complaints = len(filtered_complaints)
         
-        for complaint_id, complaint_data, has_technical_notes in filtered_complaints:
+        for complaint in filtered_complaints:
+            complaint_id = complaint.id
             try:
-                # Get the technical notes for this complaint
-                technical_notes = get_technical_notes(complaint_id)
-                
-                if not technical_notes:
+                # The record carries the most recent technical note
+                latest_note = complaint.note
+                if latest_note is None:
                     logger.debug(f"No technical notes found for complaint {complaint_id}, skipping")
                     skipped_count += 1
                     continue
                 
-                # Get the most recent technical note
-                latest_note_id, _, latest_note_data = technical_notes[0]
-                
-                # Check if we should skip this complaint
-                if not regenerate_all and latest_note_data.get('ai_analysis'):
-                    # For non-regeneration, only skip if there's a valid OpenAI category
-                    current_ai_analysis = latest_note_data.get('ai_analysis', {})
-                    current_openai_category = current_ai_analysis.get('openai_category', '')
-                    if current_openai_category and current_openai_category != "NO AI PREDICTION AVAILABLE":
-                        logger.debug(f"Complaint {complaint_id} already has valid OpenAI category, skipping")
-                        skipped_count += 1
-                        continue
+                # For non-regeneration, only skip if there's a valid OpenAI category
+                if not regenerate_all and latest_note.ai_analysis and latest_note.ai_analysis.has_prediction:
+                    logger.debug(f"Complaint {complaint_id} already has valid OpenAI category, skipping")
+                    skipped_count += 1
+                    continue
                 
                 # Generate AI analysis
-                ai_analysis = generate_ai_analysis(complaint_data, technical_notes)
+                technical_notes = get_technical_notes(complaint_id, parsed=True)
+                ai_analysis = generate_ai_analysis(complaint.document(), technical_notes)
                 
                 if not ai_analysis:
                     logger.debug(f"Failed to generate AI analysis for complaint {complaint_id}, skipping")
@@ -2298,12 +2378,13 @@ def batch_process_complaints():
                     continue
                 
                 # Update the technical note with the AI analysis
+                latest_note_data = latest_note.document()
                 latest_note_data['ai_analysis'] = ai_analysis
                 
                 # Update the technical note in the database
                 cursor.execute(
-                    "UPDATE technical_notes SET data = ? WHERE id = ?",
-                    (json.dumps(latest_note_data), latest_note_id)
+                    f"UPDATE technical_notes SET data = {document_param()} WHERE id = ?",
+                    (json_codec.dumps(latest_note_data), latest_note.id)
                 )
                 conn.commit()
                 
@@ -2353,13 +2434,14 @@ def export_complaints():
             start_date = parts[1]
             end_date = parts[2]
     
-    # Get all complaints without pagination
+    # Get all complaints without pagination, decoding each one only while its row is written
     complaints, total_count = get_all_complaints(
         page=1, 
         items_per_page=10000,  # Set a high limit to get all complaints
         search=search, 
         time_period=time_period, 
-        has_notes=has_notes
+        has_notes=has_notes,
+        projection='records'
     )
     
     # Create CSV content
@@ -2443,8 +2525,11 @@ def export_complaints():
     csv_writer.writerow(header)
     
     # Write each complaint as a row in the CSV
-    for complaint_id, complaint_data, has_technical_notes in complaints:
+    for complaint in complaints:
+        complaint_id = complaint.id
         try:
+            complaint_data = complaint.document()
+            
             # Initialize row with empty values
             row = [''] * len(header)
             
@@ -2501,14 +2586,13 @@ def export_complaints():
             technical_notes = None
             ai_analysis = None
             
-            if has_technical_notes:
+            if complaint.has_notes:
                 # Set the flag for has technical notes
                 row[29] = 'Yes'
                 
                 # Get the latest technical note data
-                tech_notes = get_technical_notes(complaint_id)
-                if tech_notes:
-                    latest_note = tech_notes[0][2]  # Get data from the most recent note
+                latest_note = complaint.note.document()
+                if latest_note:
                     
                     # Technical Assessment fields
                     row[30] = latest_note.get('technicianName', '')
@@ -2532,14 +2616,9 @@ def export_complaints():
                         row[41] = ai_analysis.get('final_opinion', '')
                         row[42] = ai_analysis.get('rule_based_category', '')
                         
-                        # Handle the OpenAI category field properly
-                        openai_category = ai_analysis.get('openai_category', '')
-                        if openai_category == "NO AI PREDICTION AVAILABLE" or "(NO OPENAI PREDICTION)" in openai_category:
-                            # If it's the placeholder, leave it blank in the CSV
-                            row[43] = ''
-                        else:
-                            row[43] = openai_category
-                            
+                        # Placeholders for a missing prediction are left blank in the CSV
+                        row[43] = AiAnalysis.from_dict(ai_analysis).exported_category
+                        
                         row[44] = ai_analysis.get('technical_diagnosis', '')
                         row[45] = ai_analysis.get('root_cause', '')
                         row[46] = ai_analysis.get('solution_implemented', '')
@@ -2552,7 +2631,7 @@ def export_complaints():
             csv_writer.writerow(row)
             
         except Exception as e:
-            print(f"Error exporting complaint {complaint_id}: {e}")
+            logger.error(f"Error exporting complaint {complaint_id}: {e}")
             continue
     
     # Prepare the response
@@ -2568,498 +2647,6 @@ def talk_with_data():
     """Render the Talk with Data page."""
     return render_template('talk_with_data.html')
 
-def parse_time_period_from_question(question):
-    """Parse time period from natural language question."""
-    import re
-    from datetime import datetime, timedelta
-    
-    question_lower = question.lower()
-    current_date = datetime.now().date()
-    
-    # Default to last 3 months if no specific time period is mentioned
-    default_days = 90
-    default_period = "the last 3 months"
-    
-    # Pattern matching for various time expressions
-    patterns = [
-        # Specific months
-        (r'(\d+)\s*month', lambda m: (int(m.group(1)) * 30, f"the last {m.group(1)} months")),
-        (r'(\d+)\s*ay', lambda m: (int(m.group(1)) * 30, f"the last {m.group(1)} months")),  # Turkish "ay"
-        
-        # Specific weeks
-        (r'(\d+)\s*week', lambda m: (int(m.group(1)) * 7, f"the last {m.group(1)} weeks")),
-        (r'(\d+)\s*hafta', lambda m: (int(m.group(1)) * 7, f"the last {m.group(1)} weeks")),  # Turkish "hafta"
-        
-        # Specific days
-        (r'(\d+)\s*day', lambda m: (int(m.group(1)), f"the last {m.group(1)} days")),
-        (r'(\d+)\s*gün', lambda m: (int(m.group(1)), f"the last {m.group(1)} days")),  # Turkish "gün"
-        
-        # Specific years
-        (r'(\d+)\s*year', lambda m: (int(m.group(1)) * 365, f"the last {m.group(1)} years")),
-        (r'(\d+)\s*yıl', lambda m: (int(m.group(1)) * 365, f"the last {m.group(1)} years")),  # Turkish "yıl"
-        
-        # Common time periods
-        (r'last\s*month|geçen\s*ay', lambda m: (30, "the last month")),  # Turkish "geçen ay"
-        (r'last\s*week|geçen\s*hafta', lambda m: (7, "the last week")),  # Turkish "geçen hafta"
-        (r'last\s*3\s*months|son\s*3\s*ay', lambda m: (90, "the last 3 months")),  # Turkish "son 3 ay"
-        (r'last\s*6\s*months|son\s*6\s*ay', lambda m: (180, "the last 6 months")),  # Turkish "son 6 ay"
-        (r'last\s*year|geçen\s*yıl', lambda m: (365, "the last year")),  # Turkish "geçen yıl"
-        (r'last\s*24\s*hours|son\s*24\s*saat', lambda m: (1, "the last 24 hours")),  # Turkish "son 24 saat"
-        
-        # Quarter periods
-        (r'last\s*quarter|son\s*çeyrek', lambda m: (90, "the last quarter")),  # Turkish "son çeyrek"
-        (r'q[1-4]', lambda m: (90, f"Q{m.group(1)}")),
-        
-        # All time
-        (r'all\s*time|tüm\s*zaman', lambda m: (3650, "all time")),  # Turkish "tüm zaman"
-    ]
-    
-    # Check for patterns in the question
-    for pattern, handler in patterns:
-        match = re.search(pattern, question_lower)
-        if match:
-            days, period = handler(match)
-            start_date = current_date - timedelta(days=days)
-            end_date = current_date
-            return start_date, end_date, period
-    
-    # If no specific pattern found, check for general time indicators
-    if any(word in question_lower for word in ['recent', 'son', 'recently', 'son zamanlarda']):
-        return current_date - timedelta(days=30), current_date, "recent times"
-    elif any(word in question_lower for word in ['current', 'mevcut', 'this month', 'bu ay']):
-        # Current month
-        start_date = current_date.replace(day=1)
-        return start_date, current_date, "this month"
-    elif any(word in question_lower for word in ['this year', 'bu yıl']):
-        # Current year
-        start_date = current_date.replace(month=1, day=1)
-        return start_date, current_date, "this year"
-    
-    # Default to last 3 months
-    start_date = current_date - timedelta(days=default_days)
-    end_date = current_date
-    return start_date, end_date, default_period
-
-def get_comprehensive_data_context(cursor, start_date, end_date, time_period):
-    """Get comprehensive data context for the specified time period."""
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
-    
-    # Base WHERE clause for the time period
-    base_where = """
-        WHERE date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
-        AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
-    """
-    base_params = [start_date_str, end_date_str]
-    
-    # Get brand resolution time statistics for the period
-    brand_resolution_times = get_brand_resolution_times(cursor, start_date_str, end_date_str)
-    
-    # Get total complaints for the period
-    cursor.execute(f"SELECT COUNT(*) FROM complaints {base_where}", base_params)
-    total_complaints_period = cursor.fetchone()[0]
-    
-    # Get total complaints overall
-    cursor.execute("SELECT COUNT(*) FROM complaints")
-    total_complaints_overall = cursor.fetchone()[0]
-    
-    # Get complaint categories for the period
-    cursor.execute(f"""
-        SELECT json_extract(data, '$.complaintDetails.natureOfProblem') as problems
-        FROM complaints {base_where}
-    """, base_params)
-    
-    category_counts = {}
-    rows = cursor.fetchall()
-    
-    for row in rows:
-        if row[0]:  # Check if problems field is not None
-            try:
-                problems = json.loads(row[0]) if isinstance(row[0], str) else row[0]
-                if isinstance(problems, list):
-                    for problem in problems:
-                        category_counts[problem] = category_counts.get(problem, 0) + 1
-            except (json.JSONDecodeError, TypeError):
-                continue
-    
-    category_stats = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)
-    
-    # Get top product models for the period
-    cursor.execute(f"""
-        SELECT json_extract(data, '$.productInformation.modelNumber') as model, COUNT(*) as count
-        FROM complaints {base_where}
-        AND json_extract(data, '$.productInformation.modelNumber') IS NOT NULL
-        GROUP BY model
-        ORDER BY count DESC
-        LIMIT 10
-    """, base_params)
-    
-    model_stats = cursor.fetchall()
-    
-    # Get brand statistics
-    cursor.execute(f"""
-        SELECT 
-            json_extract(data, '$.productInformation.brand') as brand,
-            COUNT(*) as count
-        FROM complaints {base_where}
-        AND json_extract(data, '$.productInformation.brand') IS NOT NULL
-        GROUP BY brand
-        ORDER BY count DESC
-    """, base_params)
-    
-    brand_stats = cursor.fetchall()
-    
-    # Get resolution rates for the period
-    cursor.execute(f"""
-        SELECT 
-            json_extract(data, '$.complaintDetails.resolutionStatus') as status,
-            COUNT(*) as count
-        FROM complaints {base_where}
-        GROUP BY status
-    """, base_params)
-    
-    resolution_stats = cursor.fetchall()
-    total_complaints_resolution = sum(count for status, count in resolution_stats)
-    resolved_complaints = sum(count for status, count in resolution_stats if status == 'Resolved')
-    resolution_rate = (resolved_complaints / total_complaints_resolution * 100) if total_complaints_resolution > 0 else 0
-    
-    # Get brand-specific resolution rates
-    cursor.execute(f"""
-        SELECT 
-            json_extract(data, '$.productInformation.brand') as brand,
-            json_extract(data, '$.complaintDetails.resolutionStatus') as status,
-            COUNT(*) as count
-        FROM complaints {base_where}
-        AND json_extract(data, '$.productInformation.brand') IS NOT NULL
-        GROUP BY brand, status
-        ORDER BY brand, status
-    """, base_params)
-    
-    brand_resolution_data = cursor.fetchall()
-    brand_resolution_stats = {}
-    
-    for brand, status, count in brand_resolution_data:
-        if brand not in brand_resolution_stats:
-            brand_resolution_stats[brand] = {'total': 0, 'resolved': 0}
-        brand_resolution_stats[brand]['total'] += count
-        if status == 'Resolved':
-            brand_resolution_stats[brand]['resolved'] += count
-    
-    # Get warranty status distribution
-    cursor.execute(f"""
-        SELECT 
-            json_extract(data, '$.warrantyInformation.warrantyStatus') as status,
-            COUNT(*) as count
-        FROM complaints {base_where}
-        GROUP BY status
-        ORDER BY count DESC
-    """, base_params)
-    
-    warranty_stats = cursor.fetchall()
-    
-    # Get monthly trend for the period
-    cursor.execute(f"""
-        SELECT 
-            strftime('%Y-%m', json_extract(data, '$.complaintDetails.dateOfComplaint')) as month,
-            COUNT(*) as count
-        FROM complaints {base_where}
-        GROUP BY month
-        ORDER BY month
-    """, base_params)
-    
-    monthly_trends = cursor.fetchall()
-    
-    # Build comprehensive data context
-    data_context = f"""COMPREHENSIVE DATA ANALYSIS FOR {time_period.upper()}:
-Date Range: {start_date_str} to {end_date_str}
-
-BASIC STATISTICS:
-- Total Complaints in Period: {total_complaints_period}
-- Total Complaints in Database: {total_complaints_overall}
-- Period Coverage: {(total_complaints_period/total_complaints_overall*100):.1f}% of total database
-
-RESOLUTION ANALYSIS:
-- Overall Resolution Rate: {resolution_rate:.1f}% ({resolved_complaints}/{total_complaints_resolution})
-- Resolution Status Breakdown:"""
-    
-    for status, count in resolution_stats:
-        status_name = status if status else "Not Set"
-        percentage = (count / total_complaints_resolution * 100) if total_complaints_resolution > 0 else 0
-        data_context += f"\n  - {status_name}: {count} complaints ({percentage:.1f}%)"
-    
-    # Brand resolution rates
-    if brand_resolution_stats:
-        data_context += f"\n\nBRAND RESOLUTION RATES:"
-        for brand, stats in brand_resolution_stats.items():
-            brand_resolution_rate = (stats['resolved'] / stats['total'] * 100) if stats['total'] > 0 else 0
-            data_context += f"\n- {brand}: {brand_resolution_rate:.1f}% ({stats['resolved']}/{stats['total']} resolved)"
-    
-    # Complaint categories
-    if category_stats:
-        data_context += f"\n\nTOP COMPLAINT CATEGORIES:"
-        for category, count in category_stats[:10]:  # Show top 10
-            percentage = (count / total_complaints_period * 100) if total_complaints_period > 0 else 0
-            data_context += f"\n- {category}: {count} complaints ({percentage:.1f}%)"
-    
-    # Product models
-    if model_stats:
-        data_context += f"\n\nTOP PRODUCT MODELS:"
-        for model, count in model_stats:
-            percentage = (count / total_complaints_period * 100) if total_complaints_period > 0 else 0
-            data_context += f"\n- {model}: {count} complaints ({percentage:.1f}%)"
-    
-    # Brand statistics
-    if brand_stats:
-        data_context += f"\n\nBRAND STATISTICS:"
-        for brand, count in brand_stats:
-            percentage = (count / total_complaints_period * 100) if total_complaints_period > 0 else 0
-            data_context += f"\n- {brand}: {count} complaints ({percentage:.1f}%)"
-    
-    # Warranty status
-    if warranty_stats:
-        data_context += f"\n\nWARRANTY STATUS DISTRIBUTION:"
-        for status, count in warranty_stats:
-            percentage = (count / total_complaints_period * 100) if total_complaints_period > 0 else 0
-            data_context += f"\n- {status}: {count} complaints ({percentage:.1f}%)"
-    
-    # Monthly trends
-    if monthly_trends:
-        data_context += f"\n\nMONTHLY TREND ANALYSIS:"
-        for month, count in monthly_trends:
-            data_context += f"\n- {month}: {count} complaints"
-        
-        # Calculate trend direction if we have enough data
-        if len(monthly_trends) >= 2:
-            recent_month = monthly_trends[-1][1]
-            previous_month = monthly_trends[-2][1]
-            if previous_month > 0:
-                trend_change = ((recent_month - previous_month) / previous_month * 100)
-                trend_direction = "increasing" if trend_change > 5 else "decreasing" if trend_change < -5 else "stable"
-                data_context += f"\n- Trend Direction: {trend_direction} ({trend_change:+.1f}% change from previous month)"
-    
-    # Calculate overall average resolution time
-    overall_resolution_stats = get_overall_resolution_stats(cursor, start_date_str, end_date_str)
-    
-    # Brand resolution time statistics
-    if brand_resolution_times:
-        data_context += f"\n\nBRAND RESOLUTION TIME STATISTICS:"
-        for brand, stats in brand_resolution_times.items():
-            avg_days = stats.get('avg_days', 0)
-            count = stats.get('count', 0)
-            min_days = stats.get('min_days', 0)
-            max_days = stats.get('max_days', 0)
-            data_context += f"\n- {brand}: {avg_days:.1f} days average ({min_days}-{max_days} days range) for {count} resolved complaints"
-        
-        # Find fastest brand
-        if brand_resolution_times:
-            fastest_brand = min(brand_resolution_times.items(), key=lambda x: x[1].get('avg_days', float('inf')))
-            data_context += f"\n- Fastest Brand: {fastest_brand[0]} with {fastest_brand[1].get('avg_days', 0):.1f} days average"
-    
-    # Overall resolution time statistics
-    if overall_resolution_stats:
-        data_context += f"\n\nOVERALL RESOLUTION TIME STATISTICS:"
-        data_context += f"\n- Overall Average Resolution Time: {overall_resolution_stats.get('avg_days', 0):.1f} days"
-        data_context += f"\n- Fastest Resolution: {overall_resolution_stats.get('min_days', 0):.1f} days"
-        data_context += f"\n- Longest Resolution: {overall_resolution_stats.get('max_days', 0):.1f} days"
-        data_context += f"\n- Total Resolved Complaints: {overall_resolution_stats.get('count', 0)}"
-    else:
-        # Resolution time estimates (based on technical notes patterns)
-        data_context += f"\n\nRESOLUTION TIME ESTIMATES:"
-        data_context += f"\n- Average Resolution Time: 12.5 days (estimated based on technical note patterns)"
-        data_context += f"\n- Fastest Resolution: 2-3 days (simple repairs)"
-        data_context += f"\n- Longest Resolution: 30+ days (complex issues requiring parts)"
-    
-    return data_context
-
-def get_brand_resolution_times(cursor, start_date_str, end_date_str):
-    """Get brand-specific resolution time statistics."""
-    try:
-        # Query to get resolution times by brand
-        cursor.execute("""
-            SELECT 
-                json_extract(data, '$.productInformation.brand') as brand,
-                AVG(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as avg_days,
-                MIN(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as min_days,
-                MAX(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as max_days,
-                COUNT(*) as count
-            FROM complaints
-            WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
-            AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
-            AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
-            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
-            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
-            GROUP BY brand
-            HAVING count >= 1
-            ORDER BY avg_days ASC
-        """, [start_date_str, end_date_str])
-        
-        results = cursor.fetchall()
-        brand_stats = {}
-        
-        for brand, avg_days, min_days, max_days, count in results:
-            if avg_days is not None and count > 0 and brand is not None:
-                brand_stats[brand] = {
-                    'avg_days': avg_days,
-                    'min_days': min_days or 0,
-                    'max_days': max_days or 0,
-                    'count': count
-                }
-        
-        # If no data found for the specific period, get overall data
-        if not brand_stats:
-            logger.info("No resolution time data found for the specified period, getting overall data")
-            cursor.execute("""
-                SELECT 
-                    json_extract(data, '$.productInformation.brand') as brand,
-                    AVG(
-                        CAST(
-                            (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                             julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                        )
-                    ) as avg_days,
-                    MIN(
-                        CAST(
-                            (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                             julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                        )
-                    ) as min_days,
-                    MAX(
-                        CAST(
-                            (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                             julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                        )
-                    ) as max_days,
-                    COUNT(*) as count
-                FROM complaints
-                WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
-                AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
-                AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
-                GROUP BY brand
-                HAVING count >= 1
-                ORDER BY avg_days ASC
-            """)
-            
-            results = cursor.fetchall()
-            for brand, avg_days, min_days, max_days, count in results:
-                if avg_days is not None and count > 0 and brand is not None:
-                    brand_stats[brand] = {
-                        'avg_days': avg_days,
-                        'min_days': min_days or 0,
-                        'max_days': max_days or 0,
-                        'count': count
-                    }
-        
-        return brand_stats
-        
-    except Exception as e:
-        logger.error(f"Error getting brand resolution times: {e}")
-        return {}
-
-def get_overall_resolution_stats(cursor, start_date_str, end_date_str):
-    """Get overall resolution time statistics."""
-    try:
-        # Query to get overall resolution time statistics
-        cursor.execute("""
-            SELECT 
-                AVG(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as avg_days,
-                MIN(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as min_days,
-                MAX(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as max_days,
-                COUNT(*) as count
-            FROM complaints
-            WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
-            AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
-            AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
-            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
-            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
-        """, [start_date_str, end_date_str])
-        
-        result = cursor.fetchone()
-        
-        if result and result[0] is not None:
-            avg_days, min_days, max_days, count = result
-            return {
-                'avg_days': avg_days,
-                'min_days': min_days or 0,
-                'max_days': max_days or 0,
-                'count': count
-            }
-        
-        # If no data found for the specific period, get overall data
-        logger.info("No overall resolution time data found for the specified period, getting overall data")
-        cursor.execute("""
-            SELECT 
-                AVG(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as avg_days,
-                MIN(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as min_days,
-                MAX(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    )
-                ) as max_days,
-                COUNT(*) as count
-            FROM complaints
-            WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
-            AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
-            AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
-        """)
-        
-        result = cursor.fetchone()
-        
-        if result and result[0] is not None:
-            avg_days, min_days, max_days, count = result
-            return {
-                'avg_days': avg_days,
-                'min_days': min_days or 0,
-                'max_days': max_days or 0,
-                'count': count
-            }
-        
-        return None
-        
-    except Exception as e:
-        logger.error(f"Error getting overall resolution stats: {e}")
-        return None
-
 @app.route('/talk_with_data/custom_period', methods=['POST'])
 @login_required
 def get_custom_period_data():
@@ -3072,7 +2659,7 @@ def get_custom_period_data():
             return jsonify({'error': 'Please provide a time period.'})
         
         # Parse the time period
-        time_period_info = parse_time_period_from_question(f"data for {time_period_text}")
+        time_period_info = parse_question_period(f"data for {time_period_text}")
         start_date, end_date, detected_period = time_period_info
         
         # Connect to database
@@ -3083,7 +2670,7 @@ def get_custom_period_data():
         cursor = conn.cursor()
         
         # Get comprehensive data for the period
-        data_context = get_comprehensive_data_context(cursor, start_date, end_date, detected_period)
+        data_context, _ = build_data_context(cursor, start_date, end_date, detected_period)
         
         cursor.close()
         conn.close()
@@ -3099,6 +2686,55 @@ def get_custom_period_data():
         logger.error(f"Error in custom period data: {e}")
         return jsonify({'error': 'Failed to get custom period data'}), 500
 
+# System prompt shared by the buffered and streaming talk-with-data endpoints
+DATA_QUERY_SYSTEM_MESSAGE = """You are a helpful assistant that answers questions about refrigerator complaint data.
+        You have access to the data sections relevant to the question for the specified time period.
+        Each section is a pipe-separated table whose column names are listed in its header line.
+        Use this data to provide accurate, specific answers to questions.
+        
+        For resolution rate questions, use the percentage of complaints marked as "Resolved" from the total complaints.
+        For brand-specific resolution rates, refer to the "Brand Resolution Rates" section.
+        For overall resolution time questions, use the "Overall Resolution Time Statistics" section.
+        For brand-specific resolution time questions, use the "Brand Resolution Time Statistics" section.
+        For fastest/slowest brand questions, use the "Brand Resolution Time Statistics" section and identify the brand with the lowest/highest average days.
+        For category questions, use the complaint category information.
+        For product model questions, refer to the "Top Product Models" section.
+        For brand questions, refer to the "Brand Statistics" section.
+        
+        IMPORTANT: When asked about fastest or slowest resolution times by brand, always check the "Brand Resolution Time Statistics" section. The data includes average resolution times for each brand, and you should identify the brand with the lowest average days as fastest and highest average days as slowest.
+        
+        Your answers should be:
+        1. Factual and based ONLY on the data provided
+        2. Concise and clear
+        3. Include specific numbers and percentages when available
+        4. Acknowledge the time period being analyzed
+        5. For brand resolution time questions, always provide the specific brand name and average days
+        
+        If the data doesn't contain the information needed to answer the question accurately, clearly state this limitation.
+        """
+
+TREND_KEYWORDS = ["trend", "over time", "pattern", "progression", "historical", "changes", "evolution"]
+
+def build_data_query_messages(question, detected_period, data_context):
+    """Build the chat messages sent to OpenAI for a talk-with-data question."""
+    user_message = f"""Here is the refrigerator complaint data for {detected_period}:
+
+{data_context}
+
+Question: {question}
+
+Please provide a clear, concise answer based on this data."""
+    
+    return [
+        {"role": "system", "content": DATA_QUERY_SYSTEM_MESSAGE},
+        {"role": "user", "content": user_message}
+    ]
+
+def is_trend_question(question):
+    """Check whether a question asks for a trend so the UI can attach a chart."""
+    question_lower = question.lower()
+    return any(keyword in question_lower for keyword in TREND_KEYWORDS)
+
 @app.route('/talk_with_data/query', methods=['POST'])
 @login_required
 def process_data_query():
@@ -3113,11 +2749,12 @@ def process_data_query():
             return jsonify({'answer': 'Please provide a question.'})
         
         # Check if OpenAI client is available
+        client = get_openai_client()
         if not client:
             return jsonify({'answer': 'Sorry, AI features are currently unavailable. Please check the OpenAI API configuration.'})
         
         # Parse time period from the question
-        time_period_info = parse_time_period_from_question(question)
+        time_period_info = parse_question_period(question)
         start_date, end_date, detected_period = time_period_info
         
         logger.debug(f"Detected time period: {detected_period} ({start_date} to {end_date})")
@@ -3131,73 +2768,38 @@ def process_data_query():
             
         cursor = conn.cursor()
         
-        # Get comprehensive data for the detected time period
-        data_context = get_comprehensive_data_context(cursor, start_date, end_date, detected_period)
+        # Get the data sections relevant to the question for the detected time period
+        data_context, context_tokens = build_data_context(cursor, start_date, end_date, detected_period, question=question)
         
-        # Prepare the system message for OpenAI
-        system_message = """You are a helpful assistant that answers questions about refrigerator complaint data.
-        You have access to comprehensive data about complaints for the specified time period.
-        Use this data to provide accurate, specific answers to questions.
-        
-        For resolution rate questions, use the percentage of complaints marked as "Resolved" from the total complaints.
-        For brand-specific resolution rates, refer to the "Brand Resolution Rates" section.
-        For overall resolution time questions, use the "Overall Resolution Time Statistics" section.
-        For brand-specific resolution time questions, use the "Brand Resolution Time Statistics" section.
-        For fastest/slowest brand questions, use the "Brand Resolution Time Statistics" section and identify the brand with the lowest/highest average days.
-        For category questions, use the complaint category information.
-        For product model questions, refer to the "Top Product Models" section.
-        For brand questions, refer to the "Brand Statistics" section.
-        
-        IMPORTANT: When asked about fastest or slowest resolution times by brand, always check the "Brand Resolution Time Statistics" section. The data includes average resolution times for each brand, and you should identify the brand with the lowest average days as fastest and highest average days as slowest.
-        
-        Your answers should be:
-        1. Factual and based ONLY on the data provided
-        2. Concise and clear
-        3. Include specific numbers and percentages when available
-        4. Acknowledge the time period being analyzed
-        5. For brand resolution time questions, always provide the specific brand name and average days
-        
-        If the data doesn't contain the information needed to answer the question accurately, clearly state this limitation.
-        """
-        
-        # Prepare the user message with context
-        user_message = f"""Here is the refrigerator complaint data for {detected_period}:
-
-{data_context}
-
-Question: {question}
-
-Please provide a clear, concise answer based on this data."""
+        messages = build_data_query_messages(question, detected_period, data_context)
         
         logger.debug("Calling OpenAI API...")
         # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.3,
-            max_tokens=800
-        )
+        with openai_call('data_query') as call:
+            response = client.chat.completions.create(
+                model="gpt-4-turbo-preview",
+                messages=messages,
+                temperature=0.3,
+                max_tokens=800
+            )
+            call.record_usage(response.usage)
         
         # Get the answer from the response
         answer = response.choices[0].message.content.strip()
-        logger.debug("Successfully generated response")
+        prompt_tokens = getattr(response.usage, 'prompt_tokens', None) if response.usage else None
+        context_stats.record_prompt_tokens(prompt_tokens)
+        logger.debug(f"Successfully generated response (context tokens: {context_tokens}, prompt tokens: {prompt_tokens})")
         
         # Check if this is a trend analysis request
-        is_trend_query = False
-        trend_keywords = ["trend", "over time", "pattern", "progression", "historical", "changes", "evolution", "trend"]
-        question_lower = question.lower()
-        
-        if any(keyword in question_lower for keyword in trend_keywords):
-            is_trend_query = True
+        is_trend_query = is_trend_question(question)
+        if is_trend_query:
             logger.debug("Detected trend analysis request")
         
         return jsonify({
             'answer': answer,
             'is_trend_query': is_trend_query,
-            'time_period': detected_period
+            'time_period': detected_period,
+            'context_tokens': context_tokens
         })
     
 
@@ -3216,6 +2818,88 @@ Please provide a clear, concise answer based on this data."""
             conn.close()
             logger.debug("Database connection closed")
 
+def sse_event(event, payload):
+    """Format a single server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json_codec.dumps(payload)}\n\n"
+
+@app.route('/talk_with_data/query/stream', methods=['POST'])
+@login_required
+def stream_data_query():
+    """Stream the answer to a talk-with-data question as server-sent events.
+    
+    Emits a `meta` event with the detected time period, one `token` event per
+    completion delta, and a final `done` (or `error`) event. The page retries
+    through /talk_with_data/query only if the stream fails before the first
+    token; an `error` event ends the answer with its message instead.
+    """
+    data = request.get_json(silent=True) or {}
+    question = data.get('question', '').strip()
+    
+    if not question:
+        return jsonify({'answer': 'Please provide a question.'}), 400
+    
+    client = get_openai_client()
+    if not client:
+        return jsonify({'answer': 'Sorry, AI features are currently unavailable. Please check the OpenAI API configuration.'}), 503
+    
+    start_date, end_date, detected_period = parse_question_period(question)
+    logger.debug(f"Detected time period: {detected_period} ({start_date} to {end_date})")
+    
+    # Build the data context up front so the connection is closed before streaming starts
+    conn = connect_to_db()
+    if not conn:
+        logger.error("Failed to establish database connection")
+        return jsonify({'answer': 'Sorry, there was an error connecting to the database. Please try again later.'}), 500
+    
+    cursor = conn.cursor()
+    try:
+        data_context, context_tokens = build_data_context(cursor, start_date, end_date, detected_period, question=question)
+    except sqlite3.Error as e:
+        logger.error(f"Database query error: {e}")
+        return jsonify({'answer': 'Sorry, there was an error querying the database. Please try again.'}), 500
+    finally:
+        cursor.close()
+        conn.close()
+    
+    messages = build_data_query_messages(question, detected_period, data_context)
+    is_trend_query = is_trend_question(question)
+    
+    def generate():
+        yield sse_event('meta', {'time_period': detected_period, 'is_trend_query': is_trend_query, 'context_tokens': context_tokens})
+        try:
+            # Timed until the last chunk, so the latency covers the whole answer
+            with openai_call('data_query_stream') as call:
+                stream = client.chat.completions.create(
+                    model="gpt-4-turbo-preview",
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=800,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                for chunk in stream:
+                    if chunk.usage:
+                        context_stats.record_prompt_tokens(chunk.usage.prompt_tokens)
+                        call.record_usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if token:
+                        yield sse_event('token', {'token': token})
+            yield sse_event('done', {'time_period': detected_period, 'is_trend_query': is_trend_query})
+        except Exception as e:
+            logger.error(f"Error streaming data query: {e}")
+            yield sse_event('error', {'answer': 'Sorry, there was an error processing your question. Please try again.'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering so tokens reach the browser immediately
+        }
+    )
+
 @app.route('/talk_with_data/monthly_trend', methods=['GET'])
 @login_required
 def get_complaints_monthly_trend():
@@ -3294,6 +2978,7 @@ def get_complaints_monthly_trend():
             counts.append(count)
         
         # Create a Plotly figure
+        import numpy as np
         import plotly.graph_objects as go
         
         # Add annotations for significant points
@@ -3376,7 +3061,6 @@ def get_complaints_monthly_trend():
         ))
         
         # Add a trend line
-        import numpy as np
         z = np.polyfit(range(len(months)), counts, 1)
         p = np.poly1d(z)
         fig.add_trace(go.Scatter(
@@ -3443,8 +3127,7 @@ def get_complaints_monthly_trend():
             selector=dict(name='Trend')
         )
         
-        import plotly
-        chart_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+        chart_json = json_codec.plotly_json(fig)
         
         return jsonify({
             'chart': chart_json,
@@ -3465,58 +3148,64 @@ def get_complaints_monthly_trend():
 @app.route('/talk_with_data/stt', methods=['POST'])
 @login_required
 def speech_to_text():
-    """Convert speech to text using OpenAI's Whisper API."""
-    temp_file = None
+    """Convert speech to text using OpenAI's Whisper API.
     
+    The upload is kept in memory and passed straight to Whisper. Long
+    recordings are sent as consecutive segments, each with the transcript so
+    far as the 'prompt' field so Whisper keeps context across segments.
+    """
     try:
         # Check if we have a working client
+        client = get_openai_client()
         if client is None:
             logger.error("OpenAI client is not initialized")
             return jsonify({'error': 'OpenAI services are not available'}), 503
         
+        # Reject oversized uploads before reading the body
+        if upload_too_large(request.content_length):
+            logger.error(f"Audio upload too large: {request.content_length} bytes")
+            return jsonify({'error': f'Audio file too large (max {STT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB)'}), 413
+        
         # Check if audio file is in the request
-        if 'audio' not in request.files:
+        try:
+            audio_file = request.files.get('audio')
+        except RequestEntityTooLarge:
+            logger.error("Audio upload exceeded the size limit while reading")
+            return jsonify({'error': f'Audio file too large (max {STT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB)'}), 413
+        
+        if audio_file is None:
             logger.error("No audio file in request")
             return jsonify({'error': 'No audio file provided'}), 400
-            
-        audio_file = request.files['audio']
         
         # Check if the file is valid
-        if not audio_file or not audio_file.filename:
+        if not audio_file.filename:
             logger.error("Empty audio file or filename")
             return jsonify({'error': 'Invalid audio file'}), 400
         
-        # Log file info
-        logger.debug(f"Received audio: {audio_file.filename}, {audio_file.content_type}")
-        
-        # Create a temporary file
-        import tempfile
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.webm')
-        audio_file.save(temp_file.name)
-        temp_file.close()
-        
-        # Check file size
-        file_size = os.path.getsize(temp_file.name)
-        logger.debug(f"Saved audio to temp file: {temp_file.name}, size: {file_size} bytes")
+        file_size = buffer_size(audio_file.stream)
+        logger.debug(f"Received audio: {audio_file.filename}, {audio_file.content_type}, {file_size} bytes")
         
         if file_size == 0:
             logger.error("Empty audio file (0 bytes)")
-            os.unlink(temp_file.name)
             return jsonify({'error': 'Empty audio file'}), 400
         
+        transcription_args = {
+            'model': "whisper-1",
+            'file': (audio_upload_name(audio_file.filename, audio_file.mimetype), audio_file.stream, audio_file.mimetype or 'audio/webm')
+        }
+        prompt = trim_prompt(request.form.get('prompt'))
+        if prompt:
+            transcription_args['prompt'] = prompt
+        
         # Call OpenAI API
         try:
-            # Open the file for the API call
-            with open(temp_file.name, "rb") as audio:
-                transcription = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio
-                )
+            with openai_call('transcription'):
+                transcription = client.audio.transcriptions.create(**transcription_args)
             
             # Extract and return transcription text
             transcription_text = getattr(transcription, 'text', None)
             
-            if not transcription_text:
+            if transcription_text is None:
                 logger.error("No transcription text returned")
                 return jsonify({'error': 'Transcription failed: No text returned'}), 500
             
@@ -3530,15 +3219,18 @@ def speech_to_text():
     except Exception as e:
         logger.error(f"Speech-to-text processing error: {str(e)}")
         return jsonify({'error': f'Speech processing failed: {str(e)}'}), 500
+
+def get_tts_request():
+    """Return (text, voice) from a TTS request body, or (None, error response)."""
+    data = request.get_json(silent=True)
+    if not data or 'text' not in data:
+        return None, (jsonify({'error': 'No text provided'}), 400)
         
-    finally:
-        # Clean up temp file
-        if temp_file and os.path.exists(temp_file.name):
-            try:
-                os.unlink(temp_file.name)
-                logger.debug(f"Deleted temporary file: {temp_file.name}")
-            except Exception as e:
-                logger.error(f"Failed to delete temp file: {str(e)}")
+    text = data.get('text', '').strip()
+    if not text:
+        return None, (jsonify({'error': 'Empty text provided'}), 400)
+    
+    return (text, data.get('voice', 'alloy')), None
 
 @app.route('/talk_with_data/tts', methods=['POST'])
 @login_required
@@ -3546,34 +3238,39 @@ def text_to_speech():
     """Convert text to speech using OpenAI's TTS API."""
     try:
         # Check if OpenAI client is available
+        client = get_openai_client()
         if client is None:
             logger.error("OpenAI client not initialized")
             return jsonify({'error': 'Speech synthesis failed: OpenAI client not available'}), 500
         
         # Get the text to be converted to speech
-        data = request.get_json()
-        if not data or 'text' not in data:
-            return jsonify({'error': 'No text provided'}), 400
-            
-        text = data.get('text', '').strip()
-        if not text:
-            return jsonify({'error': 'Empty text provided'}), 400
+        tts_request, error_response = get_tts_request()
+        if error_response:
+            return error_response
+        text, voice = tts_request
             
         logger.debug(f"Converting text to speech: {text[:50]}...")
         
-        # Use OpenAI's TTS API
-        voice = data.get('voice', 'alloy')  # Default voice
+        cache_key = speech_cache.key(text, voice, TTS_MODEL)
+        cached = speech_cache.open(cache_key)
         
         try:
-            # Use TTS API to generate audio
-            response = client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            )
-            
-            # Get the binary audio data - use response.content for TTS
-            audio_data = response.content
+            if cached:
+                with cached:
+                    audio_data = cached.read()
+                logger.debug("Text-to-speech served from cache")
+            else:
+                # Use TTS API to generate audio
+                with openai_call('speech'):
+                    response = client.audio.speech.create(
+                        model=TTS_MODEL,
+                        voice=voice,
+                        input=text
+                    )
+                
+                # Get the binary audio data - use response.content for TTS
+                audio_data = response.content
+                speech_cache.store(cache_key, audio_data)
             
             # Encode the binary data as base64 for sending in JSON
             audio_base64 = base64.b64encode(audio_data).decode('utf-8')
@@ -3594,8 +3291,107 @@ def text_to_speech():
         logger.error(f"Text-to-speech processing error: {e}")
         return jsonify({'error': f'Text-to-speech processing failed: {str(e)}'}), 500
 
-# Initialize database after all functions are defined
-initialize_database()
+@app.route('/talk_with_data/tts/stream', methods=['POST'])
+@login_required
+def stream_text_to_speech():
+    """Stream synthesized speech to the browser as MP3 while it is generated.
+    
+    Audio is relayed in chunks as OpenAI produces it and saved to the speech
+    cache on the way, so repeated answers are served from disk.
+    """
+    tts_request, error_response = get_tts_request()
+    if error_response:
+        return error_response
+    text, voice = tts_request
+    
+    # Cached speech needs no OpenAI client
+    cache_key = speech_cache.key(text, voice, TTS_MODEL)
+    cached = speech_cache.open(cache_key)
+    if cached:
+        logger.debug("Text-to-speech served from cache")
+        response = send_file(cached, mimetype='audio/mpeg')
+        response.headers['X-TTS-Cache'] = 'hit'
+        return response
+    
+    client = get_openai_client()
+    if client is None:
+        logger.error("OpenAI client not initialized")
+        return jsonify({'error': 'Speech synthesis failed: OpenAI client not available'}), 503
+    
+    # Open the upstream stream before responding, so API errors still get a JSON error response
+    stack = ExitStack()
+    try:
+        # Timed until the response headers arrive, i.e. time to first audio
+        with openai_call('speech_stream'):
+            speech = stack.enter_context(client.audio.speech.with_streaming_response.create(
+                model=TTS_MODEL,
+                voice=voice,
+                input=text,
+                response_format='mp3'
+            ))
+    except Exception as e:
+        stack.close()
+        logger.error(f"OpenAI TTS API error: {e}")
+        return jsonify({'error': f'Speech synthesis failed: {str(e)}'}), 500
+    
+    def generate():
+        with stack:
+            # Relay chunks as they arrive; a fixed chunk size would hold back the first audio
+            yield from speech_cache.write_through(cache_key, speech.iter_bytes())
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='audio/mpeg',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-TTS-Cache': 'miss'}
+    )
+
+# One-time initialization, run by create_app()
+_app_initialized = False
+_app_init_lock = threading.Lock()
+
+def create_app():
+    """Application factory: load secrets and initialize the database once, then return the app.
+    
+    Under gunicorn --preload (see gunicorn.conf.py) this runs in the master
+    before workers are forked, so secrets, schema setup and sample data
+    generation happen once and the loaded modules are shared copy-on-write.
+    """
+    global _app_initialized
+    with _app_init_lock:
+        if not _app_initialized:
+            # Load secrets from Google Secret Manager if in production
+            try:
+                from secrets_manager import load_secrets_to_env
+                load_secrets_to_env()
+            except ImportError:
+                print("secrets_manager not available, using local environment")
+            
+            initialize_database()
+            if is_production():
+                # Compile in the gunicorn master so forked workers start with every template loaded
+                precompile_templates(app)
+            _app_initialized = True
+    return app
+
+def reset_after_fork():
+    """Drop clients inherited from the gunicorn master so each worker opens its own.
+    
+    SQLite connections are opened per request by connect_to_db(), apart
+    from the data_version watch connection, which is reopened; the OpenAI and
+    Cloud Storage clients hold connection pools that must not be shared
+    between processes. The log listener thread isn't carried over by fork,
+    so it is started again.
+    """
+    global _openai_client
+    _openai_client = None
+    restart_logging_after_fork()
+    data_version.reset_after_fork()
+    facet_cache.clear()
+    try:
+        from cloud_storage_db import cloud_db
+        cloud_db.reset_after_fork()
+    except ImportError:
+        pass
 
 if __name__ == '__main__':
     # Ensure templates directory exists
@@ -3608,6 +3404,8 @@ if __name__ == '__main__':
     except Exception as e:
         print(f"Warning: Could not setup technical notes table: {e}")
     
+    create_app()
+    
     # Get port from environment variable (for Cloud Run)
     port = int(os.environ.get('PORT', 5001))
     
@@ -0,0 +1,126 @@
+"""
+Level-controlled, structured logging that doesn't block requests.
+
+configure_logging() sets up the root logger once per process:
+
+- LOG_LEVEL sets the level: DEBUG outside production, INFO in production
+  by default.
+- LOG_FORMAT=json writes one JSON object per line, with the severity,
+  message and source location fields that Cloud Logging reads. This is the
+  default in production; elsewhere the default is plain text.
+- Handlers run on a QueueListener thread. Request threads only put records
+  on a queue, so a slow stdout or log agent doesn't add to request time.
+
+hot_path_logger(name) returns a logger for messages written on every request,
+such as database connections and list queries. Below WARNING it passes on one
+in LOG_SAMPLE_EVERY records per call site and tags each with the rate.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+import json_codec
+from environment import is_production
+
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', 100))
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+_queue_handler = None
+_listener = None
+_configure_lock = threading.Lock()
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the field names Cloud Logging expects."""
+
+    def format(self, record):
+        entry = {
+            'severity': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'logging.googleapis.com/sourceLocation': {
+                'file': record.pathname, 'line': record.lineno, 'function': record.funcName},
+        }
+        if getattr(record, 'sampled', None):
+            entry['sampled'] = record.sampled
+        if record.exc_info:
+            entry['message'] += '\n' + self.formatException(record.exc_info)
+        return json_codec.dumps(entry)
+
+class SamplingFilter(logging.Filter):
+    """Pass one in `every` records below WARNING per call site."""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.sampled = self.every
+        return True
+
+def hot_path_logger(name):
+    """Logger '<name>.hot' that samples its records below WARNING (see SamplingFilter)."""
+    logger = logging.getLogger(f'{name}.hot')
+    if not any(isinstance(f, SamplingFilter) for f in logger.filters):
+        logger.addFilter(SamplingFilter(LOG_SAMPLE_EVERY))
+    return logger
+
+def log_level():
+    return os.getenv('LOG_LEVEL', 'INFO' if is_production() else 'DEBUG').upper()
+
+def make_formatter():
+    log_format = os.getenv('LOG_FORMAT', 'json' if is_production() else 'text')
+    return JSONFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+
+def _start_listener():
+    global _listener
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(make_formatter())
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, handler, respect_handler_level=True)
+    _listener.start()
+
+def configure_logging():
+    """Route the root logger through a queue to a stderr handler; safe to call more than once."""
+    global _queue_handler
+    with _configure_lock:
+        root = logging.getLogger()
+        root.setLevel(log_level())
+        if _queue_handler is not None:
+            return
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        root.addHandler(_queue_handler)
+        _start_listener()
+        atexit.register(stop_logging)
+
+def restart_after_fork():
+    """Start a listener in a forked worker; the master's thread doesn't exist there."""
+    with _configure_lock:
+        if _queue_handler is not None:
+            _start_listener()
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,183 @@
+"""
+Audio handling for the Talk with Data speech endpoints.
+
+Speech-to-text: uploaded files are parsed straight into capped BytesIO buffers
+instead of Werkzeug's spooled temporary files, so an upload is never written to
+disk and can be handed to the transcription API as-is.
+
+Text-to-speech: synthesized audio is kept in a size-bounded on-disk cache keyed
+by (text, voice, model), filled while the audio is streamed to the browser.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Whisper rejects files over 25 MB, so there is no point accepting more
+STT_MAX_UPLOAD_BYTES = int(os.getenv('STT_MAX_UPLOAD_BYTES', str(25 * 1024 * 1024)))
+
+# Allowance for multipart boundaries and the small form fields sent with the audio
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+# Whisper only looks at the last ~224 tokens of the prompt
+STT_PROMPT_MAX_CHARS = 800
+
+AUDIO_EXTENSIONS = {
+    'audio/webm': 'webm',
+    'audio/ogg': 'ogg',
+    'audio/mp4': 'mp4',
+    'audio/mpeg': 'mp3',
+    'audio/wav': 'wav',
+    'audio/x-wav': 'wav',
+}
+
+class CappedBuffer(io.BytesIO):
+    """BytesIO that raises RequestEntityTooLarge once more than max_bytes are written."""
+
+    def __init__(self, max_bytes):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def write(self, data):
+        if self.tell() + len(data) > self.max_bytes:
+            raise RequestEntityTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        return super().write(data)
+
+class InMemoryUploadRequest(Request):
+    """Request class that keeps file uploads in capped memory buffers.
+
+    The cap is enforced while the body is parsed, so chunked uploads without a
+    Content-Length are cut off as soon as they grow too large.
+    """
+    max_upload_bytes = STT_MAX_UPLOAD_BYTES
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return CappedBuffer(self.max_upload_bytes)
+
+def upload_too_large(content_length, max_bytes=STT_MAX_UPLOAD_BYTES):
+    """True if a declared Content-Length already rules the upload out."""
+    return content_length is not None and content_length > max_bytes + UPLOAD_FORM_OVERHEAD
+
+def buffer_size(stream):
+    """Return the size of a seekable upload stream, leaving it rewound."""
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def audio_upload_name(filename, mimetype):
+    """Filename to send to Whisper, which detects the audio format from the extension.
+
+    Browsers name Blob uploads "blob", so fall back to the MIME type.
+    """
+    if filename and '.' in filename:
+        return filename
+    extension = AUDIO_EXTENSIONS.get((mimetype or '').split(';')[0], 'webm')
+    return f"audio.{extension}"
+
+def trim_prompt(prompt):
+    """Keep the tail of the transcript so far, which is what Whisper uses for context."""
+    prompt = (prompt or '').strip()
+    return prompt[-STT_PROMPT_MAX_CHARS:]
+
+TTS_MODEL = "tts-1"
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'bsh_tts_cache'))
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+class SpeechCache:
+    """Size-bounded on-disk cache of synthesized speech.
+
+    Entries are written under a temporary name and renamed once complete, so
+    other requests and workers never read a partial file. The least recently
+    played entries are evicted when the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, text, voice, model=TTS_MODEL):
+        return hashlib.sha256(f"{model}\0{voice}\0{text}".encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def open(self, key):
+        """Return an open binary file for a cached entry, or None on a miss."""
+        path = self._path(key)
+        try:
+            audio = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            # Mark as recently used for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return audio
+
+    def write_through(self, key, chunks):
+        """Yield audio chunks unchanged while saving them to the cache.
+
+        The entry is only kept if the stream is consumed to the end; an
+        aborted download (e.g. the browser navigated away) leaves nothing behind.
+        """
+        path = self._path(key)
+        part_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            part = open(part_path, 'wb')
+        except OSError as e:
+            logger.warning(f"TTS cache unavailable: {e}")
+            yield from chunks
+            return
+
+        complete = False
+        try:
+            with part:
+                for chunk in chunks:
+                    part.write(chunk)
+                    yield chunk
+            os.replace(part_path, path)
+            complete = True
+            self._evict()
+        finally:
+            if not complete:
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+
+    def store(self, key, audio_data):
+        for _ in self.write_through(key, [audio_data]):
+            pass
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.mp3'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+speech_cache = SpeechCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
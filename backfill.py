@@ -0,0 +1,209 @@
+"""
+Resumable, chunked backfills for long data migrations.
+
+A backfill walks a table by id ranges (id > lo AND id <= hi), so each chunk
+is a rowid range scan and only one chunk of rows is in memory at a time. Each
+chunk is written in its own short transaction together with a checkpoint row
+in backfill_checkpoints, so an interrupted run resumes after the last
+committed chunk. Between chunks the runner sleeps in proportion to the time it
+spent working (--duty-cycle), leaving the write lock free for the live app.
+
+Usage:
+    python backfill.py customer_country_data
+    python backfill.py turkish_complaint_text --batch-size 500 --duty-cycle 0.25
+    python backfill.py --status
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+
+import migrations
+from document_storage import document_param, document_sql
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_DUTY_CYCLE = 0.5
+PROGRESS_INTERVAL = 5  # seconds between progress lines
+
+# Named backfills: factories returning (where_sql, params, transform) for complaints
+BACKFILLS = {
+    'customer_country_data': migrations.customer_country_backfill,
+    'turkish_complaint_text': migrations.turkish_text_backfill,
+}
+
+def ensure_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0,
+            rows_seen INTEGER NOT NULL DEFAULT 0,
+            rows_changed INTEGER NOT NULL DEFAULT 0,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            completed_at DATETIME
+        )
+    """)
+    conn.commit()
+
+def load_checkpoint(conn, name):
+    """Return (last_id, rows_seen, rows_changed, completed_at) for a backfill, creating it if new."""
+    ensure_checkpoint_table(conn)
+    conn.execute("INSERT OR IGNORE INTO backfill_checkpoints (name) VALUES (?)", (name,))
+    conn.commit()
+    return conn.execute(
+        "SELECT last_id, rows_seen, rows_changed, completed_at FROM backfill_checkpoints WHERE name = ?",
+        (name,)
+    ).fetchone()
+
+def reset_checkpoint(conn, name):
+    ensure_checkpoint_table(conn)
+    conn.execute("DELETE FROM backfill_checkpoints WHERE name = ?", (name,))
+    conn.commit()
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+def run_backfill(conn, name, where_sql, params, transform, batch_size=DEFAULT_BATCH_SIZE,
+                 duty_cycle=DEFAULT_DUTY_CYCLE, table='complaints', max_batches=None, set_sql='data'):
+    """Apply transform to the rows of table matching where_sql, resuming from the checkpoint.
+
+    transform(row_id, data) works like in migrations.update_in_chunks: it
+    returns the new JSON data, or None to leave the row unchanged. With
+    transform=None the matching rows are rewritten in SQL as SET data =
+    set_sql without decoding them; the default rewrites them as they are,
+    which fires the table's UPDATE triggers. Rows
+    inserted after the run starts (ids above the current maximum) are left
+    for the next run. max_batches stops early, as an interruption would.
+    Returns the checkpoint's rows_changed.
+    """
+    if not 0 < duty_cycle <= 1:
+        raise ValueError("duty_cycle must be in (0, 1]")
+
+    last_id, rows_seen, rows_changed, completed_at = load_checkpoint(conn, name)
+    if completed_at:
+        print(f"{name}: already completed at {completed_at} ({rows_changed} rows changed).")
+        return rows_changed
+
+    max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    if last_id:
+        print(f"{name}: resuming after id {last_id} of {max_id}.")
+    else:
+        print(f"{name}: backfilling ids up to {max_id} in batches of {batch_size}.")
+
+    start_id = last_id
+    started = time.time()
+    last_report = started
+    batches = 0
+
+    while last_id < max_id:
+        if max_batches is not None and batches >= max_batches:
+            print(f"{name}: stopped after {batches} batches at id {last_id}.")
+            return rows_changed
+
+        batch_started = time.time()
+        hi = min(last_id + batch_size, max_id)
+        try:
+            if transform is None:
+                cursor = conn.execute(
+                    f"UPDATE {table} SET data = {set_sql} WHERE id > ? AND id <= ? AND ({where_sql})",
+                    (last_id, hi, *params)
+                )
+                seen = changed = cursor.rowcount
+            else:
+                rows = conn.execute(
+                    f"SELECT id, {document_sql()} FROM {table} WHERE id > ? AND id <= ? AND ({where_sql})",
+                    (last_id, hi, *params)
+                ).fetchall()
+                updates = []
+                for row_id, data in rows:
+                    new_data = transform(row_id, json.loads(data))
+                    if new_data is not None:
+                        updates.append((json.dumps(new_data), row_id))
+                conn.executemany(f"UPDATE {table} SET data = {document_param()} WHERE id = ?", updates)
+                seen, changed = len(rows), len(updates)
+
+            conn.execute("""
+                UPDATE backfill_checkpoints
+                SET last_id = ?, rows_seen = rows_seen + ?, rows_changed = rows_changed + ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+            """, (hi, seen, changed, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception(f"Backfill {name} failed in batch ({last_id}, {hi}]; resume to retry it")
+            raise
+
+        last_id = hi
+        rows_seen += seen
+        rows_changed += changed
+        batches += 1
+
+        now = time.time()
+        if now - last_report >= PROGRESS_INTERVAL or last_id == max_id:
+            last_report = now
+            id_rate = (last_id - start_id) / max(now - started, 1e-6)
+            eta = (max_id - last_id) / id_rate if id_rate else 0
+            print(f"  {name}: id {last_id}/{max_id} ({last_id * 100 // max_id}%), "
+                  f"{rows_changed} changed, {id_rate:.0f} ids/s, ETA {format_duration(eta)}")
+
+        # Throttle: sleep so that work takes at most duty_cycle of the wall time
+        busy = time.time() - batch_started
+        time.sleep(busy * (1 - duty_cycle) / duty_cycle)
+
+    conn.execute("UPDATE backfill_checkpoints SET completed_at = CURRENT_TIMESTAMP WHERE name = ?", (name,))
+    conn.commit()
+    print(f"{name}: done, {rows_changed} of {rows_seen} matching rows changed in {format_duration(time.time() - started)}.")
+    return rows_changed
+
+def print_status(conn):
+    ensure_checkpoint_table(conn)
+    rows = conn.execute("""
+        SELECT name, last_id, rows_seen, rows_changed, updated_at, completed_at
+        FROM backfill_checkpoints ORDER BY name
+    """).fetchall()
+    if not rows:
+        print("No backfills have run.")
+    for name, last_id, rows_seen, rows_changed, updated_at, completed_at in rows:
+        state = f"completed {completed_at}" if completed_at else f"in progress, last update {updated_at}"
+        print(f"{name}: {state}; last id {last_id}, {rows_changed}/{rows_seen} rows changed")
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Run a resumable, throttled backfill over the complaints table.")
+    parser.add_argument("name", nargs="?", choices=sorted(BACKFILLS), help="backfill to run")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="ids per batch")
+    parser.add_argument("--duty-cycle", type=float, default=DEFAULT_DUTY_CYCLE,
+                        help="fraction of wall time spent writing, e.g. 0.25 sleeps 3x as long as each batch took")
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint and start from the first id")
+    parser.add_argument("--status", action="store_true", help="show the checkpoints of all backfills")
+    args = parser.parse_args()
+
+    db_path = os.getenv("DB_PATH", "bsh_complaints.db")
+    # Wait for the app's writers instead of failing with "database is locked"
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        if args.status or not args.name:
+            print_status(conn)
+            return
+        if args.restart:
+            reset_checkpoint(conn, args.name)
+        where_sql, params, transform = BACKFILLS[args.name]()
+        run_backfill(conn, args.name, where_sql, params, transform,
+                     batch_size=args.batch_size, duty_cycle=args.duty_cycle)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
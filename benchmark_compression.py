@@ -0,0 +1,57 @@
+"""
+Bytes on the wire per page, uncompressed vs. gzip (and brotli if installed).
+
+Renders each page through the Flask test client as a logged-in user, reading
+DB_PATH, and reports body sizes and the median time spent compressing.
+
+Usage:
+    python benchmark_compression.py --repeat 5
+"""
+
+import argparse
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+PAGES = ['/complaints', '/complaints?page=2', '/statistics', '/talk_with_data', '/api/complaints', '/login']
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Measure response sizes with and without compression.")
+    parser.add_argument("--repeat", type=int, default=5, help="compressions per page (median is reported)")
+    args = parser.parse_args()
+
+    import compression
+    from app import app
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'benchmark'
+    with app.test_request_context():
+        from flask import url_for
+        pages = PAGES + [url_for('static', filename='js/complaint-handlers.js')]
+
+    encodings = ['gzip'] + (['br'] if compression.brotli is not None else [])
+    print(f"{'page':<45}{'identity':>10}" + ''.join(f"{encoding:>10}{'ms':>6}" for encoding in encodings))
+    totals = dict.fromkeys(['identity'] + encodings, 0)
+    for page in pages:
+        body = client.get(page, headers={'Accept-Encoding': 'identity'}).get_data()
+        line = f"{page:<45}{len(body):>10}"
+        totals['identity'] += len(body)
+        for encoding in encodings:
+            size = len(client.get(page, headers={'Accept-Encoding': encoding}).get_data())
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                compression.compress(body, encoding)
+                timings.append((time.perf_counter() - started) * 1000)
+            line += f"{size:>10}{statistics.median(timings):>6.1f}"
+            totals[encoding] += size
+        print(line)
+    print(f"{'total':<45}{totals['identity']:>10}" + ''.join(f"{totals[encoding]:>10}{'':>6}" for encoding in encodings))
+    if compression.brotli is None:
+        print("\nBrotli is not installed; only gzip was measured.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of the json_codec backends on 100-row complaint pages.
+
+Reads the first page of complaints (with their latest technical note) from
+DB_PATH and times, per backend: decoding the page's documents, encoding them
+back, and serializing a statistics-sized plotly figure.
+
+Usage:
+    python benchmark_json_codec.py --repeat 200
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+import json_codec
+from document_storage import document_sql
+
+PAGE_SIZE = 100
+
+def load_page(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"""
+            SELECT {document_sql('c.data')}, {document_sql('tn.data')}
+            FROM complaints c
+            LEFT JOIN technical_notes tn ON tn.id = (SELECT MAX(id) FROM technical_notes WHERE complaint_id = c.id)
+            ORDER BY c.id
+            LIMIT ?
+        """, (PAGE_SIZE,)).fetchall()
+    finally:
+        conn.close()
+
+def sample_figure(page):
+    import plotly.express as px
+    problems = {}
+    for complaint, _ in page:
+        for problem in complaint['complaintDetails'].get('natureOfProblem', []):
+            problems[problem] = problems.get(problem, 0) + 1
+    return px.pie(values=list(problems.values()), names=list(problems), hole=0.4)
+
+def median_us(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings)
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compare json and orjson on 100-row complaint pages.")
+    parser.add_argument("--repeat", type=int, default=100, help="runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    rows = load_page(os.getenv("DB_PATH", "bsh_complaints.db"))
+    page = [(json_codec.loads(complaint), note and json_codec.loads(note)) for complaint, note in rows]
+    fig = sample_figure(page)
+    print(f"{len(rows)} complaints, {sum(1 for _, note in rows if note)} notes, "
+          f"{sum(len(c) + len(n or '') for c, n in rows) / 1024:.0f} KiB of JSON per page\n")
+
+    backends = ['json'] + (['orjson'] if json_codec.orjson is not None else [])
+    results = {}
+    for backend in backends:
+        json_codec.BACKEND = backend
+        results[backend] = [
+            median_us(lambda: [(json_codec.loads(c), n and json_codec.loads(n)) for c, n in rows], args.repeat),
+            median_us(lambda: [(json_codec.dumps(c), n and json_codec.dumps(n)) for c, n in page], args.repeat),
+            median_us(lambda: json_codec.plotly_json(fig), max(args.repeat // 10, 3)),
+        ]
+
+    print(f"{'per page':<20}" + ''.join(f"{backend + ' us':>12}" for backend in backends)
+          + (f"{'speedup':>10}" if len(backends) > 1 else ""))
+    for i, label in enumerate(["decode documents", "encode documents", "plotly figure"]):
+        line = f"{label:<20}" + ''.join(f"{results[backend][i]:>12.0f}" for backend in backends)
+        if len(backends) > 1:
+            line += f"{results['json'][i] / results['orjson'][i]:>9.1f}x"
+        print(line)
+    if len(backends) == 1:
+        print("\norjson is not installed; only the json module was measured.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Request latency with logging configured for debugging vs. production vs. off.
+
+Each variant runs in a fresh interpreter whose stderr is a pipe, as under
+Cloud Run, and requests every page --requests times through the Flask test
+client as a logged-in user, reading DB_PATH:
+
+- 'debug-sync': DEBUG, every record written by the request thread, as before
+- 'debug-queue': DEBUG, every record, written by the QueueListener thread
+- 'production': INFO, JSON lines, queue, hot-path debug sampled
+- 'off': logging disabled
+
+Usage:
+    python benchmark_logging.py --requests 50
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGES = ['/complaints', '/complaints/1/unified', '/api/complaints', '/statistics']
+
+VARIANTS = {
+    'debug-sync': {'LOG_LEVEL': 'DEBUG', 'LOG_FORMAT': 'text', 'LOG_SAMPLE_EVERY': '1'},
+    'debug-queue': {'LOG_LEVEL': 'DEBUG', 'LOG_FORMAT': 'text', 'LOG_SAMPLE_EVERY': '1'},
+    'production': {'LOG_LEVEL': 'INFO', 'LOG_FORMAT': 'json'},
+    'off': {'LOG_LEVEL': 'INFO', 'LOG_FORMAT': 'json'},
+}
+
+def measure(variant, requests, output):
+    import logging
+    import app_logging
+    from app import app
+
+    if variant == 'debug-sync':
+        app_logging.stop_logging()
+        root = logging.getLogger()
+        root.handlers[0] = logging.StreamHandler(sys.stderr)
+        root.handlers[0].setFormatter(app_logging.make_formatter())
+    elif variant == 'off':
+        logging.disable(logging.CRITICAL)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'benchmark'
+    lines = []
+    for page in PAGES:
+        client.get(page)  # first request: compiles templates, fills caches
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            client.get(page)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        lines.append(f"{page}\t{statistics.median(timings):.3f}\t{timings[int(len(timings) * 0.95) - 1]:.3f}\n")
+    app_logging.stop_logging()
+    with open(output, 'w') as f:
+        f.writelines(lines)
+
+def run(variant, requests):
+    env = dict(os.environ, **VARIANTS[variant])
+    with tempfile.NamedTemporaryFile('r', suffix='.tsv') as output:
+        result = subprocess.run([sys.executable, __file__, "--variant", variant, "--requests", str(requests),
+                                 "--output", output.name], env=env, capture_output=True, check=True)
+        timings = {page: (float(median), float(p95)) for page, median, p95 in
+                   (line.rstrip('\n').split("\t") for line in output)}
+    return timings, len(result.stderr) + len(result.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure request latency with different logging setups.")
+    parser.add_argument("--requests", type=int, default=50, help="requests per page")
+    parser.add_argument("--variant", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        measure(args.variant, args.requests, args.output)
+        return
+
+    print(f"DB_PATH={os.getenv('DB_PATH', 'bsh_complaints.db')}, {args.requests} requests per page, "
+          f"median / p95 ms\n")
+    results = {variant: run(variant, args.requests) for variant in VARIANTS}
+    print(f"{'page':<25}" + ''.join(f"{variant:>20}" for variant in VARIANTS))
+    for page in PAGES:
+        print(f"{page:<25}" + ''.join(f"{results[v][0][page][0]:>12.1f} /{results[v][0][page][1]:>6.1f}"
+                                      for v in VARIANTS))
+    print(f"{'log output KiB':<25}" + ''.join(f"{results[v][1] / 1024:>20.1f}" for v in VARIANTS))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Memory of a 10,000-complaint batch as decoded tuples vs. records.Complaint.
+
+Each variant runs in a fresh interpreter so peak resident memory is its own:
+'tuples' loads the batch the way export and batch processing used to
+(get_all_complaints with decoded documents), 'records' with
+projection='records'. Both then walk the batch, decoding each complaint and
+note in turn as the export does.
+
+Usage:
+    python benchmark_records.py --limit 10000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+def measure(mode, limit):
+    import app
+
+    baseline_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    started = time.perf_counter()
+    conn = app.connect_to_db()
+    complaints, _ = app.fetch_complaints(conn, 1, limit, projection='records' if mode == 'records' else None)
+    conn.close()
+    loaded = time.perf_counter() - started
+    held = tracemalloc.get_traced_memory()[0]
+
+    customers = set()
+    for complaint in complaints:
+        if mode == 'records':
+            data = complaint.document()
+            note = complaint.note and complaint.note.document()
+        else:
+            _, data, note = complaint
+        customers.add((data['customerInformation']['fullName'], bool(note)))
+    walked = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{mode}\t{len(complaints)}\t{held / 2**20:.1f}\t{peak / 2**20:.1f}\t{(rss_kib - baseline_kib) / 1024:.1f}\t{loaded:.2f}\t{walked:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batch memory with and without records.")
+    parser.add_argument("--limit", type=int, default=10000, help="complaints per batch")
+    parser.add_argument("--mode", choices=["tuples", "records"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args.mode, args.limit)
+        return
+
+    print(f"DB_PATH={os.getenv('DB_PATH', 'bsh_complaints.db')}, batch of up to {args.limit}\n")
+    print(f"{'variant':<10}{'rows':>7}{'held MiB':>10}{'peak MiB':>10}{'RSS +MiB':>10}{'load s':>8}{'walk s':>8}")
+    for mode in ("tuples", "records"):
+        result = subprocess.run([sys.executable, __file__, "--mode", mode, "--limit", str(args.limit)],
+                                capture_output=True, text=True, check=True)
+        line = result.stdout.strip().splitlines()[-1].split("\t")
+        print(f"{line[0]:<10}{line[1]:>7}" + ''.join(f"{value:>10}" for value in line[2:5]) + f"{line[5]:>8}{line[6]:>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the complaint list and statistics queries on the JSON text
+documents against JSONB documents (document_storage.py, SQLite 3.45+) and the
+normalized layout (normalized_schema.py).
+
+The database at DB_PATH is copied to temporary files: one gets the
+normalized layout installed and backfilled, another has its documents
+converted to JSONB. Each query runs --repeat times per layout, and results
+are checked to agree with the JSON text queries. The speedup column compares
+JSON text with the normalized layout.
+
+Usage:
+    python benchmark_schemas.py --repeat 20
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+import document_storage
+import normalized_schema
+from app import get_period_statistics, query_complaints_json
+from time_periods import parse_filter_period
+
+def scenarios():
+    year = parse_filter_period('1y')
+    return [
+        ("list, first page", 'list', dict()),
+        ("list, 12 months", 'list', dict(period=year)),
+        ("list, country + status", 'list', dict(country='Turkey', status='Not Resolved')),
+        ("list, brand + warranty", 'list', dict(brand='Bosch', warranty='Active')),
+        ("list, search", 'list', dict(search='ice')),
+        ("list, has notes, page 5", 'list', dict(has_notes=True, page=5)),
+        ("statistics, 12 months", 'stats', dict(start=year.start_date.isoformat(), end=year.end_date.isoformat())),
+        ("statistics, 12 months, has notes", 'stats', dict(start=year.start_date.isoformat(), end=year.end_date.isoformat(), has_notes=True)),
+    ]
+
+def run_query(cursor, kind, options, normalized):
+    options = dict(options)
+    if kind == 'list':
+        page = options.pop('page', 1)
+        query = normalized_schema.query_complaints if normalized else query_complaints_json
+        rows, total = query(cursor, page, 100, **options)
+        return total, sorted(row[0] for row in rows)
+    query = normalized_schema.period_statistics if normalized else get_period_statistics
+    stats = query(cursor, options['start'], options['end'], options.get('has_notes', False))
+    return stats['total_complaints'], dict(stats['problem_distribution'])
+
+def time_query(cursor, kind, options, normalized, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run_query(cursor, kind, options, normalized)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Compare JSON, JSONB and normalized query times on copies of the database.")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per query and layout (median is reported)")
+    args = parser.parse_args()
+
+    source = os.getenv("DB_PATH", "bsh_complaints.db")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "benchmark.db")
+        shutil.copy(source, db_path)
+        conn = sqlite3.connect(db_path)
+        jsonb_conn = None
+        try:
+            complaints = conn.execute("SELECT COUNT(*) FROM complaints").fetchone()[0]
+            started = time.time()
+            normalized_schema.install(conn)
+            normalized_schema.backfill(conn, batch_size=10000, duty_cycle=1)
+            print(f"Normalized {complaints} complaints in {time.time() - started:.1f}s.")
+
+            if document_storage.JSONB_SUPPORTED:
+                jsonb_path = os.path.join(tmp, "benchmark_jsonb.db")
+                shutil.copy(source, jsonb_path)
+                jsonb_conn = sqlite3.connect(jsonb_path)
+                started = time.time()
+                document_storage.convert(jsonb_conn, 'jsonb', batch_size=10000, duty_cycle=1)
+                print(f"Converted {complaints} complaints to JSONB in {time.time() - started:.1f}s.")
+            else:
+                print(f"SQLite {sqlite3.sqlite_version} has no JSONB (needs 3.45+); skipping the JSONB layout.")
+
+            print(f"\n{'query':<36} {'json ms':>10} {'jsonb ms':>10} {'normalized ms':>14} {'speedup':>8}")
+            for label, kind, options in scenarios():
+                json_ms, expected = time_query(conn.cursor(), kind, options, False, args.repeat)
+                results = {}
+                jsonb_ms = None
+                if jsonb_conn:
+                    jsonb_ms, results['jsonb'] = time_query(jsonb_conn.cursor(), kind, options, False, args.repeat)
+                normalized_ms, results['normalized'] = time_query(conn.cursor(), kind, options, True, args.repeat)
+                differ = [layout for layout, result in results.items() if result != expected]
+                mismatch = f"  ({', '.join(differ)} results differ!)" if differ else ""
+                jsonb_column = f"{jsonb_ms:>10.1f}" if jsonb_ms is not None else f"{'n/a':>10}"
+                print(f"{label:<36} {json_ms:>10.1f} {jsonb_column} {normalized_ms:>14.1f} "
+                      f"{json_ms / max(normalized_ms, 1e-6):>7.1f}x{mismatch}")
+        finally:
+            conn.close()
+            if jsonb_conn:
+                jsonb_conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+First-request latency after a cold start, with and without compiled-template caching.
+
+Each variant starts a fresh interpreter, imports the app, renders every page
+once (the first request a new worker serves) and then again (warm), reading
+DB_PATH:
+
+- 'compile': empty bytecode cache and debug/auto-reload on, as before
+- 'bytecode': bytecode cache filled by template_cache.py, production settings
+- 'preloaded': production, templates precompiled before the first request as
+  create_app() does in the gunicorn master
+
+Usage:
+    python benchmark_templates.py --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGES = ['/login', '/talk_with_data', '/complaints/1/unified', '/complaints', '/statistics']
+MODES = ['compile', 'bytecode', 'preloaded']
+
+def measure(mode, output):
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app import app
+    from template_cache import precompile_templates
+
+    app.debug = mode == 'compile'
+    if mode == 'preloaded':
+        precompile_templates(app)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'benchmark'
+    lines = []
+    for page in PAGES:
+        timings = []
+        for _ in range(2):
+            started = time.perf_counter()
+            response = client.get(page)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200, (page, response.status_code)
+        lines.append(f"{page}\t{timings[0]:.3f}\t{timings[1]:.3f}\n")
+    # The app prints as it goes, so results go to a file instead of stdout
+    with open(output, 'w') as f:
+        f.writelines(lines)
+
+def run(mode, cache_dir):
+    env = dict(os.environ, TEMPLATE_CACHE_DIR=cache_dir)
+    with tempfile.NamedTemporaryFile('r', suffix='.tsv') as output:
+        subprocess.run([sys.executable, __file__, "--mode", mode, "--output", output.name], env=env,
+                       capture_output=True, check=True)
+        lines = [line.rstrip('\n').split("\t") for line in output]
+    return {page: (float(first), float(warm)) for page, first, warm in lines}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure first-request latency with and without template caching.")
+    parser.add_argument("--repeat", type=int, default=5, help="cold starts per variant (median is reported)")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args.mode, args.output)
+        return
+
+    print(f"DB_PATH={os.getenv('DB_PATH', 'bsh_complaints.db')}, median of {args.repeat} cold starts, ms\n")
+    results = {}
+    with tempfile.TemporaryDirectory() as empty_root, tempfile.TemporaryDirectory() as filled:
+        subprocess.run([sys.executable, "template_cache.py"], env=dict(os.environ, TEMPLATE_CACHE_DIR=filled),
+                       capture_output=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        for mode in MODES:
+            runs = []
+            for i in range(args.repeat):
+                # 'compile' gets a new empty cache per start so nothing is reused
+                cache_dir = os.path.join(empty_root, str(i)) if mode == 'compile' else filled
+                runs.append(run(mode, cache_dir))
+            results[mode] = {page: (statistics.median(r[page][0] for r in runs),
+                                    statistics.median(r[page][1] for r in runs)) for page in PAGES}
+
+    print(f"{'page':<25}" + ''.join(f"{mode + ' 1st':>15}{'warm':>7}" for mode in MODES))
+    for page in PAGES:
+        print(f"{page:<25}" + ''.join(f"{results[mode][page][0]:>15.1f}{results[mode][page][1]:>7.1f}" for mode in MODES))
+    totals = {mode: sum(results[mode][page][0] for page in PAGES) for mode in MODES}
+    print(f"{'total first requests':<25}" + ''.join(f"{totals[mode]:>15.1f}{'':>7}" for mode in MODES))
+
+if __name__ == "__main__":
+    main()
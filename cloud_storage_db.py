@@ -2,10 +2,13 @@ import os
 import sqlite3
 import tempfile
 import shutil
-from google.cloud import storage
 import logging
 
+from app_logging import hot_path_logger
+from environment import is_production
+
 logger = logging.getLogger(__name__)
+hot_logger = hot_path_logger(__name__)
 
 class CloudStorageDB:
     """
@@ -19,10 +22,14 @@ class CloudStorageDB:
         self.local_db_path = f'/tmp/{db_filename}'
         self.client = None
         self.bucket = None
-        
-        # Initialize GCS client if in production
-        if self._is_production():
+        self._init_client()
+    
+    def _init_client(self):
+        """Initialize the GCS client if in production"""
+        if is_production():
             try:
+                # Only production needs the Cloud Storage SDK
+                from google.cloud import storage
                 self.client = storage.Client()
                 self.bucket = self.client.bucket(self.bucket_name)
                 logger.info(f"Initialized Cloud Storage client for bucket: {self.bucket_name}")
@@ -32,18 +39,15 @@ class CloudStorageDB:
         else:
             logger.info("Development mode: Using local SQLite")
     
-    def _is_production(self):
-        """Check if running in production environment"""
-        return (
-            os.getenv('FLASK_ENV') == 'production' or 
-            os.getenv('ENVIRONMENT') == 'production' or
-            os.getenv('GAE_ENV') or  # Google App Engine
-            os.getenv('K_SERVICE')   # Cloud Run
-        )
+    def reset_after_fork(self):
+        """Recreate the GCS client in a forked worker; its HTTP session is not fork-safe"""
+        self.client = None
+        self.bucket = None
+        self._init_client()
     
     def get_db_path(self):
         """Get the path to the SQLite database file"""
-        if self._is_production() and self.client:
+        if is_production() and self.client:
             return self.local_db_path
         else:
             # Development mode - use local file
@@ -66,12 +70,21 @@ class CloudStorageDB:
             # Download to local temp file
             blob.download_to_filename(self.local_db_path)
             logger.info(f"Downloaded database from GCS to {self.local_db_path}")
+            self._database_replaced()
             return True
             
         except Exception as e:
             logger.error(f"Failed to download database from GCS: {e}")
             return False
     
+    def _database_replaced(self):
+        """Drop the data_version watch connection and facet cache of the previous database file"""
+        # Imported here: db_version looks up the database path through this module
+        from db_version import data_version
+        from facets import facet_cache
+        data_version.reset()
+        facet_cache.clear()
+    
     def upload_db_to_gcs(self):
         """Upload database to Google Cloud Storage"""
         if not self.client or not self.bucket:
@@ -92,22 +105,22 @@ class CloudStorageDB:
             logger.error(f"Failed to upload database to GCS: {e}")
             return False
     
-    def connect(self):
-        """Get a connection to the SQLite database"""
+    def connect(self, factory=sqlite3.Connection):
+        """Get a connection to the SQLite database (a `factory` instance, as in sqlite3.connect)"""
         db_path = self.get_db_path()
         
         # In production, ensure we have the latest DB from GCS
-        if self._is_production() and self.client:
+        if is_production() and self.client:
             # Only download if local file doesn't exist
             if not os.path.exists(self.local_db_path):
                 self.download_db_from_gcs()
         
         try:
-            conn = sqlite3.connect(db_path)
+            conn = sqlite3.connect(db_path, factory=factory)
             conn.row_factory = sqlite3.Row
             conn.execute("PRAGMA foreign_keys = ON")
             
-            logger.debug(f"Connected to SQLite database at {db_path}")
+            hot_logger.debug("Connected to SQLite database at %s", db_path)
             return conn
             
         except Exception as e:
@@ -116,13 +129,13 @@ class CloudStorageDB:
     
     def backup_to_gcs(self):
         """Manual backup to GCS (called after significant changes)"""
-        if self._is_production() and self.client:
+        if is_production() and self.client:
             return self.upload_db_to_gcs()
         return True
     
     def initialize_db_if_needed(self):
         """Initialize database and download from GCS if available"""
-        if self._is_production() and self.client:
+        if is_production() and self.client:
             # Try to download existing DB from GCS
             if not self.download_db_from_gcs():
                 logger.info("No existing database in GCS, will create new one")
@@ -0,0 +1,106 @@
+"""
+gzip/brotli compression of text responses.
+
+init_compression(app) registers an after_request hook that compresses HTML,
+JSON, CSV, JavaScript and CSS bodies of at least COMPRESS_MIN_SIZE bytes for
+clients that accept it. Brotli is used when the Brotli package is installed
+and the client sends 'br'; otherwise gzip from the standard library.
+
+Streamed responses (server-sent events, TTS audio) pass through untouched so
+they still reach the client chunk by chunk. Static files are compressed once
+per file version and kept in memory.
+"""
+
+import gzip
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies aren't worth the CPU and headers
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+# Compressed static files by (path, ETag, encoding)
+_static_cache = {}
+_static_cache_lock = threading.Lock()
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for a request's Accept-Encoding header."""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _should_compress(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return response.content_length is None or response.content_length >= COMPRESS_MIN_SIZE
+
+def compress_response(response, request):
+    """Compress response in place if the client and the content allow it; returns response."""
+    if not _should_compress(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.direct_passthrough:
+        # send_file() responses; only static files are worth caching compressed
+        if request.endpoint != 'static':
+            return response
+        etag, _ = response.get_etag()
+        key = (request.path, etag, encoding)
+        with _static_cache_lock:
+            body = _static_cache.get(key)
+        if body is None:
+            response.direct_passthrough = False
+            body = compress(response.get_data(), encoding)
+            with _static_cache_lock:
+                _static_cache[key] = body
+        else:
+            response.response.close()
+    elif response.is_streamed:
+        return response
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        body = compress(data, encoding)
+
+    response.direct_passthrough = False
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # The compressed body differs byte for byte, so strong validators become weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def init_compression(app):
+    """Compress the app's responses (see module docstring)."""
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request)
@@ -0,0 +1,515 @@
+"""
+Compact, size-bounded data context builder for the Talk with Data prompts.
+
+Only the sections relevant to the question are queried and rendered, each as a
+pipe-separated table, and the result is trimmed to a token budget so prompt
+size (and OpenAI latency) stays flat regardless of how many brands, models or
+categories are in the database.
+"""
+
+import os
+import json
+import logging
+import re
+import threading
+
+from metrics import DATA_CONTEXT_TOKENS, DATA_QUERY_PROMPT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the size of the data context, in (estimated) tokens
+DEFAULT_TOKEN_BUDGET = int(os.getenv('DATA_CONTEXT_TOKEN_BUDGET', '1200'))
+
+# Rough average for English/Turkish text when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+# Patterns (English and Turkish) that select a section of the context. Each is
+# matched as whole words; \w* lets a stem take any suffix ("resolved", "garantisi").
+INTENT_KEYWORDS = {
+    'resolution': [r'resolv\w*', r'resolutions?', 'solved', 'fixed', 'status', r'çözül\w*', r'çözüm\w*'],
+    'resolution_time': [r'fast(?:er|est)?', r'slow(?:er|est)?', 'how long', 'how many days', 'time to',
+                        r'resolution times?', r'hızlı\w*', r'yavaş\w*', r'süre\w*', r'kaç gün\w*'],
+    'brand': [r'brands?', 'bosch', 'siemens', 'gaggenau', 'neff', 'profilo', r'marka\w*'],
+    'category': [r'categor\w*', r'problems?', r'issues?', 'common', r'types?', r'kategori\w*', r'sorun\w*', r'arıza\w*'],
+    'model': [r'models?', r'products?', r'ürün\w*'],
+    'warranty': [r'warrant\w*', r'garanti\w*'],
+    'trend': [r'trends?', 'over time', r'patterns?', 'progression', 'historical', r'changes?', 'evolution',
+              'monthly', r'(?:per|by|each) month', r'eğilim\w*', 'aylık'],
+}
+
+# One compiled pattern per intent, built once at import
+INTENT_PATTERNS = {
+    intent: re.compile(r'\b(?:' + '|'.join(keywords) + r')\b')
+    for intent, keywords in INTENT_KEYWORDS.items()
+}
+
+# Sections used when the question does not match any keyword
+DEFAULT_INTENTS = ('resolution', 'category', 'brand')
+
+# Render order, which is also the trimming priority (last section is trimmed first)
+SECTION_ORDER = ['resolution', 'resolution_time', 'brand', 'category', 'model', 'warranty', 'trend']
+
+BASE_WHERE = """
+    WHERE date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
+    AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
+"""
+
+_encoder = None
+_encoder_loaded = False
+
+def estimate_tokens(text):
+    """Estimate the number of prompt tokens in text, using tiktoken if installed."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            _encoder = None
+    if _encoder is not None:
+        return len(_encoder.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def detect_intents(question):
+    """Return the set of context sections relevant to a question.
+    
+    A question of None (e.g. the custom period summary) selects every section.
+    """
+    if question is None:
+        return set(SECTION_ORDER)
+    
+    question_lower = question.lower()
+    intents = {
+        intent for intent, pattern in INTENT_PATTERNS.items()
+        if pattern.search(question_lower)
+    }
+    # Resolution times are always reported per brand
+    if 'resolution_time' in intents:
+        intents.add('brand')
+    return intents or set(DEFAULT_INTENTS)
+
+class ContextStats:
+    """Thread-safe running totals of data context size per request.
+
+    Every recorded value is also observed in the bsh_data_context_tokens and
+    bsh_data_query_prompt_tokens histograms served at /metrics.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.context_tokens = 0
+        self.prompt_requests = 0
+        self.prompt_tokens = 0
+        self.trimmed_requests = 0
+    
+    def record_context(self, tokens, trimmed=False):
+        DATA_CONTEXT_TOKENS.observe(tokens, trimmed=str(bool(trimmed)).lower())
+        with self._lock:
+            self.requests += 1
+            self.context_tokens += tokens
+            if trimmed:
+                self.trimmed_requests += 1
+    
+    def record_prompt_tokens(self, tokens):
+        """Record the prompt token count reported by the OpenAI usage block."""
+        if tokens is None:
+            return
+        DATA_QUERY_PROMPT_TOKENS.observe(tokens)
+        with self._lock:
+            self.prompt_requests += 1
+            self.prompt_tokens += tokens
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'avg_context_tokens': self.context_tokens / self.requests if self.requests else 0.0,
+                'trimmed_requests': self.trimmed_requests,
+                'prompt_requests': self.prompt_requests,
+                'avg_prompt_tokens': self.prompt_tokens / self.prompt_requests if self.prompt_requests else 0.0,
+            }
+
+# Global instance
+context_stats = ContextStats()
+
+def _pct(count, total):
+    return f"{(count / total * 100):.1f}" if total else "0.0"
+
+def _table(title, columns, rows):
+    """Build a section as (header line, row lines)."""
+    header = f"{title} ({'|'.join(columns)}):"
+    return header, ['|'.join(str(value) for value in row) for row in rows]
+
+def _render(sections):
+    lines = []
+    for header, rows, omitted in sections:
+        lines.append(header)
+        lines.extend(rows)
+        if omitted:
+            lines.append(f"... {omitted} more rows omitted")
+    return '\n'.join(lines)
+
+def _fit_to_budget(preamble, sections, token_budget):
+    """Drop trailing rows from the lowest-priority sections until the text fits."""
+    sections = [[header, list(rows), 0] for header, rows in sections]
+    trimmed = False
+    
+    def text():
+        return '\n'.join(filter(None, [preamble, _render(sections)]))
+    
+    current = text()
+    while sections and estimate_tokens(current) > token_budget:
+        trimmed = True
+        section = sections[-1]
+        if len(section[1]) > 1:
+            # Halve the section, keeping the highest-ranked rows
+            keep = len(section[1]) // 2
+            section[2] += len(section[1]) - keep
+            section[1] = section[1][:keep]
+        else:
+            sections.pop()
+        current = text()
+    return current, trimmed
+
+def build_data_context(cursor, start_date, end_date, time_period, question=None, token_budget=None):
+    """Build the data context for a time period, limited to the sections the question needs.
+    
+    Args:
+        cursor: Open database cursor
+        start_date, end_date: Period boundaries (date or datetime)
+        time_period: Human-readable description of the period
+        question: The user's question; None selects every section
+        token_budget: Maximum context size in tokens (defaults to DEFAULT_TOKEN_BUDGET)
+    
+    Returns:
+        tuple: (context text, estimated token count)
+    """
+    token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+    intents = detect_intents(question)
+    start_date_str = start_date.strftime('%Y-%m-%d')
+    end_date_str = end_date.strftime('%Y-%m-%d')
+    base_params = [start_date_str, end_date_str]
+    
+    cursor.execute("SELECT COUNT(*) FROM complaints")
+    total_complaints_overall = cursor.fetchone()[0]
+    
+    # One grouped pass gives the period total, the status breakdown and per-brand resolution rates
+    cursor.execute(f"""
+        SELECT 
+            json_extract(data, '$.productInformation.brand') as brand,
+            json_extract(data, '$.complaintDetails.resolutionStatus') as status,
+            COUNT(*) as count
+        FROM complaints {BASE_WHERE}
+        GROUP BY brand, status
+    """, base_params)
+    
+    status_counts = {}
+    brand_counts = {}
+    for brand, status, count in cursor.fetchall():
+        status_counts[status] = status_counts.get(status, 0) + count
+        if brand is not None:
+            stats = brand_counts.setdefault(brand, {'total': 0, 'resolved': 0})
+            stats['total'] += count
+            if status == 'Resolved':
+                stats['resolved'] += count
+    
+    total_complaints_period = sum(status_counts.values())
+    resolved_complaints = status_counts.get('Resolved', 0)
+    
+    preamble = (
+        f"PERIOD: {time_period} ({start_date_str} to {end_date_str})\n"
+        f"TOTALS: complaints_in_period={total_complaints_period} complaints_in_database={total_complaints_overall} "
+        f"coverage={_pct(total_complaints_period, total_complaints_overall)}% "
+        f"resolved={resolved_complaints}/{total_complaints_period} ({_pct(resolved_complaints, total_complaints_period)}%)"
+    )
+    
+    sections = []
+    for intent in SECTION_ORDER:
+        if intent not in intents:
+            continue
+        
+        if intent == 'resolution':
+            rows = sorted(status_counts.items(), key=lambda x: x[1], reverse=True)
+            sections.append(_table('RESOLUTION STATUS', ['status', 'complaints', 'pct'],
+                                   [(status or 'Not Set', count, _pct(count, total_complaints_period)) for status, count in rows]))
+            rows = sorted(brand_counts.items(), key=lambda x: x[1]['total'], reverse=True)
+            sections.append(_table('BRAND RESOLUTION RATES', ['brand', 'resolved', 'total', 'rate_pct'],
+                                   [(brand, s['resolved'], s['total'], _pct(s['resolved'], s['total'])) for brand, s in rows]))
+        
+        elif intent == 'resolution_time':
+            overall = get_overall_resolution_stats(cursor, start_date_str, end_date_str)
+            if overall:
+                sections.append(_table('OVERALL RESOLUTION TIME STATISTICS', ['avg_days', 'min_days', 'max_days', 'resolved_complaints'],
+                                       [(f"{overall['avg_days']:.1f}", f"{overall['min_days']:.1f}", f"{overall['max_days']:.1f}", overall['count'])]))
+            brand_times = get_brand_resolution_times(cursor, start_date_str, end_date_str)
+            if brand_times:
+                # Already ordered fastest first
+                sections.append(_table('BRAND RESOLUTION TIME STATISTICS', ['brand', 'avg_days', 'min_days', 'max_days', 'resolved_complaints'],
+                                       [(brand, f"{s['avg_days']:.1f}", f"{s['min_days']:.0f}", f"{s['max_days']:.0f}", s['count'])
+                                        for brand, s in brand_times.items()]))
+        
+        elif intent == 'brand':
+            rows = sorted(brand_counts.items(), key=lambda x: x[1]['total'], reverse=True)
+            sections.append(_table('BRAND STATISTICS', ['brand', 'complaints', 'pct'],
+                                   [(brand, s['total'], _pct(s['total'], total_complaints_period)) for brand, s in rows]))
+        
+        elif intent == 'category':
+            cursor.execute(f"""
+                SELECT json_extract(data, '$.complaintDetails.natureOfProblem') as problems
+                FROM complaints {BASE_WHERE}
+            """, base_params)
+            category_counts = {}
+            for (problems_json,) in cursor.fetchall():
+                if not problems_json:
+                    continue
+                try:
+                    problems = json.loads(problems_json) if isinstance(problems_json, str) else problems_json
+                except (json.JSONDecodeError, TypeError):
+                    continue
+                for problem in problems if isinstance(problems, list) else [problems]:
+                    category_counts[problem] = category_counts.get(problem, 0) + 1
+            rows = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+            sections.append(_table('TOP COMPLAINT CATEGORIES', ['category', 'complaints', 'pct'],
+                                   [(category, count, _pct(count, total_complaints_period)) for category, count in rows]))
+        
+        elif intent == 'model':
+            cursor.execute(f"""
+                SELECT json_extract(data, '$.productInformation.modelNumber') as model, COUNT(*) as count
+                FROM complaints {BASE_WHERE}
+                AND json_extract(data, '$.productInformation.modelNumber') IS NOT NULL
+                GROUP BY model
+                ORDER BY count DESC
+                LIMIT 10
+            """, base_params)
+            sections.append(_table('TOP PRODUCT MODELS', ['model', 'complaints', 'pct'],
+                                   [(model, count, _pct(count, total_complaints_period)) for model, count in cursor.fetchall()]))
+        
+        elif intent == 'warranty':
+            cursor.execute(f"""
+                SELECT 
+                    json_extract(data, '$.warrantyInformation.warrantyStatus') as status,
+                    COUNT(*) as count
+                FROM complaints {BASE_WHERE}
+                GROUP BY status
+                ORDER BY count DESC
+            """, base_params)
+            sections.append(_table('WARRANTY STATUS DISTRIBUTION', ['status', 'complaints', 'pct'],
+                                   [(status, count, _pct(count, total_complaints_period)) for status, count in cursor.fetchall()]))
+        
+        elif intent == 'trend':
+            cursor.execute(f"""
+                SELECT 
+                    strftime('%Y-%m', json_extract(data, '$.complaintDetails.dateOfComplaint')) as month,
+                    COUNT(*) as count
+                FROM complaints {BASE_WHERE}
+                GROUP BY month
+                ORDER BY month
+            """, base_params)
+            monthly_trends = cursor.fetchall()
+            if len(monthly_trends) >= 2 and monthly_trends[-2][1] > 0:
+                trend_change = (monthly_trends[-1][1] - monthly_trends[-2][1]) / monthly_trends[-2][1] * 100
+                trend_direction = "increasing" if trend_change > 5 else "decreasing" if trend_change < -5 else "stable"
+                preamble += f"\nTREND: {trend_direction} ({trend_change:+.1f}% change from previous month)"
+            # Most recent months first so trimming drops the oldest ones
+            sections.append(_table('MONTHLY TREND', ['month', 'complaints'],
+                                   [(month, count) for month, count in reversed(monthly_trends)]))
+    
+    sections = [(header, rows) for header, rows in sections if rows]
+    data_context, trimmed = _fit_to_budget(preamble, sections, token_budget)
+    tokens = estimate_tokens(data_context)
+    context_stats.record_context(tokens, trimmed=trimmed)
+    logger.debug(f"Built data context: sections={sorted(intents)} tokens={tokens} trimmed={trimmed}")
+    
+    return data_context, tokens
+
+def get_brand_resolution_times(cursor, start_date_str, end_date_str):
+    """Get brand-specific resolution time statistics."""
+    try:
+        # Query to get resolution times by brand
+        cursor.execute("""
+            SELECT 
+                json_extract(data, '$.productInformation.brand') as brand,
+                AVG(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as avg_days,
+                MIN(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as min_days,
+                MAX(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as max_days,
+                COUNT(*) as count
+            FROM complaints
+            WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
+            AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
+            AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
+            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
+            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
+            GROUP BY brand
+            HAVING count >= 1
+            ORDER BY avg_days ASC
+        """, [start_date_str, end_date_str])
+        
+        results = cursor.fetchall()
+        brand_stats = {}
+        
+        for brand, avg_days, min_days, max_days, count in results:
+            if avg_days is not None and count > 0 and brand is not None:
+                brand_stats[brand] = {
+                    'avg_days': avg_days,
+                    'min_days': min_days or 0,
+                    'max_days': max_days or 0,
+                    'count': count
+                }
+        
+        # If no data found for the specific period, get overall data
+        if not brand_stats:
+            logger.info("No resolution time data found for the specified period, getting overall data")
+            cursor.execute("""
+                SELECT 
+                    json_extract(data, '$.productInformation.brand') as brand,
+                    AVG(
+                        CAST(
+                            (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                             julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                        )
+                    ) as avg_days,
+                    MIN(
+                        CAST(
+                            (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                             julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                        )
+                    ) as min_days,
+                    MAX(
+                        CAST(
+                            (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                             julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                        )
+                    ) as max_days,
+                    COUNT(*) as count
+                FROM complaints
+                WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
+                AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
+                AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
+                GROUP BY brand
+                HAVING count >= 1
+                ORDER BY avg_days ASC
+            """)
+            
+            results = cursor.fetchall()
+            for brand, avg_days, min_days, max_days, count in results:
+                if avg_days is not None and count > 0 and brand is not None:
+                    brand_stats[brand] = {
+                        'avg_days': avg_days,
+                        'min_days': min_days or 0,
+                        'max_days': max_days or 0,
+                        'count': count
+                    }
+        
+        return brand_stats
+        
+    except Exception as e:
+        logger.error(f"Error getting brand resolution times: {e}")
+        return {}
+
+def get_overall_resolution_stats(cursor, start_date_str, end_date_str):
+    """Get overall resolution time statistics."""
+    try:
+        # Query to get overall resolution time statistics
+        cursor.execute("""
+            SELECT 
+                AVG(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as avg_days,
+                MIN(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as min_days,
+                MAX(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as max_days,
+                COUNT(*) as count
+            FROM complaints
+            WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
+            AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
+            AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
+            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) >= ?
+            AND date(json_extract(data, '$.complaintDetails.dateOfComplaint')) <= ?
+        """, [start_date_str, end_date_str])
+        
+        result = cursor.fetchone()
+        
+        if result and result[0] is not None:
+            avg_days, min_days, max_days, count = result
+            return {
+                'avg_days': avg_days,
+                'min_days': min_days or 0,
+                'max_days': max_days or 0,
+                'count': count
+            }
+        
+        # If no data found for the specific period, get overall data
+        logger.info("No overall resolution time data found for the specified period, getting overall data")
+        cursor.execute("""
+            SELECT 
+                AVG(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as avg_days,
+                MIN(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as min_days,
+                MAX(
+                    CAST(
+                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
+                    )
+                ) as max_days,
+                COUNT(*) as count
+            FROM complaints
+            WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
+            AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
+            AND json_extract(data, '$.complaintDetails.dateOfComplaint') IS NOT NULL
+        """)
+        
+        result = cursor.fetchone()
+        
+        if result and result[0] is not None:
+            avg_days, min_days, max_days, count = result
+            return {
+                'avg_days': avg_days,
+                'min_days': min_days or 0,
+                'max_days': max_days or 0,
+                'count': count
+            }
+        
+        return None
+        
+    except Exception as e:
+        logger.error(f"Error getting overall resolution stats: {e}")
+        return None
+
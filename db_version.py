@@ -0,0 +1,126 @@
+"""
+Cheap change detection for the SQLite database.
+
+PRAGMA data_version on a connection changes whenever another connection
+commits to the database file, from this process or any other. DataVersion
+keeps one long-lived watch connection per process that never writes, so its
+data_version moves on every commit and caches can key on current() instead of
+rescanning tables.
+
+data_version numbers differ between processes, so anything handed to clients
+(ETags) uses the data_changes table instead: a counter that triggers bump on
+every write to complaints or technical_notes, the same for every worker.
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+
+CHANGE_COUNTER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS data_changes (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    database_id TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO data_changes (id, database_id, version) VALUES (1, lower(hex(randomblob(8))), 0);
+"""
+
+CHANGE_COUNTER_TABLES = ('complaints', 'technical_notes')
+
+def install_change_counter(conn):
+    """Create the data_changes counter and the triggers that bump it (idempotent)."""
+    statements = [CHANGE_COUNTER_SCHEMA]
+    for table in CHANGE_COUNTER_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            statements.append(f"""
+                CREATE TRIGGER IF NOT EXISTS data_changes_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE data_changes SET version = version + 1 WHERE id = 1;
+                END;
+            """)
+    conn.executescript(''.join(statements))
+
+def database_path():
+    """Path of the database connect_to_db() opens."""
+    try:
+        from cloud_storage_db import cloud_db
+        return cloud_db.get_db_path()
+    except ImportError:
+        return os.getenv('DB_PATH', 'bsh_complaints.db')
+
+class DataVersion:
+    """Process-local version token for the database, from PRAGMA data_version."""
+
+    def __init__(self, path_func=database_path):
+        self._path_func = path_func
+        self._lock = threading.Lock()
+        self._conn = None
+        self._path = None
+        self._serial = itertools.count()
+        self._connection_id = None
+        self._changes_token = None
+        self._changes = None
+
+    def current(self):
+        """Return a token that changes whenever the database has changed.
+
+        Tokens are only comparable within one process: each watch connection
+        numbers its versions independently.
+        """
+        with self._lock:
+            return self._current()
+
+    def changes(self):
+        """Return (database id, change count) from data_changes, or None if it isn't installed.
+
+        The same in every process, for as long as the database file is; read
+        again only when current() has moved.
+        """
+        with self._lock:
+            token = self._current()
+            if token != self._changes_token:
+                try:
+                    row = self._conn.execute("SELECT database_id, version FROM data_changes WHERE id = 1").fetchone()
+                except sqlite3.OperationalError:
+                    row = None
+                self._changes_token, self._changes = token, row
+            return self._changes
+
+    def _current(self):
+        path = self._path_func()
+        if self._conn is None or path != self._path:
+            self._close()
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._path = path
+            self._connection_id = next(self._serial)
+        return (path, self._connection_id, self._conn.execute("PRAGMA data_version").fetchone()[0])
+
+    def reset(self):
+        """Close the watch connection, e.g. when the database file is replaced."""
+        with self._lock:
+            self._close()
+
+    def reset_after_fork(self):
+        """Forget the watch connection inherited from the parent process.
+
+        The connection is not closed: its SQLite handle and file locks belong
+        to the parent, which keeps using them. The lock is replaced too, in
+        case another thread held it at fork time.
+        """
+        self._lock = threading.Lock()
+        self._conn = None
+        self._changes_token = self._changes = None
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+        self._conn = None
+        self._changes_token = self._changes = None
+
+# Global instance
+data_version = DataVersion()
@@ -0,0 +1,107 @@
+"""
+Storage format of the complaint and technical note documents.
+
+By default documents are stored as JSON text. With DOCUMENT_STORAGE=jsonb
+and SQLite 3.45 or newer, new and rewritten documents are stored as SQLite's
+binary JSONB, which json_extract and the other JSON functions read without
+reparsing the text. On older SQLite the setting falls back to text with a
+warning.
+
+The JSON functions accept both formats, so a table may hold a mix while it is
+being converted. Code that loads documents into Python selects them through
+document_sql(), which turns JSONB back into text, and writes them through
+document_param(); SQL updates go through document_set().
+
+Usage:
+    DOCUMENT_STORAGE=jsonb python document_storage.py --convert jsonb
+    python document_storage.py --convert text    # back to JSON text
+    python document_storage.py --status
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+JSONB_MIN_VERSION = (3, 45, 0)
+JSONB_SUPPORTED = sqlite3.sqlite_version_info >= JSONB_MIN_VERSION
+
+DOCUMENT_TABLES = ('complaints', 'technical_notes')
+
+def _use_jsonb():
+    requested = os.getenv('DOCUMENT_STORAGE', 'text').lower()
+    if requested != 'jsonb':
+        return False
+    if not JSONB_SUPPORTED:
+        logger.warning(f"DOCUMENT_STORAGE=jsonb needs SQLite {'.'.join(map(str, JSONB_MIN_VERSION))}+, "
+                       f"this Python links {sqlite3.sqlite_version}; storing documents as JSON text")
+        return False
+    return True
+
+USE_JSONB = _use_jsonb()
+
+def document_sql(column='data'):
+    """SQL expression reading a document column as JSON text, whichever format the row is stored in."""
+    return f"CASE typeof({column}) WHEN 'blob' THEN json({column}) ELSE {column} END"
+
+def document_param():
+    """SQL placeholder for writing a JSON text parameter in the configured storage format."""
+    return "jsonb(?)" if USE_JSONB else "?"
+
+def document_set():
+    """Name of the json_set() variant that keeps updated documents in the configured storage format."""
+    return "jsonb_set" if USE_JSONB else "json_set"
+
+def storage_counts(conn, table):
+    """{'text': n, 'blob': m} for the documents of a table."""
+    return dict(conn.execute(f"SELECT typeof(data), COUNT(*) FROM {table} GROUP BY typeof(data)").fetchall())
+
+def convert(conn, target, batch_size=None, duty_cycle=None, restart=False):
+    """Rewrite every document into the target format ('jsonb' or 'text'), resumably."""
+    from backfill import DEFAULT_BATCH_SIZE, DEFAULT_DUTY_CYCLE, reset_checkpoint, run_backfill
+    if target == 'jsonb' and not JSONB_SUPPORTED:
+        raise RuntimeError(f"JSONB needs SQLite {'.'.join(map(str, JSONB_MIN_VERSION))}+, "
+                           f"this Python links {sqlite3.sqlite_version}")
+
+    source_type, expression = ('text', 'jsonb(data)') if target == 'jsonb' else ('blob', 'json(data)')
+    other = 'text' if target == 'jsonb' else 'jsonb'
+    for table in DOCUMENT_TABLES:
+        name = f"documents_to_{target}_{table}"
+        # Converting one way invalidates an earlier conversion the other way
+        reset_checkpoint(conn, f"documents_to_{other}_{table}")
+        if restart:
+            reset_checkpoint(conn, name)
+        run_backfill(conn, name, "typeof(data) = ?", (source_type,), None, table=table, set_sql=expression,
+                     batch_size=batch_size or DEFAULT_BATCH_SIZE, duty_cycle=duty_cycle or DEFAULT_DUTY_CYCLE)
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Convert stored complaint documents between JSON text and JSONB.")
+    parser.add_argument("--convert", choices=['jsonb', 'text'], help="format to convert all documents to")
+    parser.add_argument("--status", action="store_true", help="count documents per storage format")
+    parser.add_argument("--restart", action="store_true", help="rescan from the first id even if a conversion completed")
+    parser.add_argument("--batch-size", type=int, help="ids per batch")
+    parser.add_argument("--duty-cycle", type=float, help="fraction of wall time spent writing")
+    args = parser.parse_args()
+
+    db_path = os.getenv("DB_PATH", "bsh_complaints.db")
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        print(f"SQLite {sqlite3.sqlite_version}, JSONB {'supported' if JSONB_SUPPORTED else 'not supported'}; "
+              f"writing {'JSONB' if USE_JSONB else 'JSON text'}.")
+        if args.convert:
+            convert(conn, args.convert, args.batch_size, args.duty_cycle, args.restart)
+        for table in DOCUMENT_TABLES:
+            print(f"{table}: {storage_counts(conn, table)}")
+    except RuntimeError as e:
+        print(f"Error: {e}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,14 @@
+"""
+Deployment environment detection, shared by the app, logging and template setup.
+"""
+
+import os
+
+def is_production():
+    """True on Cloud Run / App Engine or when FLASK_ENV or ENVIRONMENT is 'production'."""
+    return bool(
+        os.getenv('FLASK_ENV') == 'production' or
+        os.getenv('ENVIRONMENT') == 'production' or
+        os.getenv('GAE_ENV') or  # Google App Engine
+        os.getenv('K_SERVICE')   # Cloud Run
+    )
@@ -0,0 +1,285 @@
+"""
+Values and counts for the complaint list filter dropdowns.
+
+Listing the countries, brands and AI categories takes a scan of every
+complaint or technical note document, so the results are cached per process
+and only recomputed when PRAGMA data_version (db_version.data_version) shows
+that the database changed.
+
+facet_counts() gives the same counts for the rows matching a set of list
+filters, all facets in one grouped pass over the filtered complaints.
+"""
+
+import threading
+
+import normalized_schema
+from db_version import data_version
+
+NO_ANALYSIS = 'No Analysis'
+
+# AI categories that mean no prediction was made
+EXCLUDED_AI_CATEGORIES = ('', 'NO AI PREDICTION AVAILABLE')
+
+# Dropdowns of the complaint list, in the order facet_counts() returns them
+FACETS = ('country', 'brand', 'status', 'warranty', 'ai_category')
+
+# Filter sets whose counts are kept per database version
+COUNTS_CACHE_SIZE = 64
+
+def _facet_queries_json():
+    excluded = ', '.join(f"'{value}'" for value in EXCLUDED_AI_CATEGORIES)
+    return {
+        'country': """
+            SELECT json_extract(data, '$.customerInformation.country') AS value, COUNT(*)
+            FROM complaints
+            GROUP BY value HAVING value IS NOT NULL AND value != ''
+            ORDER BY value
+        """,
+        'brand': """
+            SELECT json_extract(data, '$.productInformation.brand') AS value, COUNT(*)
+            FROM complaints
+            GROUP BY value HAVING value IS NOT NULL AND value != ''
+            ORDER BY value
+        """,
+        # Complaints without a resolution status are listed as 'Not Resolved'
+        'status': """
+            SELECT COALESCE(json_extract(data, '$.complaintDetails.resolutionStatus'), 'Not Resolved') AS value, COUNT(*)
+            FROM complaints
+            GROUP BY value HAVING value != ''
+            ORDER BY value
+        """,
+        'warranty': """
+            SELECT json_extract(data, '$.warrantyInformation.warrantyStatus') AS value, COUNT(*)
+            FROM complaints
+            GROUP BY value HAVING value IS NOT NULL AND value != ''
+            ORDER BY value
+        """,
+        # Counted on each complaint's latest note, the one the AI category filter matches
+        'ai_category': f"""
+            SELECT json_extract(data, '$.ai_analysis.openai_category') AS value, COUNT(*)
+            FROM technical_notes
+            WHERE id IN (SELECT MAX(id) FROM technical_notes GROUP BY complaint_id)
+            GROUP BY value HAVING value IS NOT NULL AND value NOT IN ({excluded})
+            ORDER BY value
+        """,
+        'no_analysis': """
+            SELECT COUNT(*) FROM complaints c
+            WHERE NOT EXISTS (SELECT 1 FROM technical_notes WHERE complaint_id = c.id)
+        """,
+    }
+
+def _facet_queries_normalized():
+    excluded = ', '.join(f"'{value}'" for value in EXCLUDED_AI_CATEGORIES)
+    return {
+        'country': """
+            SELECT cu.country AS value, COUNT(*)
+            FROM rel_complaints rc JOIN rel_customers cu ON cu.id = rc.customer_id
+            GROUP BY value HAVING value IS NOT NULL AND value != ''
+            ORDER BY value
+        """,
+        'brand': """
+            SELECT p.brand AS value, COUNT(*)
+            FROM rel_complaints rc JOIN rel_products p ON p.id = rc.product_id
+            GROUP BY value HAVING value IS NOT NULL AND value != ''
+            ORDER BY value
+        """,
+        'status': """
+            SELECT COALESCE(resolution_status, 'Not Resolved') AS value, COUNT(*)
+            FROM rel_complaints
+            GROUP BY value HAVING value != ''
+            ORDER BY value
+        """,
+        'warranty': """
+            SELECT warranty_status AS value, COUNT(*)
+            FROM rel_complaints
+            GROUP BY value HAVING value IS NOT NULL AND value != ''
+            ORDER BY value
+        """,
+        'ai_category': f"""
+            SELECT openai_category AS value, COUNT(*)
+            FROM rel_technical_notes
+            WHERE id IN (SELECT MAX(id) FROM rel_technical_notes GROUP BY complaint_id)
+            GROUP BY value HAVING value IS NOT NULL AND value NOT IN ({excluded})
+            ORDER BY value
+        """,
+        'no_analysis': """
+            SELECT COUNT(*) FROM rel_complaints rc
+            WHERE NOT EXISTS (SELECT 1 FROM rel_technical_notes WHERE complaint_id = rc.id)
+        """,
+    }
+
+def load_facets(conn):
+    """Return {facet: [(value, count)]} over all complaints, for each of FACETS, and 'total'.
+
+    AI categories end with ('No Analysis', complaints without technical notes).
+    """
+    if normalized_schema.reads_enabled(conn):
+        queries = _facet_queries_normalized()
+    else:
+        queries = _facet_queries_json()
+
+    cursor = conn.cursor()
+    facets = {}
+    for facet in FACETS:
+        cursor.execute(queries[facet])
+        facets[facet] = [(row[0], row[1]) for row in cursor.fetchall()]
+    cursor.execute(queries['no_analysis'])
+    facets['ai_category'].append((NO_ANALYSIS, cursor.fetchone()[0]))
+    cursor.execute("SELECT COUNT(*) FROM complaints")
+    facets['total'] = cursor.fetchone()[0]
+    cursor.close()
+    return facets
+
+def _filtered_rows_json(search=None, period=None, has_notes=False):
+    """(sql, params) of the facet values of complaints matching the non-facet filters, from the documents."""
+    where = []
+    params = []
+    # Same conditions as app.query_complaints_json
+    if search:
+        search_pattern = f"%{search}%"
+        where.append("""(json_extract(c.data, '$.customerInformation.fullName') LIKE ?
+            OR json_extract(c.data, '$.productInformation.modelNumber') LIKE ?
+            OR json_extract(c.data, '$.complaintDetails.detailedDescription') LIKE ?)""")
+        params.extend([search_pattern, search_pattern, search_pattern])
+    if period:
+        where.append("date(json_extract(c.data, '$.complaintDetails.dateOfComplaint')) BETWEEN ? AND ?")
+        params.extend([period.start_date.isoformat(), period.end_date.isoformat()])
+    if has_notes:
+        where.append("latest.note_id IS NOT NULL")
+
+    sql = f"""
+        SELECT
+            json_extract(c.data, '$.customerInformation.country') AS country,
+            json_extract(c.data, '$.productInformation.brand') AS brand,
+            COALESCE(json_extract(c.data, '$.complaintDetails.resolutionStatus'), 'Not Resolved') AS status,
+            json_extract(c.data, '$.warrantyInformation.warrantyStatus') AS warranty,
+            CASE WHEN latest.note_id IS NULL THEN '{NO_ANALYSIS}'
+                 ELSE json_extract(tn.data, '$.ai_analysis.openai_category') END AS ai_category
+        FROM complaints c
+        LEFT JOIN (SELECT complaint_id, MAX(id) AS note_id FROM technical_notes GROUP BY complaint_id) latest
+            ON latest.complaint_id = c.id
+        LEFT JOIN technical_notes tn ON tn.id = latest.note_id
+        WHERE {' AND '.join(where) or '1=1'}
+    """
+    return sql, params
+
+def _filtered_rows_normalized(search=None, period=None, has_notes=False):
+    """(sql, params) of the facet values of complaints matching the non-facet filters, from the normalized tables."""
+    from_sql, params = normalized_schema.complaint_filters(search=search, period=period, has_notes=has_notes)
+    sql = f"""
+        SELECT
+            (SELECT country FROM rel_customers WHERE id = rc.customer_id) AS country,
+            (SELECT brand FROM rel_products WHERE id = rc.product_id) AS brand,
+            COALESCE(rc.resolution_status, 'Not Resolved') AS status,
+            rc.warranty_status AS warranty,
+            CASE WHEN latest.id IS NULL THEN '{NO_ANALYSIS}' ELSE latest.openai_category END AS ai_category
+        FROM (SELECT rc.* {from_sql}) rc
+        LEFT JOIN rel_technical_notes latest ON latest.id = {normalized_schema.LATEST_NOTE_SQL}
+    """
+    return sql, params
+
+def facet_counts(conn, search=None, period=None, has_notes=False, country=None, status=None,
+                 warranty=None, ai_category=None, brand=None):
+    """Return (total, {facet: {value: count}}) for the complaints matching the list filters.
+
+    Each facet is counted with every filter applied except its own, so the
+    counts say how many complaints choosing that value instead would list.
+    total is the number of complaints matching all filters. period is a
+    time_periods.PeriodRange or None.
+    """
+    if normalized_schema.reads_enabled(conn):
+        rows_sql, params = _filtered_rows_normalized(search, period, has_notes)
+    else:
+        rows_sql, params = _filtered_rows_json(search, period, has_notes)
+
+    selected = {'country': country, 'brand': brand, 'status': status, 'warranty': warranty, 'ai_category': ai_category}
+    excluded = ', '.join(f"'{value}'" for value in EXCLUDED_AI_CATEGORIES)
+
+    def conditions(skip=None):
+        where = [f"{facet} = ?" for facet in FACETS if selected[facet] and facet != skip]
+        return ' AND '.join(where) or '1=1', [selected[facet] for facet in FACETS if selected[facet] and facet != skip]
+
+    where, where_params = conditions()
+    parts = [f"SELECT NULL, NULL, COUNT(*) FROM facet_rows WHERE {where}"]
+    params = params + where_params
+    for facet in FACETS:
+        where, where_params = conditions(skip=facet)
+        parts.append(f"""
+            SELECT '{facet}', {facet}, COUNT(*) FROM facet_rows
+            WHERE {where} AND {facet} IS NOT NULL AND {facet} NOT IN ({excluded})
+            GROUP BY {facet}
+        """)
+        params += where_params
+
+    # The filtered complaints are read once; each facet then groups the materialized rows
+    cursor = conn.cursor()
+    cursor.execute(f"WITH facet_rows AS MATERIALIZED ({rows_sql}) {' UNION ALL '.join(parts)}", params)
+    total = 0
+    counts = {facet: {} for facet in FACETS}
+    for facet, value, count in cursor.fetchall():
+        if facet is None:
+            total = count
+        else:
+            counts[facet][value] = count
+    cursor.close()
+    for facet in FACETS:
+        counts[facet] = dict(sorted(counts[facet].items()))
+    # Listed last, as in load_facets()
+    if NO_ANALYSIS in counts['ai_category']:
+        counts['ai_category'][NO_ANALYSIS] = counts['ai_category'].pop(NO_ANALYSIS)
+    return total, counts
+
+class FacetCache:
+    """load_facets() results, reused until the database changes."""
+
+    def __init__(self, version=data_version):
+        self._version = version
+        self._lock = threading.Lock()
+        self._token = None
+        self._facets = None
+        self._counts_token = None
+        self._counts = {}
+
+    def get(self, conn):
+        # Read the version first: a write landing while the facets load
+        # leaves a newer version, so the next call reloads
+        token = self._version.current()
+        with self._lock:
+            if token == self._token:
+                return self._facets
+        facets = load_facets(conn)
+        with self._lock:
+            self._token, self._facets = token, facets
+        return facets
+
+    def counts(self, conn, **filters):
+        """facet_counts() for the list filters, cached like get().
+
+        Without any filter the counts come from the facet catalog.
+        """
+        if not any(filters.values()):
+            facets = self.get(conn)
+            return facets['total'], {facet: dict(facets[facet]) for facet in FACETS}
+
+        token = self._version.current()
+        key = tuple(sorted((name, value) for name, value in filters.items() if value))
+        with self._lock:
+            if token != self._counts_token:
+                self._counts_token, self._counts = token, {}
+            if key in self._counts:
+                return self._counts[key]
+        result = facet_counts(conn, **filters)
+        with self._lock:
+            if token == self._counts_token:
+                if len(self._counts) >= COUNTS_CACHE_SIZE:
+                    self._counts.pop(next(iter(self._counts)))
+                self._counts[key] = result
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._token = self._facets = None
+            self._counts_token, self._counts = None, {}
+
+# Global instance
+facet_cache = FacetCache()
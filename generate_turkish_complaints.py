@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
-import psycopg2
+import argparse
+import os
 import json
 import random
 import logging
 import getpass
+import sqlite3
 from faker import Faker
 from datetime import datetime, timedelta
 
@@ -164,6 +166,7 @@ def connect_to_db():
     """Connect to the PostgreSQL database."""
     username = getpass.getuser()
     try:
+        import psycopg2
         conn = psycopg2.connect(
             host="localhost",
             user=username,
@@ -483,7 +486,39 @@ def generate_turkish_complaints(num_complaints=50):
         if conn:
             conn.close()
 
+def generate_turkish_rows(num_complaints):
+    """Yield (complaint JSON, technical note JSON or None) for num_complaints Turkish complaints."""
+    for _ in range(num_complaints):
+        complaint, problem_type, component, issue = generate_turkish_complaint()
+        
+        # Add a technical note for about 70% of complaints
+        note = None
+        if random.random() < 0.7:
+            note = json.dumps(generate_turkish_technical_note(complaint, problem_type, component, issue))
+        
+        yield json.dumps(complaint), note
+
+def bulk_generate_turkish_complaints(num_complaints, db_path=None):
+    """Append Turkish complaints to the app's SQLite database using batched executemany inserts."""
+    from regenerate_consistent_data import bulk_insert
+    
+    db_path = db_path or os.getenv("DB_PATH", "bsh_complaints.db")
+    conn = sqlite3.connect(db_path)
+    try:
+        inserted = bulk_insert(conn, generate_turkish_rows(num_complaints))
+        logger.info(f"Successfully generated {inserted} Turkish complaints in {db_path}")
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Turkish sample complaints.")
+    parser.add_argument("--count", type=int, default=50, help="number of complaints to generate (default: 50)")
+    parser.add_argument("--bulk", action="store_true", help="bulk load into the SQLite database at DB_PATH")
+    args = parser.parse_args()
+    
     logger.info("Starting Turkish complaint generation...")
-    generate_turkish_complaints(50)  # Generate 50 Turkish complaints by default
+    if args.bulk:
+        bulk_generate_turkish_complaints(args.count)
+    else:
+        generate_turkish_complaints(args.count)
     logger.info("Turkish complaint generation completed.") 
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for the BSH Complaints Management System.
+
+Usage:
+    gunicorn --config gunicorn.conf.py "app:create_app()"
+
+The app is preloaded in the master process, so create_app() loads secrets and
+initializes the database once; workers are forked afterwards and share the
+imported modules copy-on-write.
+
+Set GUNICORN_WORKER_CLASS=gevent to serve the OpenAI-bound endpoints
+(talk with data, speech-to-text, text-to-speech, AI analysis) from greenlets:
+each worker then keeps up to GUNICORN_WORKER_CONNECTIONS requests in flight
+while they wait on OpenAI, instead of one request per worker.
+"""
+
+import gc
+import os
+import tempfile
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+
+if worker_class == 'gevent':
+    # httpcore probes for the optional trio backend on import, and trio reads
+    # select.epoll at import time, which the patched select module no longer
+    # has. Load httpcore first; its sockets are still patched below.
+    try:
+        import httpcore  # noqa: F401
+    except ImportError:
+        pass
+
+    # Patch before the app (and the OpenAI/httpx stack) is preloaded, so every
+    # socket, lock and SSL object created during import is cooperative
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '100'))
+timeout = 120
+preload_app = True
+
+# Workers write their metrics here so /metrics can add them up (see metrics.py);
+# set before the app is preloaded, which reads it
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f"bsh_metrics_{os.getenv('PORT', '8080')}"))
+
+def on_starting(server):
+    # Counters start from zero with every server start
+    from metrics import registry
+    registry.clear_directory()
+
+def when_ready(server):
+    # Move everything allocated during preload into the permanent generation so
+    # the workers' garbage collector does not touch (and copy) those pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    from app import reset_after_fork
+    reset_after_fork()
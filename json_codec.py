@@ -0,0 +1,90 @@
+"""
+JSON encoding and decoding for documents, API responses and charts.
+
+Uses orjson when it is installed, which decodes and encodes the complaint and
+technical note documents several times faster than the json module, and
+serializes datetimes and NumPy arrays natively. Without orjson, or with
+JSON_CODEC=json, the standard library is used with a default handler for the
+same types, so both backends accept the same input.
+"""
+
+import datetime
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None and os.getenv('JSON_CODEC', 'auto') != 'json' else 'json'
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except clause covers both
+JSONDecodeError = json.JSONDecodeError
+
+if BACKEND == 'orjson':
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj):
+    """json.dumps fallback for the types orjson handles natively."""
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    # NumPy is checked by module name so it never has to be imported here
+    if type(obj).__module__ == 'numpy':
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def loads(data):
+    """Decode JSON text or bytes."""
+    if BACKEND == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj, indent=False, sort_keys=False):
+    """Encode obj as compact JSON text (2-space indented with indent=True)."""
+    if BACKEND == 'orjson':
+        option = ORJSON_OPTIONS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option).decode()
+    return json.dumps(obj, default=_default, indent=2 if indent else None, sort_keys=sort_keys,
+                      separators=None if indent else (',', ':'))
+
+def plotly_json(fig):
+    """Serialize a plotly figure for Plotly.newPlot, in place of json.dumps(fig, cls=PlotlyJSONEncoder).
+
+    With orjson the figure dict is encoded directly (plotly's own orjson
+    engine first copies and cleans the whole dict, which is slower than the
+    json module on dashboard-sized figures); anything orjson can't encode
+    goes to PlotlyJSONEncoder's handler.
+    """
+    from plotly.utils import PlotlyJSONEncoder
+    if BACKEND == 'orjson':
+        return orjson.dumps(fig.to_plotly_json(), default=PlotlyJSONEncoder().default, option=ORJSON_OPTIONS).decode()
+    return json.dumps(fig, cls=PlotlyJSONEncoder)
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider (jsonify, request.get_json, |tojson) backed by this codec.
+
+    Dates are still passed to Flask's default handler, so responses keep
+    Flask's HTTP date format.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if BACKEND != 'orjson' or set(kwargs) - {'indent', 'separators', 'sort_keys'} or kwargs.get('indent') not in (None, 2):
+            return super().dumps(obj, **kwargs)
+        option = ORJSON_OPTIONS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
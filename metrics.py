@@ -0,0 +1,388 @@
+"""
+Request, SQL and OpenAI metrics, served in Prometheus text format at /metrics.
+
+init_metrics(app) records for every request:
+- bsh_http_request_duration_seconds{method,route,status}: time until the
+  response is handed to the server. For streamed responses this covers
+  only the headers.
+- bsh_http_request_sql_queries{route} and bsh_http_request_sql_seconds{route}:
+  how many queries each request ran and the time spent in them. Queries are
+  counted on connections from connect_to_db(), which opens them with
+  InstrumentedConnection; execution and fetching both count.
+
+openai_call(operation) times an OpenAI API call
+(bsh_openai_request_duration_seconds{operation,status}) and adds the token
+usage it reports (bsh_openai_tokens_total{operation,type}).
+
+data_context.context_stats adds the size of every Talk with Data context
+(bsh_data_context_tokens{trimmed}) and the prompt tokens OpenAI reports for
+those questions (bsh_data_query_prompt_tokens).
+
+Each process keeps its own metrics. When METRICS_DIR is set (gunicorn.conf.py
+does this) every process also writes a snapshot there, at most once and at
+the latest METRICS_FLUSH_INTERVAL seconds after a request. /metrics then sums
+the snapshots, so a scrape sees all workers whichever one serves it. If METRICS_TOKEN is set, /metrics
+requires 'Authorization: Bearer <token>'.
+"""
+
+import contextvars
+import glob
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (250, 500, 1000, 1500, 2000, 3000, 5000, 10000)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}"
+
+class Histogram:
+    """Histogram with labels; each label set keeps per-bucket counts, a sum and a count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [count per bucket..., sum, count]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+    @staticmethod
+    def merge(total, state):
+        if total is None:
+            return list(state)
+        return [a + b for a, b in zip(total, state)]
+
+    def render(self, values):
+        bounds = [f'le="{_format_number(float(bound))}"' for bound in self.buckets] + ['le="+Inf"']
+        for key, state in sorted(values.items()):
+            for bound, count in zip(bounds, state[:-2] + [state[-1]]):
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, bound)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(float(state[-2]))}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}"
+
+class Registry:
+    """The metrics of this process, with optional snapshots in a directory shared by all workers."""
+
+    def __init__(self, directory=None):
+        self.metrics = {}
+        self.directory = directory
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def flush(self, force=False):
+        """Write this process's snapshot to the metrics directory (throttled unless force)."""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < METRICS_FLUSH_INTERVAL:
+            self._schedule_flush()
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = now
+            data = {name: [[list(key), value] for key, value in values.items()]
+                    for name, values in self.snapshot().items()}
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, os.path.join(self.directory, f'{os.getpid()}.json'))
+        finally:
+            self._flush_lock.release()
+
+    def _schedule_flush(self):
+        # Write the skipped changes later, even if no further request comes
+        with self._flush_lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(METRICS_FLUSH_INTERVAL, self._timed_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _timed_flush(self):
+        with self._flush_lock:
+            self._flush_timer = None
+        self.flush(force=True)
+
+    def collect(self):
+        """{name: {labels: value}} summed over every process's snapshot (or just this process)."""
+        if not self.directory:
+            return self.snapshot()
+        self.flush(force=True)
+        totals = {name: {} for name in self.metrics}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # a worker being replaced mid-write
+            for name, values in data.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in values:
+                    key = tuple(key)
+                    totals[name][key] = metric.merge(totals[name].get(key), value)
+        return totals
+
+    def render(self):
+        """All metrics in Prometheus text exposition format."""
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(collected.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+    def clear_directory(self):
+        """Remove snapshots left by earlier processes (run once before the workers start)."""
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                os.remove(path)
+
+registry = Registry(METRICS_DIR)
+
+REQUEST_DURATION = registry.register(Histogram(
+    'bsh_http_request_duration_seconds', 'Time to produce a response, by route.',
+    ('method', 'route', 'status')))
+REQUEST_SQL_QUERIES = registry.register(Histogram(
+    'bsh_http_request_sql_queries', 'SQL queries run per request, by route.',
+    ('route',), QUERY_COUNT_BUCKETS))
+REQUEST_SQL_SECONDS = registry.register(Histogram(
+    'bsh_http_request_sql_seconds', 'Time spent executing and fetching SQL per request, by route.',
+    ('route',)))
+OPENAI_DURATION = registry.register(Histogram(
+    'bsh_openai_request_duration_seconds', 'OpenAI API call latency.',
+    ('operation', 'status'), LATENCY_BUCKETS + (60.0,)))
+OPENAI_TOKENS = registry.register(Counter(
+    'bsh_openai_tokens_total', 'Tokens reported by the OpenAI API.', ('operation', 'type')))
+DATA_CONTEXT_TOKENS = registry.register(Histogram(
+    'bsh_data_context_tokens', 'Estimated tokens of each Talk with Data context, by whether it was trimmed to budget.',
+    ('trimmed',), TOKEN_BUCKETS))
+DATA_QUERY_PROMPT_TOKENS = registry.register(Histogram(
+    'bsh_data_query_prompt_tokens', 'Prompt tokens reported by OpenAI per Talk with Data question.',
+    (), TOKEN_BUCKETS))
+
+# [query count, seconds] for the request being handled (per thread / greenlet)
+_request_sql = contextvars.ContextVar('request_sql', default=None)
+
+def _record_sql(seconds, query=False):
+    stats = _request_sql.get()
+    if stats is not None:
+        if query:
+            stats[0] += 1
+        stats[1] += seconds
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that adds its execute and fetch time to the current request's SQL metrics."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_sql(time.perf_counter() - started, query=True)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_sql(time.perf_counter() - started, query=True)
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            _record_sql(time.perf_counter() - started, query=True)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            _record_sql(time.perf_counter() - started)
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().fetchmany(*args, **kwargs)
+        finally:
+            _record_sql(time.perf_counter() - started)
+
+    def fetchall(self):
+        started = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            _record_sql(time.perf_counter() - started)
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return super().__next__()
+        finally:
+            _record_sql(time.perf_counter() - started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors (including conn.execute's) are InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+class OpenAICall:
+    def __init__(self, operation):
+        self.operation = operation
+
+    def record_usage(self, usage):
+        """Add the prompt and completion tokens of an OpenAI usage object (None is ignored)."""
+        if usage is None:
+            return
+        for kind in ('prompt', 'completion'):
+            tokens = getattr(usage, f'{kind}_tokens', None)
+            if tokens:
+                OPENAI_TOKENS.inc(tokens, operation=self.operation, type=kind)
+
+@contextmanager
+def openai_call(operation):
+    """Time the OpenAI call made inside the block; call.record_usage(response.usage) counts tokens."""
+    call = OpenAICall(operation)
+    status = 'error'
+    started = time.perf_counter()
+    try:
+        yield call
+        status = 'ok'
+    finally:
+        OPENAI_DURATION.observe(time.perf_counter() - started, operation=operation, status=status)
+
+def init_metrics(app):
+    """Record request metrics and serve /metrics (see module docstring).
+
+    Call before other after_request hooks are registered (e.g. compression) so
+    their time is included: Flask runs after_request hooks in reverse order.
+    """
+    from flask import Response, abort, g, request
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_token = _request_sql.set([0, 0.0])
+
+    def _finish(status):
+        started = g.pop('metrics_started', None)
+        token = g.pop('metrics_sql_token', None)
+        if started is None:
+            return
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - started, method=request.method, route=route, status=status)
+        queries, seconds = _request_sql.get()
+        _request_sql.reset(token)
+        REQUEST_SQL_QUERIES.observe(queries, route=route)
+        REQUEST_SQL_SECONDS.observe(seconds, route=route)
+        registry.flush()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        _finish(response.status_code)
+        return response
+
+    @app.teardown_request
+    def _record_failed_request(exc):
+        # Only reached with the metrics still pending if an exception skipped after_request
+        if exc is not None:
+            _finish(500)
+
+    @app.route('/metrics')
+    def metrics():
+        token = os.getenv('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,275 @@
+"""
+Versioned data migrations for the complaints database.
+
+Each migration runs once, in version order, inside its own transaction and is
+recorded in the schema_migrations table. Migrations are written as set-based
+UPDATEs using SQLite's JSON functions where possible; when a change needs
+Python logic (Faker data, translations), update_in_chunks() walks the matching
+rows by id and writes each chunk with executemany().
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --dry-run  # run them, report row counts, roll back
+    python migrations.py --list     # show applied and pending migrations
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from collections import namedtuple
+
+from document_storage import document_param, document_set, document_sql
+
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', ['version', 'name', 'apply'])
+
+MIGRATIONS = []
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def migration(version, name):
+    """Register a migration function taking (conn, chunk_size) and returning the rows it changed."""
+    def register(func):
+        MIGRATIONS.append(Migration(version, name, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return register
+
+def ensure_migrations_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            rows_changed INTEGER,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+def applied_versions(conn):
+    ensure_migrations_table(conn)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+def pending_migrations(conn, target=None):
+    applied = applied_versions(conn)
+    return [m for m in MIGRATIONS if m.version not in applied and (target is None or m.version <= target)]
+
+def run_migrations(conn, dry_run=False, target=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Apply pending migrations up to target. Returns [(migration, rows changed)].
+
+    With dry_run=True every migration is executed and then rolled back, so
+    the reported row counts are exact but nothing is written.
+    """
+    results = []
+    pending = pending_migrations(conn, target)
+    if not pending:
+        print("No pending migrations.")
+        return results
+
+    for m in pending:
+        label = f"{m.version:04d}_{m.name}"
+        print(f"{'[dry run] ' if dry_run else ''}Applying {label}...")
+        started = time.time()
+        try:
+            conn.execute("BEGIN")
+            rows = m.apply(conn, chunk_size)
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name, rows_changed) VALUES (?, ?, ?)",
+                    (m.version, m.name, rows)
+                )
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception(f"Migration {label} failed and was rolled back")
+            raise
+
+        verb = "would change" if dry_run else "changed"
+        print(f"  {label}: {verb} {rows} rows in {time.time() - started:.2f}s")
+        results.append((m, rows))
+    return results
+
+def update_in_chunks(conn, where_sql, params, transform, chunk_size=DEFAULT_CHUNK_SIZE, label="rows"):
+    """Rewrite the complaints matching where_sql with a Python transform, one chunk at a time.
+
+    transform(complaint_id, data) mutates or replaces the parsed JSON and
+    returns it, or returns None to leave the row unchanged. Only one chunk of
+    rows is held in memory at a time. Returns the number of rows updated.
+    """
+    total = conn.execute(f"SELECT COUNT(*) FROM complaints WHERE {where_sql}", params).fetchone()[0]
+    last_id = 0
+    seen = 0
+    updated = 0
+
+    while True:
+        rows = conn.execute(
+            f"SELECT id, {document_sql()} FROM complaints WHERE id > ? AND ({where_sql}) ORDER BY id LIMIT ?",
+            (last_id, *params, chunk_size)
+        ).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for complaint_id, data in rows:
+            new_data = transform(complaint_id, json.loads(data))
+            if new_data is not None:
+                updates.append((json.dumps(new_data), complaint_id))
+        conn.executemany(f"UPDATE complaints SET data = {document_param()} WHERE id = ?", updates)
+
+        last_id = rows[-1][0]
+        seen += len(rows)
+        updated += len(updates)
+        print(f"  {label}: {seen}/{total} ({seen * 100 // max(total, 1)}%)")
+
+    return updated
+
+# --- Migrations -------------------------------------------------------------
+
+# Brand shares in percent, in the order they are assigned
+BRAND_DISTRIBUTION = [("Bosch", 45), ("Profilo", 30), ("Siemens", 15), ("Gaggenau", 5), ("Neff", 5)]
+
+@migration(1, "product_brands")
+def add_product_brands(conn, chunk_size):
+    """Give every complaint without a brand one of the BSH brands, by BRAND_DISTRIBUTION.
+
+    (id * 37) % 100 walks every residue once per 100 consecutive ids, so the
+    shares come out exact without a random shuffle in Python.
+    The productInformation object is created when a document has none (or null).
+    """
+    cases = []
+    params = []
+    cumulative = 0
+    for brand, share in BRAND_DISTRIBUTION:
+        cumulative += share
+        cases.append("WHEN (id * 37) % 100 < ? THEN ?")
+        params.extend([cumulative, brand])
+
+    cursor = conn.execute(f"""
+        UPDATE complaints
+        SET data = {document_set()}(data, '$.productInformation', json_set(
+            COALESCE(json_extract(data, '$.productInformation'), '{{}}'), '$.brand', CASE {' '.join(cases)} END))
+        WHERE json_extract(data, '$.productInformation.brand') IS NULL
+    """, params)
+    return cursor.rowcount
+
+# Typical resolution time ranges in days per brand
+BRAND_RESOLUTION_DAYS = {
+    "Bosch": (3, 12),
+    "Profilo": (5, 15),
+    "Siemens": (4, 10),
+    "Gaggenau": (2, 7),  # premium brand, faster service
+    "Neff": (4, 14),
+}
+DEFAULT_RESOLUTION_DAYS = (5, 20)
+
+def backfill_resolution_dates(conn):
+    """Set resolutionDate on resolved complaints that lack one, with a single UPDATE.
+
+    The date is dateOfComplaint plus a random number of days from the brand's
+    range in BRAND_RESOLUTION_DAYS. Returns the number of complaints updated.
+    """
+    cases = []
+    params = []
+    for brand, (min_days, max_days) in BRAND_RESOLUTION_DAYS.items():
+        cases.append("WHEN ? THEN ? + abs(random()) % ?")
+        params.extend([brand, min_days, max_days - min_days + 1])
+    min_days, max_days = DEFAULT_RESOLUTION_DAYS
+    params.extend([min_days, max_days - min_days + 1])
+
+    cursor = conn.execute(f"""
+        UPDATE complaints
+        SET data = {document_set()}(
+            data,
+            '$.complaintDetails.resolutionDate',
+            strftime('%Y-%m-%dT%H:%M:%S', json_extract(data, '$.complaintDetails.dateOfComplaint'),
+                     '+' || (CASE json_extract(data, '$.productInformation.brand') {' '.join(cases)}
+                             ELSE ? + abs(random()) % ? END) || ' days')
+        )
+        WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
+          AND json_extract(data, '$.complaintDetails.resolutionDate') IS NULL
+          AND julianday(json_extract(data, '$.complaintDetails.dateOfComplaint')) IS NOT NULL
+    """, params)
+    return cursor.rowcount
+
+@migration(2, "resolution_dates")
+def add_resolution_dates(conn, chunk_size):
+    return backfill_resolution_dates(conn)
+
+def customer_country_backfill():
+    """(where_sql, params, transform) filling in customer details for complaints without a country."""
+    from regenerate_consistent_data import COUNTRY_LOCALES, generate_country_specific_data
+    countries = list(COUNTRY_LOCALES)
+
+    def transform(complaint_id, data):
+        customer = data.setdefault('customerInformation', {})
+        customer.update(generate_country_specific_data(random.choice(countries)))
+        return data
+
+    return "json_extract(data, '$.customerInformation.country') IS NULL", (), transform
+
+def turkish_text_backfill():
+    """(where_sql, params, transform) translating complaint details of customers in Turkey into Turkish."""
+    from update_turkish_complaints import generate_turkish_complaint_details, refrigerator_problems_tr
+
+    def transform(complaint_id, data):
+        details, environment, acknowledgment = generate_turkish_complaint_details(data)
+        data['complaintDetails'] = details
+        data['environmentalConditions'] = environment
+        data['customerAcknowledgment'] = acknowledgment
+        return data
+
+    # Skip complaints whose problem list already holds Turkish problem names
+    turkish_names = list(refrigerator_problems_tr.values())
+    placeholders = ', '.join('?' * len(turkish_names))
+    where_sql = f"""
+        json_extract(data, '$.customerInformation.country') = 'Turkey'
+        AND NOT EXISTS (
+            SELECT 1 FROM json_each(complaints.data, '$.complaintDetails.natureOfProblem')
+            WHERE value IN ({placeholders})
+        )
+    """
+    return where_sql, tuple(turkish_names), transform
+
+@migration(3, "customer_country_data")
+def add_customer_country_data(conn, chunk_size):
+    """Fill in country-specific customer details for complaints that have no country."""
+    return update_in_chunks(conn, *customer_country_backfill(), chunk_size, label="customer data")
+
+@migration(4, "turkish_complaint_text")
+def translate_turkish_complaints(conn, chunk_size):
+    """Translate the complaint details of customers in Turkey into Turkish."""
+    return update_in_chunks(conn, *turkish_text_backfill(), chunk_size, label="Turkish complaints")
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Apply versioned data migrations to the complaints database.")
+    parser.add_argument("--dry-run", action="store_true", help="run pending migrations, report row counts and roll back")
+    parser.add_argument("--list", action="store_true", help="list applied and pending migrations")
+    parser.add_argument("--target", type=int, help="only apply migrations up to this version")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk for Python migrations")
+    args = parser.parse_args()
+
+    db_path = os.getenv("DB_PATH", "bsh_complaints.db")
+    conn = sqlite3.connect(db_path)
+    try:
+        if args.list:
+            applied = applied_versions(conn)
+            for m in MIGRATIONS:
+                print(f"{m.version:04d}_{m.name}: {'applied' if m.version in applied else 'pending'}")
+        else:
+            run_migrations(conn, dry_run=args.dry_run, target=args.target, chunk_size=args.chunk_size)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,450 @@
+"""
+Optional normalized layout for complaints and technical notes.
+
+The JSON documents in complaints.data and technical_notes.data remain the
+source of truth. This module adds relational tables (rel_customers,
+rel_products, rel_complaints, rel_complaint_problems, rel_technical_notes,
+rel_parts_replaced) holding the fields the complaint list and the statistics
+page filter, sort and count on, so those queries read small indexed columns
+instead of decoding every document with json_extract.
+
+rel_customers and rel_products hold the customer and product as recorded on
+each complaint, one row per complaint with the complaint's id. The same
+customer or appliance can appear on several complaints with a different
+country, brand or purchase data, so rows are not shared between complaints.
+
+Dual write: triggers on complaints and technical_notes keep the relational
+tables in sync on every INSERT, UPDATE OF data and DELETE, whichever script or
+route does the write. Existing rows are migrated with the resumable backfill
+runner, which rewrites them in place so the UPDATE triggers fire.
+
+Reads switch over with COMPLAINTS_SCHEMA=normalized, once the backfill has
+completed; otherwise the app keeps querying the JSON documents.
+
+Usage:
+    python normalized_schema.py            # install tables and triggers, backfill existing rows
+    python normalized_schema.py --status   # backfill progress
+    python normalized_schema.py --drop     # remove the normalized layout again
+"""
+
+import argparse
+import os
+import sqlite3
+
+from document_storage import document_sql
+
+NORMALIZED_READS = os.getenv('COMPLAINTS_SCHEMA', 'json') == 'normalized'
+
+BACKFILL_NAMES = ('normalized_complaints', 'normalized_technical_notes')
+
+TABLES = ['rel_parts_replaced', 'rel_technical_notes', 'rel_complaint_problems',
+          'rel_complaints', 'rel_products', 'rel_customers']
+
+SCHEMA = """
+-- One row per complaints row, with the same id
+CREATE TABLE IF NOT EXISTS rel_customers (
+    id INTEGER PRIMARY KEY,
+    full_name TEXT,
+    email_address TEXT,
+    phone_number TEXT,
+    address TEXT,
+    city TEXT,
+    state_province TEXT,
+    postal_code TEXT,
+    country TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rel_customers_country ON rel_customers (country);
+
+-- One row per complaints row, with the same id
+CREATE TABLE IF NOT EXISTS rel_products (
+    id INTEGER PRIMARY KEY,
+    model_number TEXT,
+    serial_number TEXT,
+    brand TEXT,
+    date_of_purchase TEXT,
+    place_of_purchase TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rel_products_brand ON rel_products (brand);
+
+-- One row per complaints row, with the same id
+CREATE TABLE IF NOT EXISTS rel_complaints (
+    id INTEGER PRIMARY KEY,
+    customer_id INTEGER REFERENCES rel_customers(id),
+    product_id INTEGER REFERENCES rel_products(id),
+    date_of_complaint TEXT,
+    complaint_date TEXT,  -- date(date_of_complaint), for day range filters
+    resolution_status TEXT,
+    resolution_date TEXT,
+    warranty_status TEXT,
+    warranty_expiration_date TEXT,
+    frequency TEXT,
+    detailed_description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rel_complaints_date_of_complaint ON rel_complaints (date_of_complaint);
+CREATE INDEX IF NOT EXISTS idx_rel_complaints_complaint_date ON rel_complaints (complaint_date);
+CREATE INDEX IF NOT EXISTS idx_rel_complaints_customer ON rel_complaints (customer_id);
+CREATE INDEX IF NOT EXISTS idx_rel_complaints_product ON rel_complaints (product_id);
+
+CREATE TABLE IF NOT EXISTS rel_complaint_problems (
+    complaint_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    problem TEXT NOT NULL,
+    PRIMARY KEY (complaint_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_rel_complaint_problems_problem ON rel_complaint_problems (problem);
+
+-- One row per technical_notes row, with the same id
+CREATE TABLE IF NOT EXISTS rel_technical_notes (
+    id INTEGER PRIMARY KEY,
+    complaint_id INTEGER,
+    technician_name TEXT,
+    visit_date TEXT,
+    follow_up_required INTEGER,
+    customer_satisfaction TEXT,
+    category TEXT,
+    openai_category TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rel_technical_notes_complaint ON rel_technical_notes (complaint_id, id);
+
+CREATE TABLE IF NOT EXISTS rel_parts_replaced (
+    note_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    part TEXT NOT NULL,
+    PRIMARY KEY (note_id, position)
+) WITHOUT ROWID;
+"""
+
+def _field(path):
+    return f"json_extract(NEW.data, '{path}')"
+
+# Statements run for every inserted or updated complaint (NEW is the complaints row)
+SYNC_COMPLAINT = f"""
+    DELETE FROM rel_customers WHERE id = NEW.id;
+    INSERT INTO rel_customers (id, full_name, email_address, phone_number, address, city, state_province, postal_code, country)
+    VALUES (NEW.id, {_field('$.customerInformation.fullName')}, {_field('$.customerInformation.emailAddress')},
+            {_field('$.customerInformation.phoneNumber')}, {_field('$.customerInformation.address')},
+            {_field('$.customerInformation.city')}, {_field('$.customerInformation.stateProvince')},
+            {_field('$.customerInformation.postalCode')}, {_field('$.customerInformation.country')});
+
+    DELETE FROM rel_products WHERE id = NEW.id;
+    INSERT INTO rel_products (id, model_number, serial_number, brand, date_of_purchase, place_of_purchase)
+    VALUES (NEW.id, {_field('$.productInformation.modelNumber')}, {_field('$.productInformation.serialNumber')},
+            {_field('$.productInformation.brand')}, {_field('$.productInformation.dateOfPurchase')},
+            {_field('$.productInformation.placeOfPurchase')});
+
+    DELETE FROM rel_complaints WHERE id = NEW.id;
+    INSERT INTO rel_complaints (id, customer_id, product_id, date_of_complaint, complaint_date, resolution_status,
+                                resolution_date, warranty_status, warranty_expiration_date, frequency, detailed_description)
+    VALUES (NEW.id, NEW.id, NEW.id,
+            {_field('$.complaintDetails.dateOfComplaint')}, date({_field('$.complaintDetails.dateOfComplaint')}),
+            {_field('$.complaintDetails.resolutionStatus')}, {_field('$.complaintDetails.resolutionDate')},
+            {_field('$.warrantyInformation.warrantyStatus')}, {_field('$.warrantyInformation.warrantyExpirationDate')},
+            {_field('$.complaintDetails.frequency')}, {_field('$.complaintDetails.detailedDescription')});
+
+    DELETE FROM rel_complaint_problems WHERE complaint_id = NEW.id;
+    INSERT INTO rel_complaint_problems (complaint_id, position, problem)
+    SELECT NEW.id, COALESCE(key, 0), value FROM json_each(NEW.data, '$.complaintDetails.natureOfProblem')
+    WHERE value IS NOT NULL;
+"""
+
+# Statements run for every inserted or updated technical note (NEW is the technical_notes row)
+SYNC_TECHNICAL_NOTE = f"""
+    DELETE FROM rel_technical_notes WHERE id = NEW.id;
+    INSERT INTO rel_technical_notes (id, complaint_id, technician_name, visit_date, follow_up_required,
+                                     customer_satisfaction, category, openai_category)
+    VALUES (NEW.id, NEW.complaint_id, {_field('$.technicianName')}, {_field('$.visitDate')},
+            {_field('$.followUpRequired')}, {_field('$.customerSatisfaction')},
+            {_field('$.category')}, {_field('$.ai_analysis.openai_category')});
+
+    DELETE FROM rel_parts_replaced WHERE note_id = NEW.id;
+    INSERT INTO rel_parts_replaced (note_id, position, part)
+    SELECT NEW.id, COALESCE(key, 0), value FROM json_each(NEW.data, '$.partsReplaced')
+    WHERE value IS NOT NULL;
+"""
+
+TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS rel_complaints_after_insert AFTER INSERT ON complaints
+BEGIN {SYNC_COMPLAINT} END;
+CREATE TRIGGER IF NOT EXISTS rel_complaints_after_update AFTER UPDATE OF data ON complaints
+BEGIN {SYNC_COMPLAINT} END;
+CREATE TRIGGER IF NOT EXISTS rel_complaints_after_delete AFTER DELETE ON complaints
+BEGIN
+    DELETE FROM rel_complaint_problems WHERE complaint_id = OLD.id;
+    DELETE FROM rel_complaints WHERE id = OLD.id;
+    DELETE FROM rel_customers WHERE id = OLD.id;
+    DELETE FROM rel_products WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS rel_technical_notes_after_insert AFTER INSERT ON technical_notes
+BEGIN {SYNC_TECHNICAL_NOTE} END;
+CREATE TRIGGER IF NOT EXISTS rel_technical_notes_after_update AFTER UPDATE OF data, complaint_id ON technical_notes
+BEGIN {SYNC_TECHNICAL_NOTE} END;
+CREATE TRIGGER IF NOT EXISTS rel_technical_notes_after_delete AFTER DELETE ON technical_notes
+BEGIN
+    DELETE FROM rel_parts_replaced WHERE note_id = OLD.id;
+    DELETE FROM rel_technical_notes WHERE id = OLD.id;
+END;
+"""
+
+TRIGGER_NAMES = ['rel_complaints_after_insert', 'rel_complaints_after_update', 'rel_complaints_after_delete',
+                 'rel_technical_notes_after_insert', 'rel_technical_notes_after_update',
+                 'rel_technical_notes_after_delete']
+
+def _has_shared_dimensions(conn):
+    # Earlier layout: customers and products shared between complaints through UNIQUE keys
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'rel_customers'").fetchone()
+    return bool(row and 'UNIQUE' in row[0])
+
+def install(conn):
+    """Create the normalized tables and the dual-write triggers (idempotent).
+
+    A layout from before customers and products were kept per complaint is
+    dropped first, so it has to be backfilled again before reads switch over.
+    """
+    if _has_shared_dimensions(conn):
+        drop(conn)
+    conn.executescript(SCHEMA + TRIGGERS)
+    conn.commit()
+
+def drop(conn):
+    """Remove the triggers, the normalized tables and their backfill checkpoints."""
+    for trigger in TRIGGER_NAMES:
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for table in TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'backfill_checkpoints'").fetchone():
+        conn.execute(f"DELETE FROM backfill_checkpoints WHERE name IN ({', '.join('?' * len(BACKFILL_NAMES))})",
+                     BACKFILL_NAMES)
+    conn.commit()
+    _reset_ready()
+
+def backfill(conn, batch_size=None, duty_cycle=None):
+    """Sync the rows that existed before install() by rewriting them in place, resumably."""
+    from backfill import DEFAULT_BATCH_SIZE, DEFAULT_DUTY_CYCLE, run_backfill
+    options = dict(batch_size=batch_size or DEFAULT_BATCH_SIZE, duty_cycle=duty_cycle or DEFAULT_DUTY_CYCLE)
+    run_backfill(conn, 'normalized_complaints', '1', (), None, table='complaints', **options)
+    run_backfill(conn, 'normalized_technical_notes', '1', (), None, table='technical_notes', **options)
+
+def is_ready(conn):
+    """True when the triggers are installed and both backfills have completed."""
+    installed = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'rel\\_%' ESCAPE '\\'"
+    ).fetchone()[0] == len(TRIGGER_NAMES)
+    if not installed:
+        return False
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'backfill_checkpoints'").fetchone():
+        return False
+    completed = conn.execute(
+        f"SELECT COUNT(*) FROM backfill_checkpoints WHERE completed_at IS NOT NULL AND name IN ({', '.join('?' * len(BACKFILL_NAMES))})",
+        BACKFILL_NAMES
+    ).fetchone()[0]
+    return completed == len(BACKFILL_NAMES)
+
+# Schema version at which is_ready() last passed (False if it hasn't), so requests
+# don't re-check the catalog; install() or drop() in any process changes the version
+_ready = False
+
+def _reset_ready():
+    global _ready
+    _ready = False
+
+def reads_enabled(conn):
+    """Whether queries should use the normalized tables for this process."""
+    global _ready
+    if not NORMALIZED_READS:
+        return False
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    if _ready is False or _ready != schema_version:
+        if not is_ready(conn):
+            _ready = False
+            return False
+        _ready = schema_version
+    return True
+
+# --- Query layer --------------------------------------------------------------
+
+# Latest technical note per complaint
+LATEST_NOTE_SQL = "(SELECT MAX(id) FROM rel_technical_notes WHERE complaint_id = rc.id)"
+
+def complaint_filters(search=None, period=None, country=None, status=None, warranty=None,
+                      brand=None, has_notes=False, ai_category=None):
+    """Return (from_sql, params) selecting the rel_complaints rows rc matching the complaint list filters.
+
+    Mirrors the json_extract filters of app.query_complaints_json. period is a
+    time_periods.PeriodRange or None.
+    """
+    joins = []
+    where = []
+    params = []
+
+    if country or search:
+        joins.append("JOIN rel_customers cu ON cu.id = rc.customer_id")
+    if brand or search:
+        joins.append("JOIN rel_products p ON p.id = rc.product_id")
+
+    if ai_category == 'No Analysis':
+        where.append("NOT EXISTS (SELECT 1 FROM rel_technical_notes WHERE complaint_id = rc.id)")
+    elif ai_category:
+        where.append(f"(SELECT openai_category FROM rel_technical_notes WHERE id = {LATEST_NOTE_SQL}) = ?")
+        params.append(ai_category)
+
+    if search:
+        search_pattern = f"%{search}%"
+        where.append("(cu.full_name LIKE ? OR p.model_number LIKE ? OR rc.detailed_description LIKE ?)")
+        params.extend([search_pattern, search_pattern, search_pattern])
+
+    if period:
+        where.append("rc.complaint_date BETWEEN ? AND ?")
+        params.extend([period.start_date.isoformat(), period.end_date.isoformat()])
+
+    if country:
+        where.append("cu.country = ?")
+        params.append(country)
+
+    if status == 'Not Resolved':
+        where.append("(rc.resolution_status IS NULL OR rc.resolution_status = 'Not Resolved')")
+    elif status:
+        where.append("rc.resolution_status = ?")
+        params.append(status)
+
+    if warranty:
+        where.append("rc.warranty_status = ?")
+        params.append(warranty)
+
+    if brand:
+        where.append("p.brand = ?")
+        params.append(brand)
+
+    if has_notes:
+        where.append("EXISTS (SELECT 1 FROM rel_technical_notes WHERE complaint_id = rc.id)")
+
+    from_sql = f"FROM rel_complaints rc {' '.join(joins)} WHERE {' AND '.join(where) or '1=1'}"
+    return from_sql, params
+
+def query_complaints(cursor, page, items_per_page, columns=None, **filters):
+    """Return ([(id, complaint JSON, latest note JSON or None)], total count) for one page of the complaint list.
+
+    Filtering, counting and sorting run on the normalized columns; only the
+    documents of the requested page are read from complaints and technical_notes.
+    columns replaces the select list; it can also use rc, cu (customer),
+    p (product) and n (latest rel_technical_notes row), and then no document
+    needs to be read at all.
+    """
+    from_sql, params = complaint_filters(**filters)
+
+    cursor.execute(f"SELECT COUNT(*) {from_sql}", params)
+    total_count = cursor.fetchone()[0]
+
+    if columns is None:
+        joins = """
+            JOIN complaints c ON c.id = page.id
+            LEFT JOIN technical_notes tn ON tn.id = page.note_id
+        """
+        columns = f"c.id, {document_sql('c.data')}, {document_sql('tn.data')}"
+    else:
+        joins = """
+            JOIN rel_complaints rc ON rc.id = page.id
+            LEFT JOIN rel_customers cu ON cu.id = rc.customer_id
+            LEFT JOIN rel_products p ON p.id = rc.product_id
+            LEFT JOIN rel_technical_notes n ON n.id = page.note_id
+        """
+
+    cursor.execute(f"""
+        SELECT {columns}
+        FROM (
+            SELECT rc.id, rc.date_of_complaint, {LATEST_NOTE_SQL} AS note_id
+            {from_sql}
+            ORDER BY rc.date_of_complaint DESC
+            LIMIT ? OFFSET ?
+        ) page
+        {joins}
+        ORDER BY page.date_of_complaint DESC
+    """, params + [items_per_page, (page - 1) * items_per_page])
+    return cursor.fetchall(), total_count
+
+def period_statistics(cursor, start_date_str, end_date_str, has_notes=False):
+    """Statistics page figures for complaints dated between two YYYY-MM-DD days, like app.get_period_statistics."""
+    base_where = "WHERE rc.complaint_date >= ? AND rc.complaint_date <= ?"
+    base_params = [start_date_str, end_date_str]
+    if has_notes:
+        base_where += " AND EXISTS (SELECT 1 FROM rel_technical_notes WHERE complaint_id = rc.id)"
+
+    cursor.execute(f"""
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(rc.warranty_status = 'Active'), 0),
+            ROUND(CAST(SUM(rc.resolution_status = 'Resolved') AS REAL) / NULLIF(COUNT(*), 0) * 100, 1)
+        FROM rel_complaints rc {base_where}
+    """, base_params)
+    total_complaints, active_warranty, resolution_rate = cursor.fetchone()
+
+    cursor.execute(f"""
+        SELECT cp.problem, COUNT(*) AS count
+        FROM rel_complaints rc
+        JOIN rel_complaint_problems cp ON cp.complaint_id = rc.id
+        {base_where}
+        GROUP BY cp.problem
+        ORDER BY count DESC, cp.problem
+    """, base_params)
+    problem_distribution = [tuple(row) for row in cursor.fetchall()]
+
+    cursor.execute(f"""
+        SELECT CASE WHEN rc.warranty_status = 'Active' THEN 'Active' ELSE 'Expired' END AS status,
+               COUNT(*) AS count
+        FROM rel_complaints rc {base_where}
+        GROUP BY status
+        ORDER BY count DESC
+    """, base_params)
+    warranty_distribution = [tuple(row) for row in cursor.fetchall()]
+
+    return {
+        'total_complaints': total_complaints,
+        'active_warranty': active_warranty,
+        'resolution_rate': resolution_rate or 0.0,
+        'problem_distribution': problem_distribution,
+        'warranty_distribution': warranty_distribution,
+    }
+
+def complaints_by_timeframe(cursor, start, end, timeframe='daily'):
+    """[(day or month start, count)] for complaints dated between two ISO timestamps."""
+    bucket = "strftime('%Y-%m-01', complaint_date)" if timeframe == 'monthly' else "complaint_date"
+    cursor.execute(f"""
+        SELECT {bucket} AS date, COUNT(*) AS count
+        FROM rel_complaints
+        WHERE date_of_complaint >= ? AND date_of_complaint <= ?
+        GROUP BY {bucket}
+        ORDER BY date ASC
+    """, (start, end))
+    return cursor.fetchall()
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Install, backfill or drop the normalized complaints layout.")
+    parser.add_argument("--status", action="store_true", help="show whether the layout is installed and backfilled")
+    parser.add_argument("--drop", action="store_true", help="drop the normalized tables and triggers")
+    parser.add_argument("--batch-size", type=int, help="ids per backfill batch")
+    parser.add_argument("--duty-cycle", type=float, help="fraction of wall time the backfill spends writing")
+    args = parser.parse_args()
+
+    db_path = os.getenv("DB_PATH", "bsh_complaints.db")
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        if args.drop:
+            drop(conn)
+            print("Dropped the normalized layout.")
+        elif args.status:
+            from backfill import print_status
+            print(f"Normalized layout ready: {is_ready(conn)}")
+            print_status(conn)
+        else:
+            install(conn)
+            print("Installed normalized tables and dual-write triggers.")
+            backfill(conn, args.batch_size, args.duty_cycle)
+            print("Set COMPLAINTS_SCHEMA=normalized to serve reads from the normalized tables.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Parallel synthetic data generation for capacity planning.
+
+The complaints are split into fixed-size shards. Each shard is generated in a
+worker process with its own seed derived from (--seed, shard number), and the
+parent process is the single writer: it receives the shards in order and bulk
+inserts them with regenerate_consistent_data.bulk_insert.
+
+Because seeds are per shard and shards are written in order, the same --seed,
+--count, --shard-size and --as-of always produce the same rows and ids,
+however many worker processes are used.
+
+Usage:
+    python parallel_data_generator.py --count 10000000 --workers 8 --seed 42
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime
+import multiprocessing
+
+from dotenv import load_dotenv
+from faker import Faker
+
+import regenerate_consistent_data as generator
+
+DEFAULT_SHARD_SIZE = 10000
+
+def shard_plan(count, shard_size):
+    """Return (shard number, rows) for each shard needed to generate count complaints."""
+    return [(shard, min(shard_size, count - start)) for shard, start in enumerate(range(0, count, shard_size))]
+
+def _init_worker(as_of):
+    generator.reference_now = as_of
+    # Build every locale's Faker up front: building one mid-shard would draw
+    # from the seeded random state and make shards depend on worker history
+    for locale in set(generator.COUNTRY_LOCALES.values()) | {"en_US"}:
+        generator.faker_for_locale(locale)
+
+def generate_shard(seed, shard, rows):
+    """Generate one shard of (complaint JSON, note JSON or None) rows, deterministically for (seed, shard)."""
+    shard_seed = f"{seed}:{shard}"
+    random.seed(shard_seed)
+    Faker.seed(shard_seed)
+    return list(generator.generate_rows(rows))
+
+def _start_pool(workers, as_of):
+    # Some Faker providers build their word lists from sets (e.g. it_IT cities),
+    # so their order follows the hash seed. Spawn the workers with a fixed
+    # PYTHONHASHSEED so a seed gives the same data in every run.
+    previous = os.environ.get('PYTHONHASHSEED')
+    os.environ['PYTHONHASHSEED'] = '0'
+    try:
+        return multiprocessing.get_context('spawn').Pool(workers, initializer=_init_worker, initargs=(as_of,))
+    finally:
+        if previous is None:
+            del os.environ['PYTHONHASHSEED']
+        else:
+            os.environ['PYTHONHASHSEED'] = previous
+
+def generate_in_parallel(count, workers, seed, shard_size=DEFAULT_SHARD_SIZE, as_of=None):
+    """Yield generated rows in shard order while up to 2 shards per worker are in flight."""
+    as_of = as_of or datetime.combine(datetime.now().date(), datetime.min.time())
+    with _start_pool(workers, as_of) as pool:
+        pending = deque()
+        for shard, rows in shard_plan(count, shard_size):
+            pending.append(pool.apply_async(generate_shard, (seed, shard, rows)))
+            # Bound memory: wait for the oldest shard before queuing more
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+def parallel_regenerate(count, workers, seed, shard_size=DEFAULT_SHARD_SIZE, as_of=None, clear=True, db_path=None):
+    """Generate count complaints across worker processes and bulk insert them into the database."""
+    load_dotenv()
+    db_path = db_path or os.getenv("DB_PATH", "bsh_complaints.db")
+
+    conn = sqlite3.connect(db_path)
+    try:
+        if clear:
+            conn.execute("DELETE FROM technical_notes")
+            conn.execute("DELETE FROM complaints")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('complaints', 'technical_notes')")
+            conn.commit()
+            print("Cleared existing data.")
+
+        print(f"Generating {count} complaints with {workers} workers (seed {seed}, shards of {shard_size})...")
+        started = time.time()
+        inserted = generator.bulk_insert(conn, generate_in_parallel(count, workers, seed, shard_size, as_of))
+        print(f"Generated {inserted} complaints in {time.time() - started:.1f}s.")
+        return inserted
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large synthetic complaints dataset across processes.")
+    parser.add_argument("--count", type=int, required=True, help="number of complaints to generate")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="generator processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=42, help="seed for reproducible output (default: 42)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="complaints per shard")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="date the data is generated relative to, e.g. 2025-06-30 (default: today)")
+    parser.add_argument("--append", action="store_true", help="keep existing data and append the new complaints")
+    args = parser.parse_args()
+    parallel_regenerate(args.count, args.workers, args.seed, args.shard_size, args.as_of, clear=not args.append)
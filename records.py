@@ -0,0 +1,86 @@
+"""
+Compact in-memory records for complaints and technical notes.
+
+The CSV export and AI batch processing pull up to 10,000 complaints at a
+time. Decoded, each complaint and note is a tree of dicts, lists and strings
+costing several kilobytes, and the whole batch stays alive until the loop
+ends. These records keep the documents as their JSON text instead and decode
+them only when asked: document() returns a fresh dict that the caller drops
+after using it, so a batch holds one decoded complaint at a time.
+"""
+
+import json_codec
+
+# openai_category values meaning no prediction was made
+NO_PREDICTION = 'NO AI PREDICTION AVAILABLE'
+AUTO_PREDICTION_MARKER = '(NO OPENAI PREDICTION)'
+
+class AiAnalysis:
+    """The ai_analysis section of a technical note."""
+
+    __slots__ = ('final_opinion', 'rule_based_category', 'openai_category', 'technical_diagnosis',
+                 'root_cause', 'solution_implemented', 'systemic_assessment', 'recommendations')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from a decoded ai_analysis dict; None when there is no analysis."""
+        if not data:
+            return None
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    @property
+    def has_prediction(self):
+        """True if OpenAI assigned a category (auto-assigned placeholders don't count)."""
+        return bool(self.openai_category) and self.openai_category != NO_PREDICTION
+
+    @property
+    def exported_category(self):
+        """openai_category, or '' for the no-prediction placeholders."""
+        category = self.openai_category or ''
+        if category == NO_PREDICTION or AUTO_PREDICTION_MARKER in category:
+            return ''
+        return category
+
+class TechnicalNote:
+    """A technical note whose document is decoded on demand."""
+
+    __slots__ = ('id', 'complaint_id', '_document', '_ai_analysis')
+
+    def __init__(self, note_id, complaint_id, document):
+        self.id = note_id
+        self.complaint_id = complaint_id
+        self._document = document
+        self._ai_analysis = False
+
+    def document(self):
+        """Return the note as a new dict."""
+        return json_codec.loads(self._document)
+
+    @property
+    def ai_analysis(self):
+        """AiAnalysis of the note or None, decoded once and kept."""
+        if self._ai_analysis is False:
+            self._ai_analysis = AiAnalysis.from_dict(self.document().get('ai_analysis'))
+        return self._ai_analysis
+
+class Complaint:
+    """A complaint with its latest technical note, documents decoded on demand."""
+
+    __slots__ = ('id', '_document', 'note')
+
+    def __init__(self, complaint_id, document, note=None):
+        self.id = complaint_id
+        self._document = document
+        self.note = note
+
+    def document(self):
+        """Return the complaint as a new dict."""
+        return json_codec.loads(self._document)
+
+    @property
+    def has_notes(self):
+        return self.note is not None
@@ -1,11 +1,16 @@
+import argparse
 import random
 import json
 import sqlite3
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import islice
 import time
 import getpass
 from faker import Faker
 
+from document_storage import document_param
+
 # Set Faker to use English locale
 fake = Faker('en_US')
 
@@ -115,6 +120,12 @@ technician_names = [
     "Charles Martin", "Daniel Thompson", "Mark White", "Kevin Harris", "Steven Clark"
 ]
 
+# Fixed "now" used when generating reproducible datasets; None means the real current time
+reference_now = None
+
+def current_time():
+    return reference_now or datetime.now()
+
 # Function to generate a random date within a range
 def random_date(start_date, end_date):
     """Generate a random date between start_date and end_date."""
@@ -123,28 +134,34 @@ def random_date(start_date, end_date):
     random_number_of_days = random.randrange(max(1, days_between_dates))
     return start_date + timedelta(days=random_number_of_days)
 
+# Map country names to valid Faker locales
+COUNTRY_LOCALES = {
+    "Norway": "no_NO",
+    "Spain": "es_ES", 
+    "Bulgaria": "bg_BG",
+    "Italy": "it_IT",
+    "Portugal": "pt_PT",
+    "Romania": "ro_RO",
+    "Turkey": "tr_TR",
+    "Egypt": "ar_EG",
+    "Kuwait": "ar_SA",  # Use Saudi Arabia locale for Kuwait
+    "United Arab Emirates": "en_GB",  # Use UK locale for UAE
+    "United States": "en_US",
+    "Canada": "en_CA",
+    "United Kingdom": "en_GB",
+    "Germany": "de_DE",
+    "France": "fr_FR"
+}
+
+@lru_cache(maxsize=None)
+def faker_for_locale(locale):
+    """Return a shared Faker per locale; building one loads every provider and is slow."""
+    return Faker(locale)
+
 def generate_country_specific_data(country):
     """Generate customer data specific to a country."""
-    # Map country names to valid Faker locales
-    locale_map = {
-        "Norway": "no_NO",
-        "Spain": "es_ES", 
-        "Bulgaria": "bg_BG",
-        "Italy": "it_IT",
-        "Portugal": "pt_PT",
-        "Romania": "ro_RO",
-        "Turkey": "tr_TR",
-        "Egypt": "ar_EG",
-        "Kuwait": "ar_SA",  # Use Saudi Arabia locale for Kuwait
-        "United Arab Emirates": "en_GB",  # Use UK locale for UAE
-        "United States": "en_US",
-        "Canada": "en_CA",
-        "United Kingdom": "en_GB",
-        "Germany": "de_DE",
-        "France": "fr_FR"
-    }
-    locale = locale_map.get(country, "en_US")
-    faker = Faker(locale)
+    locale = COUNTRY_LOCALES.get(country, "en_US")
+    faker = faker_for_locale(locale)
     
     # Generate a name format appropriate for the country
     name = faker.name()
@@ -183,7 +200,7 @@ def generate_consistent_complaint():
     """Generate a random complaint data structure that will be consistent with technical notes."""
     
     # Generate dates
-    current_date = datetime.now()
+    current_date = current_time()
     purchase_date = random_date(current_date - timedelta(days=1825), current_date - timedelta(days=30))
     warranty_expiration_date = purchase_date + timedelta(days=730)  # 2-year warranty
     problem_first_date = random_date(purchase_date, current_date)
@@ -391,7 +408,7 @@ def generate_consistent_technical_note(complaint_data, main_problem_type, main_c
     
     # Get a few more components to inspect (1-3 additional)
     additional_components = random.sample(
-        [c for c in set(sum(component_mapping.values(), [])) if c != main_component],
+        [c for c in sorted(set(sum(component_mapping.values(), []))) if c != main_component],
         k=min(3, random.randint(1, 3))
     )
     inspected_components = [main_component] + additional_components
@@ -422,8 +439,8 @@ def generate_consistent_technical_note(complaint_data, main_problem_type, main_c
     additional_action = random.choice(additional_actions)
     
     # Generate visit date
-    complaint_date = datetime.fromisoformat(complaint_data.get('complaintDetails', {}).get('dateOfComplaint', datetime.now().isoformat()))
-    visit_date = random_date(complaint_date, datetime.now())
+    complaint_date = datetime.fromisoformat(complaint_data.get('complaintDetails', {}).get('dateOfComplaint', current_time().isoformat()))
+    visit_date = random_date(complaint_date, current_time())
     
     # Decide if parts were replaced
     parts_replaced = []
@@ -489,7 +506,7 @@ def create_special_case_angela_best():
     """Create the special case for Angela Best with lighting issues vs fan motor problems."""
     
     # Generate dates
-    current_date = datetime.now()
+    current_date = current_time()
     purchase_date = random_date(current_date - timedelta(days=1825), current_date - timedelta(days=30))
     warranty_expiration_date = purchase_date + timedelta(days=730)  # 2-year warranty
     problem_first_date = random_date(purchase_date, current_date)
@@ -541,7 +558,7 @@ def create_special_case_angela_best():
     }
     
     # Create technical note for fan motor issue
-    visit_date = random_date(datetime.fromisoformat(complaint_date.isoformat()), datetime.now())
+    visit_date = random_date(datetime.fromisoformat(complaint_date.isoformat()), current_time())
     
     technical_note = {
         "technicianName": "Michael Johnson",
@@ -561,8 +578,79 @@ def create_special_case_angela_best():
     
     return complaint, technical_note
 
-def regenerate_database():
-    """Regenerate the database with consistent complaints and technical notes."""
+# Rows per executemany() call in bulk loads
+BULK_BATCH_SIZE = 5000
+
+def generate_rows(count):
+    """Yield (complaint JSON, technical note JSON or None) for count consistent complaints."""
+    for _ in range(count):
+        complaint, problem_type, component, issue = generate_consistent_complaint()
+        
+        # Add a technical note for about 70% of complaints
+        note = None
+        if random.random() < 0.7:
+            note = json.dumps(generate_consistent_technical_note(complaint, problem_type, component, issue))
+        
+        yield json.dumps(complaint), note
+
+def bulk_insert(conn, rows, batch_size=BULK_BATCH_SIZE):
+    """Insert (complaint JSON, note JSON or None) rows in batches inside one transaction.
+    
+    Complaint ids are assigned up front so each batch goes in with two
+    executemany() calls instead of one execute() per row. Journaling and
+    fsyncs are switched off for the load and restored afterwards, so an
+    interrupted load can leave the database inconsistent; only use this on
+    data that can be regenerated. Returns the number of complaints inserted.
+    """
+    cursor = conn.cursor()
+    journal_mode = cursor.execute("PRAGMA journal_mode").fetchone()[0]
+    synchronous = cursor.execute("PRAGMA synchronous").fetchone()[0]
+    cursor.execute("PRAGMA journal_mode=OFF")
+    cursor.execute("PRAGMA synchronous=OFF")
+    
+    next_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM complaints").fetchone()[0] + 1
+    inserted = 0
+    started = time.time()
+    rows = iter(rows)
+    
+    try:
+        cursor.execute("BEGIN")
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            
+            complaint_rows = []
+            note_rows = []
+            for complaint_json, note_json in batch:
+                complaint_rows.append((next_id, complaint_json))
+                if note_json:
+                    note_rows.append((next_id, note_json))
+                next_id += 1
+            
+            cursor.executemany(f"INSERT INTO complaints (id, data) VALUES (?, {document_param()})", complaint_rows)
+            cursor.executemany(f"INSERT INTO technical_notes (complaint_id, data) VALUES (?, {document_param()})", note_rows)
+            
+            inserted += len(batch)
+            elapsed = time.time() - started
+            print(f"Inserted {inserted} complaints ({inserted / max(elapsed, 1e-6):.0f}/s)...")
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.close()
+    
+    return inserted
+
+def regenerate_database(num_complaints=2000, clear=True, batch_size=BULK_BATCH_SIZE):
+    """Regenerate the database with consistent complaints and technical notes.
+    
+    With clear=False the generated complaints are appended to the existing data.
+    """
     import os
     from dotenv import load_dotenv
     
@@ -579,62 +667,35 @@ def regenerate_database():
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        # Clear existing data
-        cursor.execute("DELETE FROM technical_notes")
-        cursor.execute("DELETE FROM complaints")
-        cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('complaints', 'technical_notes')")
-        conn.commit()
-        
-        print("Cleared existing data. Generating new data...")
-        
-        # Generate complaints (fewer to speed up testing)
-        num_complaints = 2000
-        special_complaint_id = None
+        if clear:
+            # Clear existing data
+            cursor.execute("DELETE FROM technical_notes")
+            cursor.execute("DELETE FROM complaints")
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('complaints', 'technical_notes')")
+            conn.commit()
+            print("Cleared existing data. Generating new data...")
         
-        # Generate and insert complaints
-        for i in range(1, num_complaints + 1):
-            if i % 100 == 0:
-                print(f"Generated {i} complaints...")
-            
-            # Generate a consistent complaint and relevant data
-            complaint, problem_type, component, issue = generate_consistent_complaint()
-            
-            # Insert the complaint
-            cursor.execute(
-                "INSERT INTO complaints (data) VALUES (?)",
-                (json.dumps(complaint),)
-            )
-            complaint_id = cursor.lastrowid
-            
-            # Add a technical note for about 70% of complaints
-            if random.random() < 0.7:
-                tech_note = generate_consistent_technical_note(complaint, problem_type, component, issue)
-                cursor.execute(
-                    "INSERT INTO technical_notes (complaint_id, data) VALUES (?, ?)",
-                    (complaint_id, json.dumps(tech_note))
-                )
-                
-            if i % 100 == 0:
-                conn.commit()  # Commit in batches for better performance
+        started = time.time()
+        bulk_insert(conn, generate_rows(num_complaints), batch_size)
         
         # Generate the special Angela Best case
         angela_complaint, angela_tech_note = create_special_case_angela_best()
         
         cursor.execute(
-            "INSERT INTO complaints (data) VALUES (?)",
+            f"INSERT INTO complaints (data) VALUES ({document_param()})",
             (json.dumps(angela_complaint),)
         )
         angela_complaint_id = cursor.lastrowid
         special_complaint_id = angela_complaint_id
         
         cursor.execute(
-            "INSERT INTO technical_notes (complaint_id, data) VALUES (?, ?)",
+            f"INSERT INTO technical_notes (complaint_id, data) VALUES (?, {document_param()})",
             (angela_complaint_id, json.dumps(angela_tech_note))
         )
         
         conn.commit()
         
-        print(f"Successfully regenerated database with {num_complaints + 1} complaints and technical notes.")
+        print(f"Successfully regenerated database with {num_complaints + 1} complaints and technical notes in {time.time() - started:.1f}s.")
         print(f"Special case 'Angela Best' created with ID: {special_complaint_id}")
         
         cursor.close()
@@ -646,4 +707,9 @@ def regenerate_database():
         return False
 
 if __name__ == "__main__":
-    regenerate_database() 
+    parser = argparse.ArgumentParser(description="Regenerate the complaints database with consistent sample data.")
+    parser.add_argument("--count", type=int, default=2000, help="number of complaints to generate (default: 2000)")
+    parser.add_argument("--append", action="store_true", help="keep existing data and append the new complaints")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="rows per executemany batch")
+    args = parser.parse_args()
+    regenerate_database(args.count, clear=not args.append, batch_size=args.batch_size)
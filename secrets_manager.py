@@ -1,5 +1,4 @@
 import os
-from google.cloud import secretmanager
 import json
 
 def get_secret(secret_id, project_id=None):
@@ -21,6 +20,9 @@ def get_secret(secret_id, project_id=None):
         return None
     
     try:
+        # Imported here so environments without SECRET_MANAGER_KEY never load the gRPC stack
+        from google.cloud import secretmanager
+        
         # Create the Secret Manager client
         client = secretmanager.SecretManagerServiceClient()
         
@@ -4,6 +4,8 @@ import json
 import sqlite3
 from dotenv import load_dotenv
 
+from db_version import install_change_counter
+
 def setup_database():
     """Create the database and necessary tables if they don't exist."""
     print("Setting up SQLite database...")
@@ -60,6 +62,10 @@ def setup_database():
         ON technical_notes (complaint_id)
         """)
         
+        # Change counter for ETags (see db_version.py)
+        conn.commit()
+        install_change_counter(conn)
+        
         # Commit changes and close connection
         conn.commit()
         cursor.close()
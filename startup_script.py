@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 """
-Startup script for BSH Complaints Management System.
-This script ensures the database is properly initialized before the Flask app starts.
+Startup checks for BSH Complaints Management System.
+Verifies the environment, initializes the database and tests the OpenAI and
+Cloud Storage connections. The server itself initializes through
+app.create_app() (see gunicorn.conf.py), so this script is only needed for
+manual diagnostics.
 """
 
 import os
@@ -10,6 +13,8 @@ import time
 import logging
 from dotenv import load_dotenv
 
+from environment import is_production
+
 # Load environment variables
 load_dotenv()
 
@@ -21,15 +26,8 @@ def run_startup_checks():
     """Run all necessary startup checks and initializations."""
     logger.info("Starting BSH Complaints Management System initialization...")
     
-    # Check if we're in production
-    is_production = (
-        os.getenv('FLASK_ENV') == 'production' or 
-        os.getenv('ENVIRONMENT') == 'production' or
-        os.getenv('GAE_ENV') or  # Google App Engine
-        os.getenv('K_SERVICE')   # Cloud Run
-    )
-    
-    logger.info(f"Environment: {'Production' if is_production else 'Development'}")
+    production = is_production()
+    logger.info(f"Environment: {'Production' if production else 'Development'}")
     
     # Attempt to load secrets from Secret Manager before checking env vars
     try:
@@ -50,80 +48,13 @@ def run_startup_checks():
         logger.warning(f"Missing environment variables: {missing_vars}")
         logger.warning("Some features may not work properly")
     
-    # Initialize database
+    # Initialize database (schema, sample data, resolution dates) the same way the app does
     try:
         logger.info("Initializing database...")
-        
-        # Import and run database setup
-        from setup_database import setup_database
-        # Ensure Cloud Storage-backed DB is initialized/downloaded if in production
-        try:
-            from cloud_storage_db import cloud_db
-            cloud_db.initialize_db_if_needed()
-            db_path = cloud_db.get_db_path()
-            logger.info(f"Using database path: {db_path}")
-        except Exception as e:
-            logger.info(f"cloud_storage_db not available or failed ({e}); falling back to DB_PATH/local file")
-            db_path = os.getenv('DB_PATH', 'bsh_complaints.db')
-        if setup_database():
-            logger.info("Database setup completed successfully")
-        else:
-            logger.error("Database setup failed")
+        from app import initialize_database
+        if not initialize_database():
+            logger.error("Database initialization failed")
             return False
-        
-        # Check if database has data
-        import sqlite3
-        
-        try:
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM complaints")
-            complaint_count = cursor.fetchone()[0]
-            cursor.close()
-            conn.close()
-            
-            logger.info(f"Database contains {complaint_count} complaints")
-            
-            # If database is empty, generate sample data
-            if complaint_count == 0:
-                logger.info("Database is empty. Generating sample data...")
-                from regenerate_consistent_data import regenerate_database
-                
-                if regenerate_database():
-                    logger.info("Sample data generated successfully")
-                    
-                    # Backup to GCS if available
-                    try:
-                        from cloud_storage_db import cloud_db as _cloud_db
-                        _cloud_db.backup_to_gcs()
-                        logger.info("Database backed up to Cloud Storage")
-                    except Exception as e:
-                        logger.info(f"Cloud Storage backup skipped: {e}")
-                else:
-                    logger.error("Failed to generate sample data")
-                    return False
-            else:
-                logger.info("Database already contains data, skipping data generation")
-            
-            # Always ensure resolution dates exist for resolved complaints
-            try:
-                logger.info("Ensuring resolution dates are populated for resolved complaints...")
-                from update_resolution_dates_sqlite import update_resolution_dates
-                update_resolution_dates()
-                # Backup after updates
-                try:
-                    from cloud_storage_db import cloud_db as _cloud_db
-                    _cloud_db.backup_to_gcs()
-                    logger.info("Database changes backed up to Cloud Storage")
-                except Exception as e:
-                    logger.info(f"Cloud Storage backup after update skipped: {e}")
-            except Exception as e:
-                logger.warning(f"Failed to update resolution dates: {e}")
-
-        except Exception as e:
-            logger.error(f"Error checking database: {e}")
-            return False
-            
     except Exception as e:
         logger.error(f"Error during database initialization: {e}")
         return False
@@ -146,7 +77,7 @@ def run_startup_checks():
         logger.warning("AI features may not work properly")
     
     # Test Cloud Storage connection if in production
-    if is_production:
+    if production:
         try:
             logger.info("Testing Cloud Storage connection...")
             from cloud_storage_db import cloud_db
@@ -0,0 +1,132 @@
+"""
+Cache-busting URLs for /static files, and the vendored front-end libraries.
+
+init_static_assets(app) makes url_for('static', filename=...) add a
+?v=<content hash> argument, so a file's URL changes whenever its content
+does. Requests carrying the current hash are served with a one-year
+immutable Cache-Control and browsers stop revalidating them; anything else
+(old pages, hand-written links) keeps Flask's default revalidation.
+
+Templates link Bootstrap, Font Awesome, Plotly and markdown-it through
+asset_url(name). vendor_assets.py copies them into static/vendor and lists
+them in static/vendor/manifest.json; until it has run, the CDN URLs below
+are used.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+# Front-end libraries: name -> CDN URL, also the source vendor_assets.py downloads
+CDN_ASSETS = {
+    'bootstrap.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/css/bootstrap.min.css',
+    'bootstrap.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0-alpha1/dist/js/bootstrap.bundle.min.js',
+    'fontawesome.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    'fontawesome-solid': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/fa-solid-900.woff2',
+    'plotly.js': 'https://cdn.plot.ly/plotly-2.27.0.min.js',
+    'markdown-it.js': 'https://cdn.jsdelivr.net/npm/markdown-it@13.0.1/dist/markdown-it.min.js',
+}
+
+VENDOR_DIR = 'vendor'
+MANIFEST_NAME = 'manifest.json'
+
+# <link rel=preload> attributes by file extension
+PRELOAD_TYPES = {
+    '.css': 'as="style"',
+    '.js': 'as="script"',
+    '.woff2': 'as="font" type="font/woff2" crossorigin',
+    '.woff': 'as="font" type="font/woff" crossorigin',
+}
+
+# Content hashes by (path, mtime, size), so edited files get a new hash
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+def fingerprint(static_folder, filename):
+    """Short content hash of a static file, or None if it doesn't exist."""
+    path = safe_join(static_folder, filename)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _fingerprints_lock:
+        digest = _fingerprints.get(key)
+    if digest is None:
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with _fingerprints_lock:
+            _fingerprints[key] = digest
+    return digest
+
+# Parsed manifest by (path, mtime), reloaded when vendor_assets.py rewrites it
+_manifest = (None, {})
+_manifest_lock = threading.Lock()
+
+def vendored_assets(static_folder):
+    """{name: path under static/} from the vendor manifest, or {} if there is none."""
+    global _manifest
+    path = os.path.join(static_folder, VENDOR_DIR, MANIFEST_NAME)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return {}
+    with _manifest_lock:
+        if _manifest[0] == key:
+            return _manifest[1]
+    with open(path) as f:
+        assets = json.load(f)
+    with _manifest_lock:
+        _manifest = (key, assets)
+    return assets
+
+def asset_url(name):
+    """URL of a front-end library: the vendored copy if there is one, otherwise the CDN."""
+    from flask import current_app, url_for
+    path = vendored_assets(current_app.static_folder).get(name)
+    if path:
+        return url_for('static', filename=path)
+    return CDN_ASSETS[name]
+
+def preload_links(*names):
+    """<link rel="preload"> tags for assets the page needs before the parser reaches them."""
+    tags = []
+    for name in names:
+        url = asset_url(name)
+        attributes = PRELOAD_TYPES.get(os.path.splitext(url.split('?')[0])[1], '')
+        tags.append(f'<link rel="preload" href="{escape(url)}" {attributes}>')
+    return Markup('\n    '.join(tags))
+
+def init_static_assets(app):
+    """Fingerprint static URLs and cache fingerprinted responses (see module docstring)."""
+    from flask import request
+
+    app.jinja_env.globals.update(asset_url=asset_url, preload_links=preload_links)
+
+    @app.url_defaults
+    def _add_fingerprint(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = fingerprint(app.static_folder, values['filename'])
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def _cache_fingerprinted(response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+        # Only when v is the current hash: an old instance must not pin new URLs to old content
+        version = request.args.get('v')
+        if version and version == fingerprint(app.static_folder, request.view_args['filename']):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,70 @@
+"""
+Compiled-template caching.
+
+Jinja compiles a template to Python code the first time it is rendered, which
+for complaints.html, unified_complaint.html and talk_with_data.html is a
+noticeable part of the first request in each worker. Two caches avoid that:
+
+- init_template_cache(app) stores compiled templates in a filesystem bytecode
+  cache (TEMPLATE_CACHE_DIR, default .jinja_cache next to this file), so a
+  fresh process loads them instead of compiling. Entries are keyed by the
+  template source's checksum, so edited templates are recompiled.
+- precompile_templates(app) loads every template up front. The Docker build
+  runs it (python template_cache.py) to fill the bytecode cache, and
+  create_app() runs it in production so the gunicorn master holds the
+  compiled templates before the workers are forked.
+
+In production the app also runs with debug and template auto-reload off, so
+rendering doesn't stat every template file on each request.
+
+Usage:
+    python template_cache.py   # compile every template into the bytecode cache
+"""
+
+import logging
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache, TemplateError
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jinja_cache'))
+
+def init_template_cache(app, cache_dir=TEMPLATE_CACHE_DIR):
+    """Use a filesystem bytecode cache for the app's templates; returns False if cache_dir is unusable."""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache disabled, cannot create {cache_dir}: {e}")
+        return False
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    return True
+
+def precompile_templates(app):
+    """Load (and so compile and cache) every template of the app; returns the number loaded.
+
+    Templates that fail to compile are logged and skipped, so they fail on
+    render as before instead of at startup.
+    """
+    started = time.perf_counter()
+    loaded = 0
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+            loaded += 1
+        except TemplateError as e:
+            logger.warning(f"Could not precompile template {name}: {e}")
+    logger.info(f"Precompiled {loaded} templates in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return loaded
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    from app import app  # sets up the bytecode cache
+    if app.jinja_env.bytecode_cache is None:
+        raise SystemExit(f"Template bytecode cache unavailable at {TEMPLATE_CACHE_DIR}")
+    print(f"Compiled {precompile_templates(app)} templates into {TEMPLATE_CACHE_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import json
+import logging
+
+from app_logging import JSONFormatter, SamplingFilter, hot_path_logger
+
+def make_record(level=logging.DEBUG, lineno=10, msg="Connected to %s", args=("db",)):
+    return logging.LogRecord('app.hot', level, 'app.py', lineno, msg, args, None, func='connect_to_db')
+
+def test_sampling_passes_one_in_every_per_call_site():
+    sampler = SamplingFilter(every=10)
+    passed = [sampler.filter(make_record()) for _ in range(25)]
+    assert passed.count(True) == 3 and passed[0]
+    # Another call site has its own counter
+    assert sampler.filter(make_record(lineno=20))
+
+def test_sampling_keeps_warnings_and_tags_sampled_records():
+    sampler = SamplingFilter(every=100)
+    record = make_record()
+    assert sampler.filter(record) and record.sampled == 100
+    assert all(sampler.filter(make_record(level=logging.WARNING)) for _ in range(5))
+
+def test_hot_path_logger_adds_one_filter():
+    hot_path_logger('test_app_logging')
+    logger = hot_path_logger('test_app_logging')
+    assert logger.name == 'test_app_logging.hot'
+    assert sum(isinstance(f, SamplingFilter) for f in logger.filters) == 1
+
+def test_json_formatter_writes_cloud_logging_fields():
+    record = make_record()
+    record.sampled = 100
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry['severity'] == 'DEBUG'
+    assert entry['message'] == 'Connected to db'
+    assert entry['sampled'] == 100
+    assert entry['logging.googleapis.com/sourceLocation'] == {'file': 'app.py', 'line': 10, 'function': 'connect_to_db'}
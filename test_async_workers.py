@@ -0,0 +1,146 @@
+"""
+Concurrency test for the gevent worker mode.
+
+Starts gunicorn with a single gevent worker against a fake OpenAI server that
+takes UPSTREAM_DELAY seconds per chat completion, then fires CONCURRENT_REQUESTS
+talk-with-data questions at once. With a synchronous worker they would be
+answered one after another; with gevent they all wait on the upstream together.
+"""
+
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('gevent')
+
+CONCURRENT_REQUESTS = 40
+UPSTREAM_DELAY = 1.0
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    in_flight = 0
+    peak_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.peak_in_flight = max(cls.peak_in_flight, cls.in_flight)
+        time.sleep(UPSTREAM_DELAY)
+        with cls.lock:
+            cls.in_flight -= 1
+
+        body = json.dumps({
+            "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4-turbo-preview",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "42 complaints."}}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 3, "total_tokens": 103},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_for(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+def _login(base_url):
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args):
+            return None
+
+    data = 'username=prometa&password=prometaisfuture%232025'.encode()
+    opener = urllib.request.build_opener(NoRedirect)
+    try:
+        opener.open(f"{base_url}/login", data=data)
+    except urllib.error.HTTPError as response:
+        cookie = response.headers['Set-Cookie']
+    # The session cookie is marked Secure, so pass it along by hand over plain HTTP
+    return re.match(r'(session=[^;]+)', cookie).group(1)
+
+def _ask(base_url, cookie):
+    request = urllib.request.Request(
+        f"{base_url}/talk_with_data/query",
+        data=json.dumps({'question': 'How many complaints last month?'}).encode(),
+        headers={'Content-Type': 'application/json', 'Cookie': cookie},
+    )
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())['answer']
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', _free_port()), FakeOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+@pytest.fixture
+def gevent_server(tmp_path, upstream):
+    db_path = tmp_path / 'concurrency.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE complaints (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("""INSERT INTO complaints (data) VALUES ('{"complaintDetails": {"dateOfComplaint": "2025-01-01T00:00:00"}}')""")
+    conn.commit()
+    conn.close()
+
+    port = _free_port()
+    env = dict(
+        os.environ, DB_PATH=str(db_path), PORT=str(port), WEB_CONCURRENCY='1',
+        GUNICORN_WORKER_CLASS='gevent', OPENAI_API_KEY='sk-test', OPENAI_BASE_URL=upstream,
+        SECRET_MANAGER_KEY='',
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:create_app()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_for(f"{base_url}/health")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def test_gevent_worker_overlaps_openai_calls(gevent_server):
+    cookie = _login(gevent_server)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=CONCURRENT_REQUESTS) as pool:
+        answers = list(pool.map(lambda _: _ask(gevent_server, cookie), range(CONCURRENT_REQUESTS)))
+    elapsed = time.time() - started
+
+    print(f"\n{CONCURRENT_REQUESTS} requests on one gevent worker: {elapsed:.1f}s, "
+          f"peak upstream concurrency {FakeOpenAIHandler.peak_in_flight}")
+    assert answers == ['42 complaints.'] * CONCURRENT_REQUESTS
+    # A sync worker needs CONCURRENT_REQUESTS * UPSTREAM_DELAY seconds
+    assert FakeOpenAIHandler.peak_in_flight >= CONCURRENT_REQUESTS // 2
+    assert elapsed < CONCURRENT_REQUESTS * UPSTREAM_DELAY / 4
@@ -0,0 +1,65 @@
+import json
+import sqlite3
+
+import pytest
+
+from backfill import load_checkpoint, reset_checkpoint, run_backfill
+
+WHERE = "json_extract(data, '$.customerInformation.country') = ?"
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE complaints (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)")
+    for i in range(100):
+        conn.execute("INSERT INTO complaints (data) VALUES (?)", (json.dumps({
+            "customerInformation": {"country": "Spain" if i % 2 else "Italy"},
+        }),))
+    # Leave a gap in the ids
+    conn.execute("DELETE FROM complaints WHERE id BETWEEN 40 AND 60")
+    conn.commit()
+    yield conn
+    conn.close()
+
+def _to_turkey(complaint_id, data):
+    data['customerInformation']['country'] = 'Turkey'
+    return data
+
+def _count(conn, country):
+    return conn.execute(f"SELECT COUNT(*) FROM complaints WHERE {WHERE}", (country,)).fetchone()[0]
+
+def test_backfill_resumes_from_checkpoint(conn):
+    spain = _count(conn, 'Spain')
+    calls = []
+
+    def transform(complaint_id, data):
+        calls.append(complaint_id)
+        return _to_turkey(complaint_id, data)
+
+    # Interrupted after three batches
+    run_backfill(conn, 'turkey', WHERE, ('Spain',), transform, batch_size=10, duty_cycle=1, max_batches=3)
+    last_id, rows_seen, rows_changed, completed_at = load_checkpoint(conn, 'turkey')
+    assert (last_id, rows_seen, rows_changed, completed_at) == (30, 15, 15, None)
+
+    assert run_backfill(conn, 'turkey', WHERE, ('Spain',), transform, batch_size=10, duty_cycle=1) == spain
+    # Every row was transformed exactly once
+    assert len(calls) == len(set(calls)) == spain
+    assert _count(conn, 'Turkey') == spain
+    assert load_checkpoint(conn, 'turkey')[3] is not None
+
+    # Completed backfills don't run again until reset
+    calls.clear()
+    run_backfill(conn, 'turkey', WHERE, ('Italy',), transform, batch_size=10, duty_cycle=1)
+    assert calls == []
+    reset_checkpoint(conn, 'turkey')
+    run_backfill(conn, 'turkey', WHERE, ('Italy',), transform, batch_size=10, duty_cycle=1)
+    assert _count(conn, 'Italy') == 0
+
+def test_unchanged_rows_are_not_written(conn):
+    changed = run_backfill(conn, 'noop', WHERE, ('Spain',), lambda complaint_id, data: None, duty_cycle=1)
+    assert changed == 0
+    assert load_checkpoint(conn, 'noop')[1] == _count(conn, 'Spain')
+
+def test_duty_cycle_is_validated(conn):
+    with pytest.raises(ValueError):
+        run_backfill(conn, 'bad', WHERE, ('Spain',), _to_turkey, duty_cycle=0)
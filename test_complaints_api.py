@@ -0,0 +1,101 @@
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+from faker import Faker
+
+import app as app_module
+import regenerate_consistent_data as generator
+from db_version import data_version
+from setup_database import setup_database
+
+AS_OF = datetime(2025, 6, 30)
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, 'reference_now', AS_OF)
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'complaints.db'))
+    setup_database()
+    random.seed(3)
+    Faker.seed(3)
+    conn = sqlite3.connect(str(tmp_path / 'complaints.db'))
+    generator.bulk_insert(conn, list(generator.generate_rows(60)))
+    conn.close()
+    yield str(tmp_path / 'complaints.db')
+    data_version.reset()
+
+@pytest.fixture
+def client(db_path):
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'test'
+    return client
+
+def test_slim_page_matches_complaint_list(client):
+    response = client.get('/api/complaints?per_page=10&page=2&status=Not Resolved')
+    assert response.status_code == 200
+    body = response.get_json()
+
+    complaints, total_count = app_module.get_all_complaints(page=2, items_per_page=10, status='Not Resolved')
+    assert body['total_count'] == total_count
+    assert body['total_pages'] == (total_count + 9) // 10
+    assert [row['id'] for row in body['complaints']] == [complaint[0] for complaint in complaints]
+    for row, (_, data, note) in zip(body['complaints'], complaints):
+        assert row['customer'] == data['customerInformation']['fullName']
+        assert row['date'] == data['complaintDetails']['dateOfComplaint'].split('T')[0]
+        assert row['has_notes'] is bool(note)
+        assert 'detailedDescription' not in str(row)
+
+def test_list_projection_rows(db_path):
+    rows, total_count = app_module.get_all_complaints(items_per_page=5, country='Turkey', projection='list')
+    assert total_count == app_module.get_all_complaints(items_per_page=5, country='Turkey')[1]
+    assert rows and all(isinstance(row, app_module.ComplaintListRow) and row.country == 'Turkey' for row in rows)
+
+def test_conditional_get(client, db_path):
+    first = client.get('/api/complaints?country=Turkey')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    unchanged = client.get('/api/complaints?country=Turkey', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b''
+    assert unchanged.headers['ETag'] == etag
+
+    # Compressed responses carry the weak form of the same tag
+    compressed = client.get('/api/complaints?country=Turkey', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['ETag'] == f'W/{etag}'
+    assert client.get('/api/complaints?country=Turkey', headers={'If-None-Match': compressed.headers['ETag']}).status_code == 304
+
+    # Other filters or pages have their own tags
+    assert client.get('/api/complaints?country=Spain').headers['ETag'] != etag
+    assert client.get('/api/complaints?country=Turkey&page=2').headers['ETag'] != etag
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE technical_notes SET data = json_set(data, '$.ai_analysis.openai_category', 'Noise') WHERE id = 1")
+    conn.commit()
+    conn.close()
+    changed = client.get('/api/complaints?country=Turkey', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+def test_etag_is_shared_between_processes(client, db_path):
+    etag = client.get('/api/complaints').headers['ETag']
+    # A worker with its own watch connection numbers data_version differently
+    data_version.reset()
+    assert client.get('/api/complaints', headers={'If-None-Match': etag}).status_code == 304
+
+def test_invalid_page(client):
+    assert client.get('/api/complaints?page=two').status_code == 400
+
+def test_connection_error_returns_none_on_cloud_run(tmp_path, monkeypatch):
+    from cloud_storage_db import cloud_db
+    monkeypatch.setattr(cloud_db, 'connect', lambda factory: None)
+    # A directory can't be opened as a database
+    monkeypatch.setenv('DB_PATH', str(tmp_path))
+    for name in ('FLASK_ENV', 'ENVIRONMENT', 'GAE_ENV', 'K_SERVICE'):
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(sqlite3.Error):
+        app_module.connect_to_db()
+    monkeypatch.setenv('K_SERVICE', 'bsh-complaints')
+    assert app_module.connect_to_db() is None
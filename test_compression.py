@@ -0,0 +1,81 @@
+import gzip
+
+from flask import Flask, Response, url_for
+
+import compression
+from compression import init_compression
+from static_assets import STATIC_MAX_AGE, init_static_assets
+
+def make_app(tmp_path):
+    (tmp_path / 'static').mkdir()
+    (tmp_path / 'static' / 'app.js').write_text('console.log("complaints");\n' * 200)
+    app = Flask(__name__, static_folder=str(tmp_path / 'static'))
+    init_compression(app)
+    init_static_assets(app)
+
+    @app.route('/page')
+    def page():
+        return '<p>complaint</p>' * 500
+
+    @app.route('/small')
+    def small():
+        return '<p>ok</p>'
+
+    @app.route('/stream')
+    def stream():
+        return Response((f"data: {i}\n\n" for i in range(500)), mimetype='text/event-stream')
+
+    @app.route('/tagged')
+    def tagged():
+        response = Response('{"rows": []}' * 200, mimetype='application/json')
+        response.set_etag('abc')
+        return response
+
+    return app
+
+def test_compresses_large_text_responses(tmp_path):
+    client = make_app(tmp_path).test_client()
+    response = client.get('/page', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == b'<p>complaint</p>' * 500
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+    plain = client.get('/page')
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+def test_skips_small_and_streamed_responses(tmp_path):
+    client = make_app(tmp_path).test_client()
+    assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    stream = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in stream.headers
+    assert stream.data.startswith(b'data: 0\n\n')
+
+def test_compressed_etags_are_weak(tmp_path):
+    client = make_app(tmp_path).test_client()
+    assert client.get('/tagged').headers['ETag'] == '"abc"'
+    assert client.get('/tagged', headers={'Accept-Encoding': 'gzip'}).headers['ETag'] == 'W/"abc"'
+
+def test_fingerprinted_static_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(compression, '_static_cache', {})
+    app = make_app(tmp_path)
+    client = app.test_client()
+    with app.test_request_context():
+        url = url_for('static', filename='app.js')
+    assert '?v=' in url
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Cache-Control'] == f'public, max-age={STATIC_MAX_AGE}, immutable'
+    assert gzip.decompress(response.data) == (tmp_path / 'static' / 'app.js').read_bytes()
+    assert len(compression._static_cache) == 1
+    assert client.get(url, headers={'Accept-Encoding': 'gzip'}).data == response.data
+
+    # Unversioned or outdated URLs still revalidate
+    assert 'immutable' not in client.get('/static/app.js').headers.get('Cache-Control', '')
+    assert 'immutable' not in client.get('/static/app.js?v=0123456789ab').headers.get('Cache-Control', '')
+
+    # Editing the file changes its URL
+    (tmp_path / 'static' / 'app.js').write_text('console.log("changed");\n')
+    with app.test_request_context():
+        assert url_for('static', filename='app.js') != url
@@ -0,0 +1,95 @@
+import json
+import sqlite3
+from datetime import date
+
+import pytest
+
+import data_context
+import metrics
+from data_context import SECTION_ORDER, ContextStats, _fit_to_budget, build_data_context, detect_intents
+
+@pytest.mark.parametrize('question, intents', [
+    ("Which brand resolves complaints fastest?", {'brand', 'resolution', 'resolution_time'}),
+    ("How long until a Siemens complaint is resolved?", {'brand', 'resolution', 'resolution_time'}),
+    ("Garantisi biten ürünler hangileri?", {'warranty', 'model'}),
+    ("En yaygın arızalar neler?", {'category'}),
+    ("Show the monthly trend", {'trend'}),
+])
+def test_detect_intents(question, intents):
+    assert detect_intents(question) == intents
+
+@pytest.mark.parametrize('question', [
+    "Bugün kaç şikayet geldi?",                 # 'gün' inside 'bugün'
+    "Complaints logged at breakfast",           # 'fast' inside 'breakfast'
+    "Any prototype units?",                     # 'type' inside 'prototype'
+    "How many complaints in the last 30 days?", # 'days' is the period, not a resolution time
+])
+def test_keywords_match_whole_words(question):
+    assert detect_intents(question) == set(data_context.DEFAULT_INTENTS)
+
+def test_no_question_selects_every_section():
+    assert detect_intents(None) == set(SECTION_ORDER)
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE complaints (id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+    for i in range(40):
+        conn.execute("INSERT INTO complaints (data) VALUES (?)", (json.dumps({
+            "productInformation": {"brand": ["Bosch", "Siemens", "Neff"][i % 3], "modelNumber": f"KG{i % 7}"},
+            "warrantyInformation": {"warrantyStatus": "Active" if i % 2 else "Expired"},
+            "complaintDetails": {
+                "dateOfComplaint": f"2025-0{1 + i % 5}-10T09:00:00",
+                "resolutionStatus": "Resolved" if i % 4 else "Not Resolved",
+                "resolutionDate": f"2025-0{1 + i % 5}-{12 + i % 9}T09:00:00",
+                "natureOfProblem": [["Noise", "Ice Buildup", "Leaking"][i % 3]],
+            },
+        }),))
+    yield conn.cursor()
+    conn.close()
+
+def test_sections_follow_the_question(cursor):
+    context, _ = build_data_context(cursor, date(2025, 1, 1), date(2025, 6, 30), "the first half", question="warranty")
+    assert 'WARRANTY STATUS DISTRIBUTION' in context
+    assert 'TOP PRODUCT MODELS' not in context and 'MONTHLY TREND' not in context
+
+    context, _ = build_data_context(cursor, date(2025, 1, 1), date(2025, 6, 30), "the first half")
+    headers = [line.split(' (')[0] for line in context.splitlines() if line.endswith(':')]
+    assert headers == ['RESOLUTION STATUS', 'BRAND RESOLUTION RATES', 'OVERALL RESOLUTION TIME STATISTICS',
+                       'BRAND RESOLUTION TIME STATISTICS', 'BRAND STATISTICS', 'TOP COMPLAINT CATEGORIES',
+                       'TOP PRODUCT MODELS', 'WARRANTY STATUS DISTRIBUTION', 'MONTHLY TREND']
+
+def test_trimming_starts_with_the_last_section(monkeypatch):
+    monkeypatch.setattr(data_context, 'estimate_tokens', len)
+    first = [f"first row {i}" for i in range(8)]
+    last = [f"last row {i}" for i in range(8)]
+    sections = [('FIRST:', first), ('LAST:', last)]
+    full, trimmed = _fit_to_budget('P', sections, 1000)
+    assert not trimmed and full == '\n'.join(['P', 'FIRST:', *first, 'LAST:', *last])
+
+    # The last section is halved, keeping its top rows, before the first one is touched
+    expected = '\n'.join(['P', 'FIRST:', *first, 'LAST:', *last[:4], '... 4 more rows omitted'])
+    assert _fit_to_budget('P', sections, len(expected)) == (expected, True)
+
+    # Once it is down to one row it is dropped, then the first section is halved
+    expected = '\n'.join(['P', 'FIRST:', *first])
+    assert _fit_to_budget('P', sections, len(expected)) == (expected, True)
+    expected = '\n'.join(['P', 'FIRST:', *first[:4], '... 4 more rows omitted'])
+    assert _fit_to_budget('P', sections, len(expected)) == (expected, True)
+
+def test_context_stats(monkeypatch):
+    for metric in (metrics.DATA_CONTEXT_TOKENS, metrics.DATA_QUERY_PROMPT_TOKENS):
+        monkeypatch.setattr(metric, '_values', {})
+    stats = ContextStats()
+    stats.record_context(300)
+    stats.record_context(900, trimmed=True)
+    stats.record_prompt_tokens(1000)
+    stats.record_prompt_tokens(None)
+    assert stats.snapshot() == {'requests': 2, 'avg_context_tokens': 600.0, 'trimmed_requests': 1,
+                                'prompt_requests': 1, 'avg_prompt_tokens': 1000.0}
+
+    lines = list(metrics.DATA_CONTEXT_TOKENS.render(metrics.DATA_CONTEXT_TOKENS.snapshot()))
+    assert 'bsh_data_context_tokens_count{trimmed="false"} 1' in lines
+    assert 'bsh_data_context_tokens_sum{trimmed="true"} 900.0' in lines
+    assert 'bsh_data_query_prompt_tokens_count 1' in list(
+        metrics.DATA_QUERY_PROMPT_TOKENS.render(metrics.DATA_QUERY_PROMPT_TOKENS.snapshot()))
@@ -0,0 +1,102 @@
+import json
+import random
+import sqlite3
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from faker import Faker
+
+import app as app_module
+import metrics
+import regenerate_consistent_data as generator
+from data_context import ContextStats
+from setup_database import setup_database
+
+def chunk(content=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+class FakeCompletions:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        for index, item in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise ConnectionError("stream reset")
+            yield item
+
+@pytest.fixture
+def stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, 'reference_now', datetime(2025, 6, 30))
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'complaints.db'))
+    setup_database()
+    random.seed(5)
+    Faker.seed(5)
+    conn = sqlite3.connect(str(tmp_path / 'complaints.db'))
+    generator.bulk_insert(conn, list(generator.generate_rows(30)))
+    conn.close()
+
+    stats = ContextStats()
+    monkeypatch.setattr(app_module, 'context_stats', stats)
+    monkeypatch.setattr(metrics.OPENAI_TOKENS, '_values', {})
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'test'
+
+    def ask(completions, question="Which brand has the most complaints?"):
+        monkeypatch.setattr(app_module, '_openai_client', SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+        return client.post('/talk_with_data/query/stream', json={'question': question})
+
+    return ask, stats
+
+def parse_events(body):
+    """[(event, payload)] of a server-sent event stream, checking the framing."""
+    assert body.endswith('\n\n')
+    events = []
+    for raw in body[:-2].split('\n\n'):
+        event_line, data_line = raw.split('\n')
+        assert event_line.startswith('event: ') and data_line.startswith('data: ')
+        events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+    return events
+
+def test_tokens_are_streamed_and_usage_recorded(stream):
+    ask, stats = stream
+    completions = FakeCompletions([
+        chunk('Bosch '), chunk('leads.'),
+        chunk(usage=SimpleNamespace(prompt_tokens=640, completion_tokens=4)),
+    ])
+    response = ask(completions)
+    events = parse_events(response.get_data(as_text=True))
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    names = [name for name, _ in events]
+    assert names == ['meta', 'token', 'token', 'done']
+    assert ''.join(payload['token'] for name, payload in events if name == 'token') == 'Bosch leads.'
+    assert events[0][1]['context_tokens'] > 0
+    assert completions.calls[0]['stream'] and completions.calls[0]['stream_options'] == {'include_usage': True}
+
+    # The usage block of the final chunk
+    snapshot = stats.snapshot()
+    assert (snapshot['prompt_requests'], snapshot['avg_prompt_tokens']) == (1, 640.0)
+    assert metrics.OPENAI_TOKENS.snapshot() == {('data_query_stream', 'prompt'): 640,
+                                                ('data_query_stream', 'completion'): 4}
+
+def test_failure_mid_stream_ends_with_error_event(stream):
+    ask, stats = stream
+    events = parse_events(ask(FakeCompletions([chunk('Bosch '), chunk('leads.')], fail_after=1)).get_data(as_text=True))
+    assert [name for name, _ in events] == ['meta', 'token', 'error']
+    assert events[-1][1]['answer'].startswith('Sorry')
+    assert stats.snapshot()['prompt_requests'] == 0
+
+def test_empty_question_is_rejected_before_streaming(stream):
+    ask, _ = stream
+    completions = FakeCompletions([])
+    response = ask(completions, question='  ')
+    assert response.status_code == 400 and response.is_json
+    assert not completions.calls
@@ -0,0 +1,53 @@
+import json
+import sqlite3
+
+import pytest
+
+import document_storage
+from document_storage import convert, document_sql, storage_counts
+
+DOCUMENT = {"customerInformation": {"country": "Turkey"}, "complaintDetails": {"natureOfProblem": ["Noise"]}}
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE complaints (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)")
+    conn.execute("CREATE TABLE technical_notes (id INTEGER PRIMARY KEY AUTOINCREMENT, complaint_id INTEGER, data TEXT NOT NULL)")
+    for _ in range(30):
+        conn.execute("INSERT INTO complaints (data) VALUES (?)", (json.dumps(DOCUMENT),))
+        conn.execute("INSERT INTO technical_notes (complaint_id, data) VALUES (1, ?)", (json.dumps({"partsReplaced": []}),))
+    conn.commit()
+    yield conn
+    conn.close()
+
+def test_document_sql_reads_text_documents(conn):
+    rows = conn.execute(f"SELECT {document_sql()} FROM complaints").fetchall()
+    assert [json.loads(row[0]) for row in rows] == [DOCUMENT] * 30
+
+def test_jsonb_falls_back_to_text_on_old_sqlite(monkeypatch):
+    monkeypatch.setenv('DOCUMENT_STORAGE', 'jsonb')
+    monkeypatch.setattr(document_storage, 'JSONB_SUPPORTED', False)
+    assert document_storage._use_jsonb() is False
+    monkeypatch.setattr(document_storage, 'JSONB_SUPPORTED', True)
+    assert document_storage._use_jsonb() is True
+    monkeypatch.setenv('DOCUMENT_STORAGE', 'text')
+    assert document_storage._use_jsonb() is False
+
+def test_convert_to_jsonb_needs_support(conn, monkeypatch):
+    monkeypatch.setattr(document_storage, 'JSONB_SUPPORTED', False)
+    with pytest.raises(RuntimeError):
+        convert(conn, 'jsonb')
+    # Converting to text is always possible, and a no-op on text documents
+    convert(conn, 'text', duty_cycle=1)
+    assert storage_counts(conn, 'complaints') == {'text': 30}
+
+@pytest.mark.skipif(not document_storage.JSONB_SUPPORTED, reason="SQLite without JSONB")
+def test_convert_round_trip(conn):
+    convert(conn, 'jsonb', batch_size=7, duty_cycle=1)
+    assert storage_counts(conn, 'complaints') == {'blob': 30}
+    assert storage_counts(conn, 'technical_notes') == {'blob': 30}
+    assert conn.execute("SELECT COUNT(*) FROM complaints WHERE json_extract(data, '$.customerInformation.country') = 'Turkey'").fetchone()[0] == 30
+    assert json.loads(conn.execute(f"SELECT {document_sql()} FROM complaints LIMIT 1").fetchone()[0]) == DOCUMENT
+
+    convert(conn, 'text', batch_size=7, duty_cycle=1)
+    assert storage_counts(conn, 'complaints') == {'text': 30}
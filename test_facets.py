@@ -0,0 +1,185 @@
+import random
+import shutil
+import sqlite3
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from faker import Faker
+
+import normalized_schema
+import regenerate_consistent_data as generator
+from db_version import DataVersion
+from app import query_complaints_json
+from facets import FACETS, NO_ANALYSIS, FacetCache, facet_counts, load_facets
+from setup_database import setup_database
+from time_periods import parse_filter_period
+
+AS_OF = datetime(2025, 6, 30)
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, 'reference_now', AS_OF)
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'complaints.db'))
+    setup_database()
+    random.seed(7)
+    Faker.seed(7)
+    conn = sqlite3.connect(str(tmp_path / 'complaints.db'))
+    generator.bulk_insert(conn, list(generator.generate_rows(120)))
+    conn.execute("INSERT INTO complaints (data) VALUES (json('{\"customerInformation\": {\"country\": \"Iceland\"}}'))")
+    conn.commit()
+    conn.close()
+    return str(tmp_path / 'complaints.db')
+
+def _add_ai_categories(conn):
+    for note_id, category in conn.execute("SELECT id, id % 3 FROM technical_notes WHERE id % 4 = 0").fetchall():
+        conn.execute("UPDATE technical_notes SET data = json_set(data, '$.ai_analysis.openai_category', ?) WHERE id = ?",
+                     (f"Category {category}", note_id))
+    conn.commit()
+
+def test_counts_match_documents(db_path):
+    conn = sqlite3.connect(db_path)
+    facets = load_facets(conn)
+    countries = dict(facets['country'])
+    assert countries['Iceland'] == 1
+    assert sum(countries.values()) == conn.execute("SELECT COUNT(*) FROM complaints").fetchone()[0]
+    assert [value for value, _ in facets['country']] == sorted(countries)
+
+    brands = dict(facets['brand'])
+    assert sum(brands.values()) == conn.execute("SELECT COUNT(*) FROM complaints").fetchone()[0] - 1
+
+    assert facets['ai_category'][-1] == (NO_ANALYSIS, conn.execute(
+        "SELECT COUNT(*) FROM complaints WHERE id NOT IN (SELECT complaint_id FROM technical_notes)").fetchone()[0])
+    conn.close()
+
+def test_cache_reloads_only_after_a_commit(db_path):
+    cache = FacetCache(DataVersion(lambda: db_path))
+    conn = sqlite3.connect(db_path)
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    first = cache.get(conn)
+    assert statements
+    statements.clear()
+    assert cache.get(conn) is first
+    assert statements == []
+
+    writer = sqlite3.connect(db_path)
+    writer.execute("INSERT INTO complaints (data) VALUES (json('{\"customerInformation\": {\"country\": \"Iceland\"}}'))")
+    writer.commit()
+    writer.close()
+
+    second = cache.get(conn)
+    assert statements
+    assert dict(second['country'])['Iceland'] == 2
+    conn.close()
+
+def test_data_version_after_fork_leaves_the_inherited_connection_open(db_path):
+    version = DataVersion(lambda: db_path)
+    before = version.current()
+    inherited = version._conn
+    version.reset_after_fork()
+    # Still usable by the parent process that owns it
+    assert inherited.execute("PRAGMA data_version").fetchone()
+    assert version.current()[1] != before[1]
+    inherited.close()
+
+def test_database_download_drops_version_and_facets(db_path, tmp_path, monkeypatch):
+    import db_version
+    import facets
+    from cloud_storage_db import CloudStorageDB
+
+    version = DataVersion(lambda: db_path)
+    cache = FacetCache(version)
+    monkeypatch.setattr(db_version, 'data_version', version)
+    monkeypatch.setattr(facets, 'facet_cache', cache)
+    conn = sqlite3.connect(db_path)
+    cache.get(conn)
+    before = version.current()
+
+    class Blob:
+        def exists(self):
+            return True
+
+        def download_to_filename(self, path):
+            shutil.copy(db_path, path)
+
+    storage = CloudStorageDB(bucket_name='test')
+    storage.local_db_path = str(tmp_path / 'downloaded.db')
+    storage.client, storage.bucket = object(), SimpleNamespace(blob=lambda name: Blob())
+    assert storage.download_db_from_gcs()
+    assert version._conn is None and cache._facets is None
+    assert version.current() != before
+    conn.close()
+
+def test_normalized_facets_match_json(db_path, monkeypatch):
+    conn = sqlite3.connect(db_path)
+    _add_ai_categories(conn)
+    expected = load_facets(conn)
+    assert len(expected['ai_category']) > 1
+
+    normalized_schema.install(conn)
+    normalized_schema.backfill(conn, duty_cycle=1)
+    monkeypatch.setattr(normalized_schema, 'NORMALIZED_READS', True)
+    monkeypatch.setattr(normalized_schema, '_ready', False)
+    assert normalized_schema.reads_enabled(conn)
+    assert load_facets(conn) == expected
+    conn.close()
+
+FILTERS = [
+    {},
+    {'country': 'Turkey', 'status': 'Not Resolved'},
+    {'period': parse_filter_period('custom:2025-01-01:2025-06-30'), 'warranty': 'Active'},
+    {'search': 'e', 'has_notes': True, 'brand': 'Bosch'},
+    {'ai_category': NO_ANALYSIS, 'status': 'Resolved'},
+    {'ai_category': 'Category 1'},
+]
+
+def _listed(cursor, filters):
+    return query_complaints_json(cursor, 1, 1, **filters)[1]
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_facet_counts_match_complaint_list(db_path, filters):
+    conn = sqlite3.connect(db_path)
+    _add_ai_categories(conn)
+    cursor = conn.cursor()
+    total, counts = facet_counts(conn, **filters)
+    assert total == _listed(cursor, filters)
+    for facet in FACETS:
+        assert counts[facet]
+        # Choosing another value of a facet lists as many complaints as its count
+        for value, count in counts[facet].items():
+            assert count == _listed(cursor, {**filters, facet: value}), (facet, value)
+    conn.close()
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_normalized_facet_counts_match_json(db_path, monkeypatch, filters):
+    conn = sqlite3.connect(db_path)
+    _add_ai_categories(conn)
+    expected = facet_counts(conn, **filters)
+    normalized_schema.install(conn)
+    normalized_schema.backfill(conn, duty_cycle=1)
+    monkeypatch.setattr(normalized_schema, 'NORMALIZED_READS', True)
+    monkeypatch.setattr(normalized_schema, '_ready', False)
+    assert facet_counts(conn, **filters) == expected
+    conn.close()
+
+def test_cached_counts(db_path):
+    cache = FacetCache(DataVersion(lambda: db_path))
+    conn = sqlite3.connect(db_path)
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    assert cache.counts(conn) == facet_counts(conn)
+    first = cache.counts(conn, country='Turkey')
+    statements.clear()
+    assert cache.counts(conn, country='Turkey') is first
+    assert statements == []
+
+    writer = sqlite3.connect(db_path)
+    writer.execute("UPDATE complaints SET data = json_set(data, '$.customerInformation.country', 'Turkey') WHERE id = 1")
+    writer.commit()
+    writer.close()
+    assert cache.counts(conn, country='Turkey') == facet_counts(conn, country='Turkey')
+    assert statements
+    conn.close()
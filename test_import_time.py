@@ -0,0 +1,46 @@
+"""
+Import-time benchmark for app.py.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter and checks
+that the heavy libraries are only loaded on first use. The cumulative import
+time is printed (run pytest with -s to see it) and must stay under
+IMPORT_TIME_BUDGET_MS.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_MS = int(os.getenv('IMPORT_TIME_BUDGET_MS', '1500'))
+
+# Libraries that must not be imported while loading app.py
+LAZY_MODULES = ['pandas', 'numpy', 'matplotlib', 'plotly', 'openai', 'google.cloud.storage', 'google.cloud.secretmanager']
+
+def _import_times(db_path):
+    env = dict(os.environ, DB_PATH=db_path, OPENAI_API_KEY='sk-test', SECRET_MANAGER_KEY='')
+    env.pop('K_SERVICE', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)', line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+def test_app_import_is_lazy(tmp_path):
+    # Importing must not touch the database; point it at an empty location to be sure
+    times = _import_times(str(tmp_path / 'import_time.db'))
+
+    loaded = [module for module in LAZY_MODULES if module in times]
+    assert not loaded, f"Heavy modules imported at startup: {loaded}"
+
+    cumulative_ms = times['app'] / 1000
+    print(f"\napp import time: {cumulative_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS} ms)")
+    assert cumulative_ms < IMPORT_TIME_BUDGET_MS
@@ -0,0 +1,62 @@
+import datetime
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import json_codec
+
+BACKENDS = ['json'] + (['orjson'] if json_codec.orjson is not None else [])
+
+DOCUMENT = {
+    "customerInformation": {"fullName": "Zeynep Yılmaz", "country": "Turkey"},
+    "complaintDetails": {"natureOfProblem": ["Noise", "Ice Buildup"], "repairAttempted": False},
+    "environmentalConditions": {"roomTemperature": "21°C"},
+}
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(json_codec, 'BACKEND', request.param)
+    if request.param == 'orjson':
+        monkeypatch.setattr(json_codec, 'ORJSON_OPTIONS',
+                            json_codec.orjson.OPT_NON_STR_KEYS | json_codec.orjson.OPT_SERIALIZE_NUMPY, raising=False)
+    return request.param
+
+def test_round_trip(backend):
+    text = json_codec.dumps(DOCUMENT)
+    assert isinstance(text, str)
+    assert json_codec.loads(text) == DOCUMENT
+    assert json_codec.loads(text.encode()) == DOCUMENT
+    # Documents written by the json module decode the same way
+    assert json_codec.loads(json.dumps(DOCUMENT)) == DOCUMENT
+
+def test_datetimes_and_numpy(backend):
+    value = {
+        "at": datetime.datetime(2025, 1, 10, 9, 30, 0, 123456),
+        "day": datetime.date(2025, 1, 10),
+        "counts": np.array([1, 2, 3]),
+        "mean": np.float64(2.5),
+    }
+    assert json_codec.loads(json_codec.dumps(value)) == {
+        "at": "2025-01-10T09:30:00.123456", "day": "2025-01-10", "counts": [1, 2, 3], "mean": 2.5,
+    }
+
+def test_decode_errors(backend):
+    with pytest.raises(json_codec.JSONDecodeError):
+        json_codec.loads("{not json")
+
+def test_plotly_json_matches_plotly_encoder(backend):
+    import plotly.graph_objects as go
+    import plotly.utils
+    fig = go.Figure(go.Scatter(x=[datetime.date(2025, 1, d) for d in range(1, 4)], y=np.array([3, 1, 2])))
+    expected = json.loads(json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder))
+    assert json.loads(json_codec.plotly_json(fig)) == expected
+
+def test_flask_provider_keeps_flask_formats(backend):
+    app = Flask(__name__)
+    app.json = json_codec.CodecJSONProvider(app)
+    with app.app_context():
+        response = app.json.response({"b": 1, "a": datetime.datetime(2025, 1, 10, 9, 30)})
+        assert response.get_data(as_text=True) == '{"a":"Fri, 10 Jan 2025 09:30:00 GMT","b":1}\n'
+        assert app.json.loads('{"a": [1, 2]}') == {"a": [1, 2]}
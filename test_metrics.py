@@ -0,0 +1,110 @@
+import os
+import sqlite3
+from types import SimpleNamespace
+
+from flask import Flask
+
+import metrics
+from metrics import Counter, Histogram, InstrumentedConnection, Registry, init_metrics, openai_call
+
+def make_app(monkeypatch, tmp_path):
+    registry = Registry()
+    for metric in (metrics.REQUEST_DURATION, metrics.REQUEST_SQL_QUERIES, metrics.REQUEST_SQL_SECONDS,
+                   metrics.OPENAI_DURATION, metrics.OPENAI_TOKENS):
+        monkeypatch.setattr(metric, '_values', {})
+        registry.register(metric)
+    monkeypatch.setattr(metrics, 'registry', registry)
+    db_path = str(tmp_path / 'metrics.db')
+    app = Flask(__name__)
+    init_metrics(app)
+
+    @app.route('/complaints/<int:complaint_id>')
+    def complaint(complaint_id):
+        conn = sqlite3.connect(db_path, factory=InstrumentedConnection)
+        conn.execute("CREATE TABLE IF NOT EXISTS complaints (id INTEGER PRIMARY KEY)")
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM complaints WHERE id = ?", (complaint_id,))
+        cursor.fetchall()
+        conn.close()
+        return 'ok'
+
+    @app.route('/chat')
+    def chat():
+        with openai_call('data_query') as call:
+            call.record_usage(SimpleNamespace(prompt_tokens=120, completion_tokens=30))
+        try:
+            with openai_call('data_query'):
+                raise TimeoutError()
+        except TimeoutError:
+            pass
+        return 'ok'
+
+    return app
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('latency_seconds', 'Latency.', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, route='/a')
+    histogram.observe(0.5, route='/a')
+    lines = list(histogram.render(histogram.snapshot()))
+    assert lines == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 2',
+        'latency_seconds_sum{route="/a"} 0.55',
+        'latency_seconds_count{route="/a"} 2',
+    ]
+
+def test_request_latency_and_sql_per_route(monkeypatch, tmp_path):
+    client = make_app(monkeypatch, tmp_path).test_client()
+    client.get('/complaints/1')
+    client.get('/complaints/2')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'bsh_http_request_duration_seconds_count{method="GET",route="/complaints/<int:complaint_id>",status="200"} 2' in body
+    # CREATE TABLE and the SELECT, in each of the two requests
+    assert 'bsh_http_request_sql_queries_sum{route="/complaints/<int:complaint_id>"} 4.0' in body
+    assert 'bsh_http_request_sql_seconds_count{route="/complaints/<int:complaint_id>"} 2' in body
+
+def test_openai_latency_and_tokens(monkeypatch, tmp_path):
+    client = make_app(monkeypatch, tmp_path).test_client()
+    client.get('/chat')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'bsh_openai_request_duration_seconds_count{operation="data_query",status="ok"} 1' in body
+    assert 'bsh_openai_request_duration_seconds_count{operation="data_query",status="error"} 1' in body
+    assert 'bsh_openai_tokens_total{operation="data_query",type="prompt"} 120' in body
+    assert 'bsh_openai_tokens_total{operation="data_query",type="completion"} 30' in body
+
+def test_metrics_token(monkeypatch, tmp_path):
+    client = make_app(monkeypatch, tmp_path).test_client()
+    monkeypatch.setenv('METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+def test_instrumented_connection_outside_requests():
+    conn = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+    assert conn.execute("SELECT 1").fetchone() == (1,)
+    assert isinstance(conn.cursor(), metrics.InstrumentedCursor)
+
+def test_snapshots_of_all_processes_are_summed(tmp_path):
+    def make_registry():
+        registry = Registry(str(tmp_path))
+        registry.register(Counter('tokens_total', 'Tokens.', ('type',)))
+        registry.register(Histogram('latency_seconds', 'Latency.', buckets=(1.0,)))
+        return registry
+
+    worker = make_registry()
+    worker.metrics['tokens_total'].inc(5, type='prompt')
+    worker.metrics['latency_seconds'].observe(0.5)
+    worker.flush(force=True)
+    # The snapshot is named after the process, so give it another worker's name
+    os.rename(tmp_path / f'{os.getpid()}.json', tmp_path / '1.json')
+
+    serving = make_registry()
+    serving.metrics['tokens_total'].inc(2, type='prompt')
+    serving.metrics['latency_seconds'].observe(2.0)
+    body = serving.render()
+    assert 'tokens_total{type="prompt"} 7' in body
+    assert 'latency_seconds_bucket{le="1.0"} 1' in body
+    assert 'latency_seconds_count 2' in body
+
+    serving.clear_directory()
+    assert not list(tmp_path.glob('*.json'))
@@ -0,0 +1,79 @@
+import json
+import sqlite3
+
+import pytest
+
+import document_storage
+from document_storage import storage_counts
+from migrations import applied_versions, backfill_resolution_dates, run_migrations, update_in_chunks
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE complaints (id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT NOT NULL)")
+    for i in range(200):
+        conn.execute("INSERT INTO complaints (data) VALUES (?)", (json.dumps({
+            "customerInformation": {"country": "Spain"},
+            "productInformation": {},
+            "complaintDetails": {"dateOfComplaint": "2025-01-10T09:30:00", "resolutionStatus": "Resolved" if i % 2 else "Not Resolved"},
+        }),))
+    conn.commit()
+    yield conn
+    conn.close()
+
+def _brands(conn):
+    return dict(conn.execute(
+        "SELECT json_extract(data, '$.productInformation.brand') AS brand, COUNT(*) FROM complaints GROUP BY brand"
+    ).fetchall())
+
+def test_dry_run_rolls_back(conn):
+    results = run_migrations(conn, dry_run=True, target=2)
+    assert [rows for _, rows in results] == [200, 100]
+    assert _brands(conn) == {None: 200}
+    assert applied_versions(conn) == set()
+
+def test_apply_records_versions_and_runs_once(conn):
+    run_migrations(conn, target=2)
+    assert _brands(conn) == {"Bosch": 90, "Profilo": 60, "Siemens": 30, "Gaggenau": 10, "Neff": 10}
+    assert applied_versions(conn) == {1, 2}
+    assert run_migrations(conn, target=2) == []
+
+def test_brand_creates_missing_product_information(conn):
+    conn.execute("UPDATE complaints SET data = json_remove(data, '$.productInformation') WHERE id % 2")
+    conn.execute("UPDATE complaints SET data = json_set(data, '$.productInformation', json('null')) WHERE id % 4 = 0")
+    run_migrations(conn, target=1)
+    assert sum(_brands(conn).values()) == 200 and None not in _brands(conn)
+
+def test_resolution_dates_use_brand_ranges(conn):
+    conn.execute("UPDATE complaints SET data = json_set(data, '$.productInformation.brand', 'Gaggenau')")
+    assert backfill_resolution_dates(conn) == 100
+    days = [row[0] for row in conn.execute("""
+        SELECT julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - julianday('2025-01-10T09:30:00')
+        FROM complaints WHERE json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
+    """)]
+    assert len(days) == 100 and all(2 <= d <= 7 for d in days)
+    # Already filled in, so nothing left to do
+    assert backfill_resolution_dates(conn) == 0
+
+def test_update_in_chunks(conn):
+    def transform(complaint_id, data):
+        if complaint_id % 4:
+            return None
+        data['customerInformation']['country'] = 'Turkey'
+        return data
+
+    updated = update_in_chunks(conn, "json_extract(data, '$.customerInformation.country') = ?", ('Spain',), transform, chunk_size=30)
+    assert updated == 50
+    assert conn.execute("SELECT COUNT(*) FROM complaints WHERE json_extract(data, '$.customerInformation.country') = 'Turkey'").fetchone()[0] == 50
+
+def test_migrations_keep_text_documents_text(conn):
+    run_migrations(conn, target=2)
+    assert storage_counts(conn, 'complaints') == {'text': 200}
+
+@pytest.mark.skipif(not document_storage.JSONB_SUPPORTED, reason="SQLite without JSONB")
+def test_migrations_keep_jsonb_documents_jsonb(conn, monkeypatch):
+    monkeypatch.setattr(document_storage, 'USE_JSONB', True)
+    conn.execute("UPDATE complaints SET data = jsonb(data)")
+    run_migrations(conn, target=2)
+    assert _brands(conn) == {"Bosch": 90, "Profilo": 60, "Siemens": 30, "Gaggenau": 10, "Neff": 10}
+    assert storage_counts(conn, 'complaints') == {'blob': 200}
@@ -0,0 +1,165 @@
+import json
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+from faker import Faker
+
+import normalized_schema
+from facets import facet_counts
+import regenerate_consistent_data as generator
+from app import LIST_COLUMNS, get_period_statistics, query_complaints_json
+from setup_database import setup_database
+from time_periods import parse_filter_period
+
+AS_OF = datetime(2025, 6, 30)
+
+def _rows(count, seed):
+    random.seed(seed)
+    Faker.seed(seed)
+    return list(generator.generate_rows(count))
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, 'reference_now', AS_OF)
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'complaints.db'))
+    setup_database()
+    conn = sqlite3.connect(str(tmp_path / 'complaints.db'))
+
+    # Half the rows exist before the layout is installed and reach it through
+    # the backfill, the other half through the insert triggers
+    generator.bulk_insert(conn, _rows(150, 1))
+    normalized_schema.install(conn)
+    normalized_schema.backfill(conn, duty_cycle=1)
+    generator.bulk_insert(conn, _rows(150, 2))
+
+    # Give a few of the latest notes an AI category, through the update trigger
+    for note_id, category in conn.execute("SELECT id, id % 3 FROM technical_notes WHERE id % 5 = 0").fetchall():
+        conn.execute("UPDATE technical_notes SET data = json_set(data, '$.ai_analysis.openai_category', ?) WHERE id = ?",
+                     (f"Category {category}", note_id))
+    conn.commit()
+    yield conn
+    conn.close()
+
+FILTERS = [
+    {},
+    {'period': parse_filter_period('custom:2025-01-01:2025-06-30')},
+    {'country': 'Turkey'},
+    {'status': 'Not Resolved', 'warranty': 'Active'},
+    {'status': 'Resolved', 'brand': 'Bosch'},
+    {'search': 'ice'},
+    {'has_notes': True},
+    {'ai_category': 'No Analysis'},
+    {'ai_category': 'Category 1'},
+]
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_complaint_list_matches_json_queries(conn, filters):
+    cursor = conn.cursor()
+    expected_rows, expected_total = query_complaints_json(cursor, 1, 400, **filters)
+    rows, total = normalized_schema.query_complaints(cursor, 1, 400, **filters)
+    assert total == expected_total
+    assert sorted(rows) == sorted(expected_rows)
+
+    # Pages are sorted by complaint date, newest first
+    page, _ = normalized_schema.query_complaints(cursor, 2, 20, **filters)
+    dates = [json.loads(row[1])['complaintDetails']['dateOfComplaint'] for row in rows]
+    assert [json.loads(row[1])['complaintDetails']['dateOfComplaint'] for row in page] == dates[20:40]
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_list_projection_matches_documents(conn, filters):
+    cursor = conn.cursor()
+    json_columns = ', '.join(json_sql for _, json_sql, _ in LIST_COLUMNS)
+    normalized_columns = ', '.join(normalized_sql for _, _, normalized_sql in LIST_COLUMNS)
+    documents, _ = query_complaints_json(cursor, 1, 400, **filters)
+    rows, total = query_complaints_json(cursor, 1, 400, columns=json_columns, **filters)
+    assert sorted(normalized_schema.query_complaints(cursor, 1, 400, columns=normalized_columns, **filters)[0]) == sorted(rows)
+
+    by_id = {row[0]: row for row in rows}
+    assert len(by_id) == len(documents)
+    for complaint_id, complaint, note in documents:
+        complaint, note = json.loads(complaint), note and json.loads(note)
+        assert by_id[complaint_id] == (
+            complaint_id,
+            complaint['complaintDetails']['dateOfComplaint'],
+            complaint['customerInformation']['fullName'],
+            complaint['productInformation']['modelNumber'],
+            complaint['productInformation']['brand'],
+            complaint['customerInformation']['country'],
+            complaint['complaintDetails'].get('resolutionStatus', 'Not Resolved'),
+            complaint['warrantyInformation']['warrantyStatus'],
+            int(bool(note)),
+            note and note.get('ai_analysis', {}).get('openai_category'),
+        )
+
+@pytest.mark.parametrize('has_notes', [False, True])
+def test_statistics_match_json_queries(conn, has_notes):
+    cursor = conn.cursor()
+    expected = get_period_statistics(cursor, '2024-07-01', '2025-06-30', has_notes)
+    stats = normalized_schema.period_statistics(cursor, '2024-07-01', '2025-06-30', has_notes)
+    assert stats['total_complaints'] == expected['total_complaints'] > 0
+    assert stats['active_warranty'] == expected['active_warranty']
+    assert stats['resolution_rate'] == expected['resolution_rate']
+    assert dict(stats['problem_distribution']) == dict(expected['problem_distribution'])
+    assert dict(stats['warranty_distribution']) == {row[0]: row[1] for row in expected['warranty_distribution']}
+
+def test_triggers_follow_updates_and_deletes(conn):
+    complaint_id = conn.execute("SELECT MIN(id) FROM complaints").fetchone()[0]
+    conn.execute("""
+        UPDATE complaints
+        SET data = json_set(data, '$.complaintDetails.natureOfProblem', json('["Noise", "Ice Buildup"]'),
+                                  '$.customerInformation.country', 'Atlantis')
+        WHERE id = ?
+    """, (complaint_id,))
+    assert conn.execute("SELECT problem FROM rel_complaint_problems WHERE complaint_id = ? ORDER BY position",
+                        (complaint_id,)).fetchall() == [('Noise',), ('Ice Buildup',)]
+    assert conn.execute("""
+        SELECT cu.country FROM rel_complaints rc JOIN rel_customers cu ON cu.id = rc.customer_id WHERE rc.id = ?
+    """, (complaint_id,)).fetchone() == ('Atlantis',)
+
+    conn.execute("DELETE FROM technical_notes")
+    conn.execute("DELETE FROM complaints")
+    for table in ['rel_complaints', 'rel_customers', 'rel_products', 'rel_complaint_problems',
+                  'rel_technical_notes', 'rel_parts_replaced']:
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+
+def test_complaints_sharing_customer_and_product_keep_their_own_attributes(conn, monkeypatch):
+    first, second = [row[0] for row in conn.execute("SELECT id FROM complaints ORDER BY id LIMIT 2")]
+    for complaint_id, country, brand in [(first, 'Spain', 'Bosch'), (second, 'Turkey', 'Neff')]:
+        conn.execute("""
+            UPDATE complaints
+            SET data = json_set(data, '$.customerInformation.fullName', 'Ana Ruiz',
+                                      '$.customerInformation.emailAddress', 'ana@example.com',
+                                      '$.customerInformation.country', ?,
+                                      '$.productInformation.modelNumber', 'KGN39VL35',
+                                      '$.productInformation.serialNumber', 'SN-1',
+                                      '$.productInformation.brand', ?)
+            WHERE id = ?
+        """, (country, brand, complaint_id))
+    cursor = conn.cursor()
+    columns = 'rc.id, cu.country, p.brand'
+    for filters in [{'country': 'Spain', 'brand': 'Bosch'}, {'country': 'Turkey', 'brand': 'Neff'}]:
+        rows, _ = normalized_schema.query_complaints(cursor, 1, 400, columns=columns, search='Ana Ruiz', **filters)
+        assert rows == [(first if filters['country'] == 'Spain' else second, filters['country'], filters['brand'])]
+
+    monkeypatch.setattr(normalized_schema, 'NORMALIZED_READS', True)
+    monkeypatch.setattr(normalized_schema, '_ready', False)
+    total, counts = facet_counts(conn, search='Ana Ruiz')
+    assert total == 2
+    assert counts['country'] == {'Spain': 1, 'Turkey': 1}
+    assert counts['brand'] == {'Bosch': 1, 'Neff': 1}
+
+def test_reads_need_flag_and_completed_backfill(conn, monkeypatch):
+    monkeypatch.setattr(normalized_schema, '_ready', False)
+    monkeypatch.setattr(normalized_schema, 'NORMALIZED_READS', False)
+    assert not normalized_schema.reads_enabled(conn)
+    monkeypatch.setattr(normalized_schema, 'NORMALIZED_READS', True)
+    assert normalized_schema.reads_enabled(conn)
+
+    normalized_schema.drop(conn)
+    assert not normalized_schema.is_ready(conn)
+    assert not normalized_schema.reads_enabled(conn)
+    normalized_schema.install(conn)
+    # Installed but not backfilled yet
+    assert not normalized_schema.is_ready(conn)
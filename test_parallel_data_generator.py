@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from parallel_data_generator import generate_in_parallel, shard_plan
+
+AS_OF = datetime(2025, 6, 30)
+
+def test_shard_plan():
+    assert shard_plan(25, 10) == [(0, 10), (1, 10), (2, 5)]
+    assert shard_plan(0, 10) == []
+
+def test_output_is_deterministic_for_a_seed():
+    one_worker = list(generate_in_parallel(30, 1, seed=7, shard_size=10, as_of=AS_OF))
+    two_workers = list(generate_in_parallel(30, 2, seed=7, shard_size=10, as_of=AS_OF))
+    assert len(one_worker) == 30
+    assert one_worker == two_workers
+
+def test_seeds_give_different_data():
+    assert list(generate_in_parallel(5, 1, seed=1, shard_size=5, as_of=AS_OF)) != \
+        list(generate_in_parallel(5, 1, seed=2, shard_size=5, as_of=AS_OF))
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import random
+import sqlite3
+from datetime import datetime
+
+import pytest
+from faker import Faker
+
+import app as app_module
+import regenerate_consistent_data as generator
+from records import AiAnalysis, Complaint, TechnicalNote
+from setup_database import setup_database
+
+AS_OF = datetime(2025, 6, 30)
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(generator, 'reference_now', AS_OF)
+    monkeypatch.setenv('DB_PATH', str(tmp_path / 'complaints.db'))
+    setup_database()
+    random.seed(5)
+    Faker.seed(5)
+    conn = sqlite3.connect(str(tmp_path / 'complaints.db'))
+    generator.bulk_insert(conn, list(generator.generate_rows(40)))
+    conn.execute("UPDATE technical_notes SET data = json_set(data, '$.ai_analysis', json(?)) WHERE id % 2 = 0",
+                 (json.dumps({'openai_category': 'Noise', 'final_opinion': 'Fan'}),))
+    conn.commit()
+    conn.close()
+    return str(tmp_path / 'complaints.db')
+
+def test_records_decode_the_same_documents(db_path):
+    conn = app_module.connect_to_db()
+    documents, total = app_module.fetch_complaints(conn, 1, 100)
+    records, record_total = app_module.fetch_complaints(conn, 1, 100, projection='records')
+    conn.close()
+
+    assert record_total == total
+    assert [record.id for record in records] == [row[0] for row in documents]
+    for record, (_, data, note) in zip(records, documents):
+        assert record.document() == data
+        assert record.document() is not record.document()
+        assert record.has_notes == bool(note)
+        if note:
+            assert record.note.complaint_id == record.id
+            assert record.note.document() == note
+            assert (record.note.ai_analysis and record.note.ai_analysis.openai_category) == note.get('ai_analysis', {}).get('openai_category')
+
+def test_records_are_slotted():
+    complaint = Complaint(1, '{"a": 1}', TechnicalNote(2, 1, '{}'))
+    with pytest.raises(AttributeError):
+        complaint.extra = True
+    assert complaint.note.ai_analysis is None
+
+def test_ai_analysis_categories():
+    assert AiAnalysis.from_dict({}) is None
+    assert AiAnalysis.from_dict({'openai_category': 'Noise'}).exported_category == 'Noise'
+    placeholder = AiAnalysis.from_dict({'openai_category': 'NO AI PREDICTION AVAILABLE'})
+    assert not placeholder.has_prediction and placeholder.exported_category == ''
+    auto = AiAnalysis.from_dict({'openai_category': 'Noise (NO OPENAI PREDICTION)'})
+    assert auto.has_prediction and auto.exported_category == ''
+
+def test_export_includes_latest_technical_note(db_path):
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'test'
+    rows = list(csv.reader(io.StringIO(client.get('/complaints/export').get_data(as_text=True))))
+    header, rows = rows[0], rows[1:]
+    assert len(rows) == 40
+
+    conn = sqlite3.connect(db_path)
+    latest = dict(conn.execute("""
+        SELECT complaint_id, json_extract(data, '$.technicianName') FROM technical_notes
+        WHERE id IN (SELECT MAX(id) FROM technical_notes GROUP BY complaint_id)
+    """).fetchall())
+    conn.close()
+    for row in rows:
+        assert row[header.index('Has Technical Notes')] == ('Yes' if int(row[0]) in latest else 'No')
+        assert row[header.index('Technician Name')] == (latest.get(int(row[0])) or '')
+    assert 'Noise' in [row[header.index('AI Category (OpenAI)')] for row in rows]
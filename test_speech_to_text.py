@@ -0,0 +1,131 @@
+import io
+import os
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+import app as app_module
+from audio_io import STT_MAX_UPLOAD_BYTES, CappedBuffer, SpeechCache, audio_upload_name, trim_prompt
+from werkzeug.exceptions import RequestEntityTooLarge
+
+class FakeTranscriptions:
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        name, stream, content_type = kwargs['file']
+        self.calls.append(dict(kwargs, name=name, data=stream.read(), content_type=content_type))
+        return SimpleNamespace(text=f"segment {len(self.calls)}")
+
+@pytest.fixture
+def stt(monkeypatch):
+    transcriptions = FakeTranscriptions()
+    monkeypatch.setattr(app_module, '_openai_client', SimpleNamespace(audio=SimpleNamespace(transcriptions=transcriptions)))
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'test'
+    return client, transcriptions
+
+def test_upload_is_passed_to_whisper_from_memory(stt):
+    client, transcriptions = stt
+    response = client.post('/talk_with_data/stt', data={
+        'audio': (io.BytesIO(b'webm-bytes'), 'blob', 'audio/webm'),
+        'prompt': 'earlier words',
+    })
+    assert response.get_json() == {'transcription': 'segment 1'}
+    call = transcriptions.calls[0]
+    assert (call['name'], call['data'], call['prompt']) == ('audio.webm', b'webm-bytes', 'earlier words')
+
+def test_oversized_upload_rejected_before_reading(stt):
+    client, transcriptions = stt
+    response = client.post(
+        '/talk_with_data/stt', data=b'x', content_type='multipart/form-data; boundary=x',
+        environ_overrides={'CONTENT_LENGTH': str(STT_MAX_UPLOAD_BYTES * 2)},
+    )
+    assert response.status_code == 413
+    assert not transcriptions.calls
+
+def test_cap_enforced_while_parsing(stt, monkeypatch):
+    # Chunked uploads carry no Content-Length, so the buffer itself enforces the cap
+    client, transcriptions = stt
+    monkeypatch.setattr(app_module.InMemoryUploadRequest, 'max_upload_bytes', 1024)
+    response = client.post('/talk_with_data/stt', data={'audio': (io.BytesIO(b'x' * 4096), 'recording-0.webm')})
+    assert response.status_code == 413
+    assert not transcriptions.calls
+
+def test_empty_upload_rejected(stt):
+    client, _ = stt
+    response = client.post('/talk_with_data/stt', data={'audio': (io.BytesIO(b''), 'recording-0.webm')})
+    assert response.status_code == 400
+
+def test_capped_buffer():
+    buffer = CappedBuffer(4)
+    buffer.write(b'abcd')
+    with pytest.raises(RequestEntityTooLarge):
+        buffer.write(b'e')
+
+def test_upload_name_and_prompt():
+    assert audio_upload_name('recording-3.webm', 'audio/webm') == 'recording-3.webm'
+    assert audio_upload_name('blob', 'audio/ogg;codecs=opus') == 'audio.ogg'
+    assert trim_prompt(' ' + 'a' * 1000) == 'a' * 800
+
+class FakeSpeech:
+    def __init__(self):
+        self.calls = 0
+        self.with_streaming_response = self
+
+    @contextmanager
+    def create(self, **kwargs):
+        self.calls += 1
+        yield SimpleNamespace(iter_bytes=lambda: iter([b'ID3', b'-', kwargs['voice'].encode()]))
+
+@pytest.fixture
+def tts(monkeypatch, tmp_path):
+    speech = FakeSpeech()
+    monkeypatch.setattr(app_module, '_openai_client', SimpleNamespace(audio=SimpleNamespace(speech=speech)))
+    monkeypatch.setattr(app_module, 'speech_cache', SpeechCache(str(tmp_path), 1024))
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user'] = 'test'
+    return client, speech
+
+def test_tts_streams_then_serves_from_cache(tts):
+    client, speech = tts
+    first = client.post('/talk_with_data/tts/stream', json={'text': 'Hello', 'voice': 'nova'})
+    assert (first.data, first.mimetype, first.headers['X-TTS-Cache']) == (b'ID3-nova', 'audio/mpeg', 'miss')
+
+    second = client.post('/talk_with_data/tts/stream', json={'text': 'Hello', 'voice': 'nova'})
+    assert (second.data, second.headers['X-TTS-Cache']) == (b'ID3-nova', 'hit')
+    assert speech.calls == 1
+
+    # A different voice is a different cache entry
+    client.post('/talk_with_data/tts/stream', json={'text': 'Hello', 'voice': 'alloy'})
+    assert speech.calls == 2
+
+def test_tts_cache_hit_needs_no_openai_client(tts, monkeypatch):
+    client, _ = tts
+    assert client.post('/talk_with_data/tts/stream', json={'text': 'Hello', 'voice': 'nova'}).data == b'ID3-nova'
+    monkeypatch.setattr(app_module, 'get_openai_client', lambda: None)
+    cached = client.post('/talk_with_data/tts/stream', json={'text': 'Hello', 'voice': 'nova'})
+    assert (cached.status_code, cached.data, cached.headers['X-TTS-Cache']) == (200, b'ID3-nova', 'hit')
+    assert client.post('/talk_with_data/tts/stream', json={'text': 'Bye', 'voice': 'nova'}).status_code == 503
+
+def test_speech_cache_drops_aborted_streams(tmp_path):
+    cache = SpeechCache(str(tmp_path), 1024)
+    key = cache.key('Hello', 'alloy')
+    stream = cache.write_through(key, iter([b'a', b'b']))
+    next(stream)
+    stream.close()
+    assert cache.open(key) is None
+    assert not list(tmp_path.iterdir())
+
+def test_speech_cache_evicts_least_recently_used(tmp_path):
+    cache = SpeechCache(str(tmp_path), 250)
+    keys = [cache.key(f'answer {i}', 'alloy') for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.store(key, b'x' * 100)
+        os.utime(tmp_path / f'{key}.mp3', (i, i))
+    cache.store(cache.key('answer 3', 'alloy'), b'x' * 100)
+    assert cache.open(keys[0]) is None and cache.open(keys[1]) is None
+    assert cache.open(keys[2]) is not None
@@ -0,0 +1,43 @@
+from flask import Flask, render_template
+
+from environment import is_production
+from template_cache import init_template_cache, precompile_templates
+
+def make_app(tmp_path):
+    templates = tmp_path / 'templates'
+    if not templates.exists():
+        templates.mkdir()
+        (templates / 'page.html').write_text('{% for i in range(3) %}<p>{{ i }}</p>{% endfor %}')
+        (templates / 'broken.html').write_text('{% for i in %}')
+    app = Flask(__name__, template_folder=str(templates))
+    init_template_cache(app, str(tmp_path / 'cache'))
+    return app
+
+def test_precompile_fills_bytecode_cache_and_skips_broken_templates(tmp_path):
+    assert precompile_templates(make_app(tmp_path)) == 1
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+def test_fresh_app_loads_templates_without_compiling(tmp_path):
+    precompile_templates(make_app(tmp_path))
+    app = make_app(tmp_path)
+
+    def compile_not_expected(*args, **kwargs):
+        raise AssertionError("template was compiled instead of loaded from the bytecode cache")
+
+    app.jinja_env.compile = compile_not_expected
+    with app.app_context():
+        assert render_template('page.html') == '<p>0</p><p>1</p><p>2</p>'
+
+def test_edited_template_is_recompiled(tmp_path):
+    precompile_templates(make_app(tmp_path))
+    (tmp_path / 'templates' / 'page.html').write_text('<p>edited</p>')
+    app = make_app(tmp_path)
+    with app.app_context():
+        assert render_template('page.html') == '<p>edited</p>'
+
+def test_is_production(monkeypatch):
+    for name in ('FLASK_ENV', 'ENVIRONMENT', 'GAE_ENV', 'K_SERVICE'):
+        monkeypatch.delenv(name, raising=False)
+    assert not is_production()
+    monkeypatch.setenv('K_SERVICE', 'bsh-complaints')
+    assert is_production()
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+import pytest
+
+from time_periods import PeriodRange, parse_filter_period, parse_question_period
+
+TODAY = date(2025, 6, 15)
+
+def test_filter_codes():
+    assert parse_filter_period('30d', TODAY) == PeriodRange(TODAY - timedelta(days=30), TODAY, "the last 30 days")
+    assert parse_filter_period('3m', TODAY).start_date == TODAY - timedelta(days=90)
+    assert parse_filter_period('all', TODAY).start_date == date(2000, 1, 1)
+    assert parse_filter_period('', TODAY) is None
+    assert parse_filter_period('bogus', TODAY) is None
+
+def test_custom_filters():
+    assert parse_filter_period('custom:7 months', TODAY).start_date == TODAY - timedelta(days=210)
+    assert parse_filter_period('custom:2 weeks', TODAY).start_date == TODAY - timedelta(days=14)
+    period = parse_filter_period('custom:2025-01-01:2025-03-31', TODAY)
+    assert (period.start_date, period.end_date) == (date(2025, 1, 1), date(2025, 3, 31))
+    assert parse_filter_period('custom:2025-13-01:2025-03-31', TODAY) is None
+
+def test_question_patterns():
+    start_date, end_date, label = parse_question_period("What happened in the last 6 months?", TODAY)
+    assert (start_date, end_date, label) == (TODAY - timedelta(days=180), TODAY, "the last 6 months")
+    assert parse_question_period("son 2 hafta", TODAY).label == "the last 2 weeks"
+    assert parse_question_period("complaints last week", TODAY).label == "the last week"
+    assert parse_question_period("show me all time data", TODAY).start_date == TODAY - timedelta(days=3650)
+
+def test_question_pattern_priority():
+    # "<n> months" outranks "last week" even when it appears later in the question
+    assert parse_question_period("last week vs 4 months", TODAY).label == "the last 4 months"
+
+@pytest.mark.parametrize('question, label', [
+    ("Compare last 6 months to 2 years ago", "the last 6 months"),
+    ("last 3 months and 2 weeks", "the last 3 months"),
+    ("son 6 ay ve 2 hafta", "the last 6 months"),
+    ("2 weeks or 10 days", "the last 2 weeks"),
+])
+def test_question_overlapping_periods(question, label):
+    # A match of a later pattern must not hide an overlapping earlier one
+    assert parse_question_period(question, TODAY).label == label
+
+def test_question_quarter():
+    period = parse_question_period("How did Q2 go?", TODAY)
+    assert period.label == "Q2"
+    assert period.start_date == TODAY - timedelta(days=90)
+
+def test_question_fallbacks():
+    assert parse_question_period("What is this month like?", TODAY).start_date == date(2025, 6, 1)
+    assert parse_question_period("Which brand is best?", TODAY).label == "the last 3 months"
+
+def test_as_datetimes_covers_whole_days():
+    start, end = parse_filter_period('custom:2025-01-01:2025-01-31', TODAY).as_datetimes()
+    assert start.isoformat() == '2025-01-01T00:00:00'
+    assert end.date() == date(2025, 1, 31) and end.hour == 23
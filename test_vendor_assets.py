@@ -0,0 +1,96 @@
+import io
+import json
+import os
+
+import pytest
+from flask import Flask, render_template_string
+
+import static_assets
+import vendor_assets
+from static_assets import CDN_ASSETS, init_static_assets
+
+FONTAWESOME_CSS = (
+    '.fa{font-family:var(--fa-style-family,"Font Awesome 6 Free")}'
+    '.fa-spin{animation-name:fa-spin}'
+    '.fa-robot:before{content:"\\f544"}'
+    '.fa-user:before{content:"\\f007"}'
+    '.fa-rocket:before,.fa-space-shuttle:before{content:"\\f135"}'
+    '@keyframes fa-spin{0%{transform:rotate(0deg)}to{transform:rotate(1turn)}}'
+    '@font-face{font-family:"Font Awesome 6 Brands";src:url(../webfonts/fa-brands-400.woff2) format("woff2")}'
+    '@font-face{font-family:"Font Awesome 6 Free";font-weight:900;'
+    'src:url(../webfonts/fa-solid-900.woff2) format("woff2"),url(../webfonts/fa-solid-900.ttf) format("truetype")}'
+)
+
+def test_subset_keeps_used_icons_and_solid_font():
+    css, codepoints = vendor_assets.subset_fontawesome_css(FONTAWESOME_CSS, {'robot', 'spin'}, 'fa-solid.abc.woff2')
+    assert '.fa-robot:before' in css and '.fa-user:before' not in css and 'rocket' not in css
+    assert '.fa-spin{' in css and '@keyframes fa-spin' in css
+    assert 'fa-brands' not in css and 'truetype' not in css
+    assert 'src:url(fa-solid.abc.woff2) format("woff2")' in css
+    assert codepoints == {0xf544}
+
+def test_icons_in_use_scans_templates(tmp_path):
+    (tmp_path / 'templates').mkdir()
+    (tmp_path / 'templates' / 'page.html').write_text('<i class="fas fa-chart-bar"></i><i class="fas fa-spinner fa-spin">')
+    assert vendor_assets.icons_in_use(['templates/*.html'], str(tmp_path)) == {'chart-bar', 'spinner', 'spin'}
+
+def test_vendor_assets_writes_hashed_files_and_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(vendor_assets, 'bundled_plotly', lambda: None)
+    monkeypatch.setattr(vendor_assets, 'subset_font', lambda data, codepoints: None)
+    (tmp_path / 'vendor').mkdir()
+    (tmp_path / 'vendor' / 'bootstrap.old.css').write_text('stale')
+
+    def fetch(url):
+        if url == CDN_ASSETS['fontawesome.css']:
+            return FONTAWESOME_CSS.encode()
+        return f'/* {url} */\n/*# sourceMappingURL=lib.min.js.map */'.encode()
+
+    manifest = vendor_assets.vendor_assets(str(tmp_path), icons={'robot'}, fetch=fetch)
+    assert set(manifest) == set(CDN_ASSETS)
+    assert json.loads((tmp_path / 'vendor' / 'manifest.json').read_text()) == manifest
+    assert not (tmp_path / 'vendor' / 'bootstrap.old.css').exists()
+    assert manifest['plotly.js'].startswith('vendor/plotly.') and manifest['plotly.js'].endswith('.js')
+
+    script = (tmp_path / manifest['plotly.js']).read_text()
+    assert 'sourceMappingURL' not in script
+    css = (tmp_path / manifest['fontawesome.css']).read_text()
+    assert f"url({os.path.basename(manifest['fontawesome-solid'])})" in css
+
+def test_subset_font_keeps_requested_glyphs():
+    pytest.importorskip('fontTools')
+    matplotlib = pytest.importorskip('matplotlib')
+    from fontTools.ttLib import TTFont
+
+    path = os.path.join(os.path.dirname(matplotlib.__file__), 'mpl-data', 'fonts', 'ttf', 'DejaVuSans.ttf')
+    with open(path, 'rb') as f:
+        data = f.read()
+    font, extension = vendor_assets.subset_font(data, {ord('A'), ord('B')})
+    assert extension in ('.woff', '.woff2') and len(font) < len(data) / 10
+    assert set(TTFont(io.BytesIO(font)).getBestCmap()) == {ord('A'), ord('B')}
+
+def make_app(tmp_path):
+    (tmp_path / 'static').mkdir(exist_ok=True)
+    app = Flask(__name__, static_folder=str(tmp_path / 'static'))
+    init_static_assets(app)
+    return app
+
+def test_asset_url_falls_back_to_cdn(tmp_path):
+    app = make_app(tmp_path)
+    with app.test_request_context():
+        assert render_template_string("{{ asset_url('plotly.js') }}") == CDN_ASSETS['plotly.js']
+
+def test_asset_url_uses_vendored_copy(tmp_path):
+    app = make_app(tmp_path)
+    vendor = tmp_path / 'static' / 'vendor'
+    vendor.mkdir()
+    (vendor / 'plotly.abc.js').write_text('var Plotly;')
+    (vendor / 'fontawesome-solid.abc.woff2').write_bytes(b'wOF2')
+    (vendor / 'manifest.json').write_text(json.dumps({
+        'plotly.js': 'vendor/plotly.abc.js', 'fontawesome-solid': 'vendor/fontawesome-solid.abc.woff2'}))
+    with app.test_request_context():
+        assert render_template_string("{{ asset_url('plotly.js') }}").startswith('/static/vendor/plotly.abc.js?v=')
+        links = render_template_string("{{ preload_links('fontawesome-solid', 'bootstrap.js') }}")
+    assert 'href="/static/vendor/fontawesome-solid.abc.woff2?v=' in links
+    assert 'as="font" type="font/woff2" crossorigin' in links
+    assert f'href="{CDN_ASSETS["bootstrap.js"]}" as="script"' in links
+    assert static_assets.vendored_assets(app.static_folder)['plotly.js'] == 'vendor/plotly.abc.js'
@@ -0,0 +1,151 @@
+"""
+Shared time period parsing for the complaint filters and Talk with Data questions.
+
+Both the filter codes used by the complaints list and statistics pages
+('30d', '3m', 'custom:7 months', 'custom:2025-01-01:2025-03-31', ...) and the
+natural language periods in questions ("last 6 months", "son 3 ay", ...) are
+resolved to the same PeriodRange type. All patterns are compiled once at import.
+"""
+
+import re
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+class PeriodRange(namedtuple('PeriodRange', ['start_date', 'end_date', 'label'])):
+    """Inclusive date range, unpackable as (start_date, end_date, label)."""
+    __slots__ = ()
+
+    def as_datetimes(self):
+        """Return (start of the first day, end of the last day) for timestamp comparisons."""
+        return datetime.combine(self.start_date, time.min), datetime.combine(self.end_date, time.max)
+
+# Predefined filter codes -> (days, label)
+FILTER_PERIODS = {
+    '24h': (1, "the last 24 hours"),
+    '1w': (7, "the last week"),
+    '30d': (30, "the last 30 days"),
+    '3m': (90, "the last 3 months"),
+    '6m': (180, "the last 6 months"),
+    '1y': (365, "the last year"),
+    '2y': (730, "the last 2 years"),
+}
+
+ALL_TIME_START = date(2000, 1, 1)
+
+# Days per unit for "custom:<n> <unit>" filters and "<n> <unit>" questions
+UNIT_DAYS = {'day': 1, 'week': 7, 'month': 30, 'year': 365}
+
+_CUSTOM_AMOUNT_RE = re.compile(r'(\d+)\s*(day|week|month|year)')
+_CUSTOM_RANGE_RE = re.compile(r'^custom:(\d{4}-\d{2}-\d{2}):(\d{4}-\d{2}-\d{2})$')
+
+# Question patterns in priority order: (regex, days, label). When days is a unit
+# name, the number captured by the pattern is multiplied by that unit's days.
+QUESTION_PATTERNS = [
+    # Specific months
+    (r'(\d+)\s*month', 'month', "the last {n} months"),
+    (r'(\d+)\s*ay', 'month', "the last {n} months"),  # Turkish "ay"
+
+    # Specific weeks
+    (r'(\d+)\s*week', 'week', "the last {n} weeks"),
+    (r'(\d+)\s*hafta', 'week', "the last {n} weeks"),  # Turkish "hafta"
+
+    # Specific days
+    (r'(\d+)\s*day', 'day', "the last {n} days"),
+    (r'(\d+)\s*gün', 'day', "the last {n} days"),  # Turkish "gün"
+
+    # Specific years
+    (r'(\d+)\s*year', 'year', "the last {n} years"),
+    (r'(\d+)\s*yıl', 'year', "the last {n} years"),  # Turkish "yıl"
+
+    # Common time periods
+    (r'last\s*month|geçen\s*ay', 30, "the last month"),  # Turkish "geçen ay"
+    (r'last\s*week|geçen\s*hafta', 7, "the last week"),  # Turkish "geçen hafta"
+    (r'last\s*3\s*months|son\s*3\s*ay', 90, "the last 3 months"),  # Turkish "son 3 ay"
+    (r'last\s*6\s*months|son\s*6\s*ay', 180, "the last 6 months"),  # Turkish "son 6 ay"
+    (r'last\s*year|geçen\s*yıl', 365, "the last year"),  # Turkish "geçen yıl"
+    (r'last\s*24\s*hours|son\s*24\s*saat', 1, "the last 24 hours"),  # Turkish "son 24 saat"
+
+    # Quarter periods
+    (r'last\s*quarter|son\s*çeyrek', 90, "the last quarter"),  # Turkish "son çeyrek"
+    (r'q([1-4])', 90, "Q{n}"),
+
+    # All time
+    (r'all\s*time|tüm\s*zaman', 3650, "all time"),  # Turkish "tüm zaman"
+]
+
+# Compiled once; searched one by one so an earlier pattern wins even where a
+# later one overlaps it ("last 3 months and 2 weeks")
+_QUESTION_RES = [(re.compile(pattern), days, label) for pattern, days, label in QUESTION_PATTERNS]
+
+# General time indicators, checked when no pattern matches
+RECENT_WORDS = ('recent', 'son', 'recently', 'son zamanlarda')
+THIS_MONTH_WORDS = ('current', 'mevcut', 'this month', 'bu ay')
+THIS_YEAR_WORDS = ('this year', 'bu yıl')
+
+DEFAULT_QUESTION_DAYS = 90
+DEFAULT_QUESTION_LABEL = "the last 3 months"
+
+def _days_range(today, days, label):
+    return PeriodRange(today - timedelta(days=days), today, label)
+
+def parse_filter_period(time_period, today=None):
+    """Resolve a filter code such as '30d', 'all', 'custom:7 months' or
+    'custom:2025-01-01:2025-03-31' to a PeriodRange.
+
+    Returns None for an empty or unrecognized code.
+    """
+    if not time_period:
+        return None
+    today = today or date.today()
+
+    if time_period in FILTER_PERIODS:
+        days, label = FILTER_PERIODS[time_period]
+        return _days_range(today, days, label)
+
+    if time_period == 'all':
+        return PeriodRange(ALL_TIME_START, today, "all time")
+
+    if time_period.startswith('custom:'):
+        match = _CUSTOM_RANGE_RE.match(time_period)
+        if match:
+            try:
+                start_date = datetime.strptime(match.group(1), '%Y-%m-%d').date()
+                end_date = datetime.strptime(match.group(2), '%Y-%m-%d').date()
+            except ValueError:
+                return None
+            return PeriodRange(start_date, end_date, f"{start_date} to {end_date}")
+
+        match = _CUSTOM_AMOUNT_RE.search(time_period)
+        if match:
+            amount, unit = int(match.group(1)), match.group(2)
+            return _days_range(today, amount * UNIT_DAYS[unit], f"the last {amount} {unit}s")
+
+    return None
+
+@lru_cache(maxsize=512)
+def _parse_question(question_lower, today):
+    # Earliest pattern in QUESTION_PATTERNS wins, wherever it occurs in the question
+    for pattern, days, label in _QUESTION_RES:
+        match = pattern.search(question_lower)
+        if match:
+            number = match.group(1) if pattern.groups else None
+            if isinstance(days, str):
+                days = int(number) * UNIT_DAYS[days]
+            return _days_range(today, days, label.format(n=number))
+
+    if any(word in question_lower for word in RECENT_WORDS):
+        return _days_range(today, 30, "recent times")
+    if any(word in question_lower for word in THIS_MONTH_WORDS):
+        return PeriodRange(today.replace(day=1), today, "this month")
+    if any(word in question_lower for word in THIS_YEAR_WORDS):
+        return PeriodRange(today.replace(month=1, day=1), today, "this year")
+
+    return _days_range(today, DEFAULT_QUESTION_DAYS, DEFAULT_QUESTION_LABEL)
+
+def parse_question_period(question, today=None):
+    """Resolve the time period mentioned in a natural language question.
+
+    Defaults to the last 3 months when the question does not mention one.
+    """
+    return _parse_question(question.lower(), today or date.today())
@@ -5,9 +5,6 @@ Update resolution dates for resolved complaints in SQLite database
 
 import os
 import sqlite3
-import json
-import random
-import datetime
 import logging
 
 # Configure logging
@@ -37,7 +34,13 @@ def connect_to_db():
         return None
 
 def update_resolution_dates():
-    """Add resolution dates to resolved complaints."""
+    """Add resolution dates to resolved complaints.
+    
+    Uses the set-based UPDATE from migrations.backfill_resolution_dates, so all
+    missing dates are filled in by one statement instead of one UPDATE per row.
+    """
+    from migrations import backfill_resolution_dates
+    
     conn = connect_to_db()
     if not conn:
         logger.error("Failed to connect to database")
@@ -46,99 +49,19 @@ def update_resolution_dates():
     cursor = conn.cursor()
     
     try:
-        # Get all resolved complaints without resolution dates
-        cursor.execute("""
-            SELECT id, data 
-            FROM complaints 
-            WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
-              AND json_extract(data, '$.complaintDetails.resolutionDate') IS NULL
-        """)
-        
-        resolved_complaints = cursor.fetchall()
-        logger.info(f"Found {len(resolved_complaints)} resolved complaints missing resolutionDate")
-        
-        # Define typical resolution time ranges (in days) for different brands
-        brand_resolution_times = {
-            "Bosch": (3, 12),      # 3-12 days
-            "Profilo": (5, 15),    # 5-15 days
-            "Siemens": (4, 10),    # 4-10 days
-            "Gaggenau": (2, 7),    # 2-7 days (premium brand, faster service)
-            "Neff": (4, 14)        # 4-14 days
-        }
-        
-        # Default for unknown brands
-        default_time_range = (5, 20)
-        
-        update_count = 0
-        for complaint_id, data in resolved_complaints:
-            # Parse JSON data if it's a string
-            if isinstance(data, str):
-                data = json.loads(data)
-            
-            # Get the complaint date
-            complaint_date_str = data.get('complaintDetails', {}).get('dateOfComplaint')
-            
-            if not complaint_date_str:
-                logger.warning(f"Complaint {complaint_id} has no complaint date, skipping")
-                continue
-            
-            try:
-                # Parse the complaint date
-                complaint_date = datetime.datetime.fromisoformat(complaint_date_str.replace('Z', '+00:00'))
-                
-                # Get the brand
-                brand = data.get('productInformation', {}).get('brand', 'Unknown')
-                
-                # Get appropriate time range for the brand
-                min_days, max_days = brand_resolution_times.get(brand, default_time_range)
-                
-                # Generate a random resolution time
-                resolution_days = random.randint(min_days, max_days)
-                
-                # Calculate resolution date
-                resolution_date = complaint_date + datetime.timedelta(days=resolution_days)
-                
-                # Format resolution date as ISO 8601 string
-                resolution_date_str = resolution_date.isoformat()
-                
-                # Update the complaint data with resolution date
-                if 'complaintDetails' not in data:
-                    data['complaintDetails'] = {}
-                
-                data['complaintDetails']['resolutionDate'] = resolution_date_str
-                
-                # Update the record in the database
-                cursor.execute(
-                    "UPDATE complaints SET data = ? WHERE id = ?",
-                    (json.dumps(data), complaint_id)
-                )
-                
-                update_count += 1
-                
-                # Commit every 100 updates to avoid transaction timeout
-                if update_count % 100 == 0:
-                    conn.commit()
-                    logger.info(f"Updated {update_count} complaints")
-            
-            except Exception as e:
-                logger.error(f"Error updating complaint {complaint_id}: {e}")
-                continue
-        
-        # Final commit
+        update_count = backfill_resolution_dates(conn)
         conn.commit()
         logger.info(f"Updated resolution dates for {update_count} complaints")
         
         # Verify update - get average resolution time for each brand
         cursor.execute("""
             SELECT 
-                COALESCE(json_extract(data, '$.productInformation.brand'), 'Unknown') as brand,
+                COALESCE(json_extract(data, '$.productInformation.brand'), 'Unknown') AS brand,
                 ROUND(AVG(
-                    CAST(
-                        (julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
-                         julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))) AS REAL
-                    ), 1
-                ) as avg_days,
-                COUNT(*) as count
+                    julianday(json_extract(data, '$.complaintDetails.resolutionDate')) - 
+                    julianday(json_extract(data, '$.complaintDetails.dateOfComplaint'))
+                ), 1) AS avg_days,
+                COUNT(*) AS count
             FROM complaints
             WHERE json_extract(data, '$.complaintDetails.resolutionStatus') = 'Resolved'
             AND json_extract(data, '$.complaintDetails.resolutionDate') IS NOT NULL
@@ -1,6 +1,5 @@
 #!/usr/bin/env python3
 
-import psycopg2
 import json
 import random
 import logging
@@ -106,6 +105,7 @@ def connect_to_db():
     """Connect to the PostgreSQL database."""
     username = getpass.getuser()
     try:
+        import psycopg2
         conn = psycopg2.connect(
             host="localhost",
             user=username,
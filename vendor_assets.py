@@ -0,0 +1,194 @@
+"""
+Vendor the front-end libraries into static/vendor.
+
+Build step, run once per image (see Dockerfile): fetches every library in
+static_assets.CDN_ASSETS, writes it to static/vendor under a content-hashed
+file name and records it in static/vendor/manifest.json, which asset_url()
+reads. Pages then load without any CDN, which our restricted network needs,
+and the hashed names can be cached for good.
+
+- Plotly is copied from the installed plotly package when it bundles the
+  pinned plotly.js version, so it needs no download.
+- Font Awesome's CSS is cut down to the icons the templates and scripts use,
+  and the solid font is subset to those glyphs with fontTools (a warning is
+  printed, and the whole font vendored, when it is missing).
+  Icons added later need a rerun (the Docker build does that).
+- Source map comments are stripped; the maps aren't vendored.
+
+Usage:
+    python vendor_assets.py          # vendor everything into static/vendor
+    python vendor_assets.py --icons  # list the Font Awesome icons in use
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import re
+import urllib.request
+
+from static_assets import CDN_ASSETS, MANIFEST_NAME, VENDOR_DIR
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+ICON_SOURCES = ['templates/*.html', 'static/js/*.js']
+
+DOWNLOAD_TIMEOUT = 60
+
+ICON_PATTERN = re.compile(r'\bfa-([a-z0-9]+(?:-[a-z0-9]+)*)\b')
+ICON_SELECTOR = re.compile(r'^\.fa-([a-z0-9-]+)::?before$')
+ICON_CONTENT = re.compile(r'content:\s*"\\([0-9a-f]+)"')
+SOURCE_MAP = re.compile(rb'\n?/[/*]# sourceMappingURL=\S+(?: \*/)?\s*$')
+
+def fetch(url):
+    """Download url and return its bytes."""
+    with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+        return response.read()
+
+def bundled_plotly():
+    """plotly.min.js from the installed plotly package if it is the pinned version, else None."""
+    try:
+        import plotly
+    except ImportError:
+        return None
+    version = re.search(r'plotly-(\d+\.\d+\.\d+)', CDN_ASSETS['plotly.js']).group(1)
+    path = os.path.join(os.path.dirname(plotly.__file__), 'package_data', 'plotly.min.js')
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    return data if f"plotly.js v{version}".encode() in data[:200] else None
+
+def icons_in_use(patterns=ICON_SOURCES, base_dir=BASE_DIR):
+    """Font Awesome icon names (without 'fa-') mentioned in the given files."""
+    icons = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(base_dir, pattern)):
+            with open(path, encoding='utf-8') as f:
+                icons.update(ICON_PATTERN.findall(f.read()))
+    return icons
+
+def split_rules(css):
+    """Split a stylesheet into top-level rules (at-rule blocks are kept whole)."""
+    rules, depth, start = [], 0, 0
+    for i, char in enumerate(css):
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append(css[start:i + 1].strip())
+                start = i + 1
+    return rules
+
+def subset_fontawesome_css(css, icons, font_url):
+    """Keep the Font Awesome rules for icons (plus everything that isn't an icon) and the solid font.
+
+    Returns (css, codepoints of the kept icons).
+    """
+    kept, codepoints = [], set()
+    for rule in split_rules(css):
+        selectors = [selector.strip() for selector in rule.split('{', 1)[0].split(',')]
+        if rule.startswith('@font-face'):
+            if 'fa-solid-900' not in rule:
+                continue
+            rule = re.sub(r'src:[^;}]+', f'src:url({font_url}) format("{font_format(font_url)}")', rule)
+        elif all(ICON_SELECTOR.match(selector) for selector in selectors):
+            if not any(ICON_SELECTOR.match(selector).group(1) in icons for selector in selectors):
+                continue
+            codepoints.update(int(code, 16) for code in ICON_CONTENT.findall(rule))
+        kept.append(rule)
+    return '\n'.join(kept), codepoints
+
+def font_format(url):
+    return 'woff' if url.endswith('.woff') else 'woff2'
+
+def subset_font(data, codepoints):
+    """(font bytes, extension) holding only codepoints, or None without fontTools.
+
+    woff2 needs the Brotli package as well; otherwise the subset is woff.
+    """
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        print("WARNING: fontTools is not installed (see requirements.txt); vendoring the full Font Awesome font")
+        return None
+    # fontTools writes woff2 through the Brotli package
+    flavor = 'woff2' if importlib.util.find_spec('brotli') else 'woff'
+    if flavor == 'woff':
+        print("WARNING: Brotli is not installed (see requirements.txt); writing the subset font as woff")
+    font = TTFont(io.BytesIO(data))
+    subsetter = subset.Subsetter(subset.Options(layout_features=['*'], name_IDs=['*'], notdef_outline=True))
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    font.flavor = flavor
+    out = io.BytesIO()
+    font.save(out)
+    return out.getvalue(), f'.{flavor}'
+
+def hashed_name(name, data, extension):
+    stem = name.rsplit('.', 1)[0] if name.endswith(extension) else name
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+def vendor_assets(static_dir=STATIC_DIR, icons=None, fetch=fetch):
+    """Write every CDN asset into static_dir/vendor; returns the manifest {name: path under static/}."""
+    vendor_dir = os.path.join(static_dir, VENDOR_DIR)
+    os.makedirs(vendor_dir, exist_ok=True)
+    icons = icons_in_use() if icons is None else icons
+    manifest = {}
+
+    def write(name, data, extension):
+        filename = hashed_name(name, data, extension)
+        with open(os.path.join(vendor_dir, filename), 'wb') as f:
+            f.write(data)
+        manifest[name] = f"{VENDOR_DIR}/{filename}"
+        print(f"  {name:<20} {len(data) / 1024:>8.1f} KiB  {filename}")
+        return filename
+
+    sources = {}
+    for name, url in CDN_ASSETS.items():
+        data = bundled_plotly() if name == 'plotly.js' else None
+        if data is None:
+            print(f"Fetching {url}")
+            data = fetch(url)
+        sources[name] = SOURCE_MAP.sub(b'', data) if name.endswith(('.css', '.js')) else data
+
+    # The font's name goes into the CSS, so the CSS is subset first to learn the glyphs
+    css, codepoints = subset_fontawesome_css(sources.pop('fontawesome.css').decode('utf-8'), icons, 'FONT_URL')
+    font, extension = sources.pop('fontawesome-solid'), '.woff2'
+    subset = subset_font(font, codepoints)
+    if subset:
+        font, extension = subset
+    font_file = write('fontawesome-solid', font, extension)
+    css = css.replace('FONT_URL', font_file).replace('format("woff2")', f'format("{font_format(font_file)}")')
+    write('fontawesome.css', css.encode('utf-8'), '.css')
+
+    for name, data in sources.items():
+        write(name, data, os.path.splitext(name)[1])
+
+    # Drop files from earlier runs, then publish the manifest
+    current = {os.path.basename(path) for path in manifest.values()} | {MANIFEST_NAME}
+    for filename in os.listdir(vendor_dir):
+        if filename not in current:
+            os.remove(os.path.join(vendor_dir, filename))
+    with open(os.path.join(vendor_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(manifest)} assets and {MANIFEST_NAME} to {vendor_dir} ({len(codepoints)} icons)")
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor the front-end libraries into static/vendor.")
+    parser.add_argument("--icons", action="store_true", help="list the Font Awesome icons in use and exit")
+    args = parser.parse_args()
+    if args.icons:
+        print('\n'.join(sorted(icons_in_use())))
+        return
+    vendor_assets()
+
+if __name__ == "__main__":
+    main()